@@ -0,0 +1,43 @@
+"""How much per-item cleanups cost, as handlers or as a bulk cleanup
+
+Run it with: python benchmarks/bench_bulk.py, or nox -s benchmarks
+"""
+
+import time
+
+from postscriptum import PubSub
+
+ITEMS = 5_000
+
+
+def report(name, seconds):
+    print(f"{name:<40} {seconds / ITEMS * 1e9:8.0f} ns per item")
+
+
+def remove(path):
+    pass
+
+
+def remove_all(paths):
+    pass
+
+
+def main():
+    ps = PubSub()
+    start = time.perf_counter()
+    for i in range(ITEMS):
+        ps.add_finish_handler(lambda event, path=f"/tmp/{i}": remove(path))
+    ps._call_handlers(ps.finish_handlers, {})
+    report("one finish handler per item", time.perf_counter() - start)
+
+    ps = PubSub()
+    start = time.perf_counter()
+    cleanup = ps.register_bulk_cleanup(remove_all)
+    for i in range(ITEMS):
+        cleanup.append(f"/tmp/{i}")
+    ps.bulk_cleanups.run_all()
+    report("bulk cleanup", time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
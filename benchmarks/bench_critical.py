@@ -0,0 +1,52 @@
+"""How much a critical section costs, compared to an empty with block
+
+Run it with: python benchmarks/bench_critical.py, or nox -s benchmarks
+"""
+
+import threading
+import timeit
+
+from contextlib import nullcontext
+
+from postscriptum import PubSub
+
+NUMBER = 200_000
+
+
+def report(name, seconds):
+    print(f"{name:<40} {seconds / NUMBER * 1e9:8.0f} ns")
+
+
+def main():
+    ps = PubSub()
+    critical = ps.critical()
+    empty = nullcontext()
+
+    def baseline():
+        with empty:
+            pass
+
+    def outermost():
+        with critical:
+            pass
+
+    def nested():
+        with critical:
+            pass
+
+    def in_thread(results):
+        results.append(timeit.timeit(outermost, number=NUMBER))
+
+    report("empty with block", timeit.timeit(baseline, number=NUMBER))
+    report("outermost, main thread (sigmask)", timeit.timeit(outermost, number=NUMBER))
+    with critical:
+        report("nested", timeit.timeit(nested, number=NUMBER))
+    results = []
+    thread = threading.Thread(target=in_thread, args=(results,))
+    thread.start()
+    thread.join()
+    report("outermost, other thread", results[0])
+
+
+if __name__ == "__main__":
+    main()
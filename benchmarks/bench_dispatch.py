@@ -0,0 +1,34 @@
+"""How long calling the handlers of an event takes
+
+Run it with: python benchmarks/bench_dispatch.py, or nox -s benchmarks
+"""
+
+import timeit
+
+from postscriptum import PubSub
+
+NUMBER = 20_000
+
+
+def report(name, seconds):
+    print(f"{name:<40} {seconds / NUMBER * 1e9:8.0f} ns")
+
+
+def main():
+    for count in (1, 10, 100):
+        ps = PubSub()
+        for _ in range(count):
+            handler = lambda event: None
+            ps.on_terminate()(handler)
+            ps.on_finish()(handler)
+
+        def dispatch():
+            ps._called_handlers.clear()
+            ps._call_handlers(ps.terminate_handlers, {})
+            ps._call_handlers(ps.finish_handlers, {})
+
+        report(f"{count} handlers on 2 events", timeit.timeit(dispatch, number=NUMBER))
+
+
+if __name__ == "__main__":
+    main()
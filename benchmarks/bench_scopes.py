@@ -0,0 +1,45 @@
+"""How much registering handlers for a block costs, compared to start()/stop()
+
+Run it with: python benchmarks/bench_scopes.py, or nox -s benchmarks
+"""
+
+import timeit
+
+from postscriptum import PubSub
+
+NUMBER = 20_000
+
+
+def report(name, seconds):
+    print(f"{name:<40} {seconds / NUMBER * 1e9:8.0f} ns")
+
+
+def handler(event):
+    pass
+
+
+def main():
+    ps = PubSub()
+    for _ in range(10):
+        ps.on_terminate()(lambda event: None)
+
+    def empty_scope():
+        with ps.scope():
+            pass
+
+    def scope():
+        with ps.scope() as s:
+            s.on_terminate()(handler)
+            s.on_finish()(handler)
+
+    def restart():
+        ps.start()
+        ps.stop()
+
+    report("empty scope", timeit.timeit(empty_scope, number=NUMBER))
+    report("scope with 2 handlers", timeit.timeit(scope, number=NUMBER))
+    report("start() then stop()", timeit.timeit(restart, number=NUMBER))
+
+
+if __name__ == "__main__":
+    main()
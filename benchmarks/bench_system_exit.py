@@ -0,0 +1,48 @@
+"""How much catching SystemExit with a PubSub costs, compared to try/except
+
+Run it with: python benchmarks/bench_system_exit.py, or nox -s benchmarks
+"""
+
+import timeit
+
+from contextlib import ContextDecorator
+
+from postscriptum import PubSub
+
+NUMBER = 200_000
+
+
+def report(name, seconds):
+    print(f"{name:<40} {seconds / NUMBER * 1e9:8.0f} ns")
+
+
+def work():
+    return 1
+
+
+def main():
+    ps = PubSub()
+
+    def bare():
+        try:
+            return work()
+        except SystemExit:
+            raise
+
+    decorated = ps()(work)
+    # What every call went through before
+    generic = ContextDecorator.__call__(ps(), work)
+
+    def context_manager():
+        with ps():
+            return work()
+
+    report("bare try/except", timeit.timeit(bare, number=NUMBER))
+    report("@ps()", timeit.timeit(decorated, number=NUMBER))
+    report("with ps():", timeit.timeit(context_manager, number=NUMBER))
+    report("ContextDecorator wrapper", timeit.timeit(generic, number=NUMBER))
+    ps.stop()
+
+
+if __name__ == "__main__":
+    main()
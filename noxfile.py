@@ -1,8 +1,8 @@
+import glob
 import webbrowser
 
 import nox
 
-# TODO: @nox.parametrize on ordered set
 # TODO: add pypy support
 @nox.session(python=["3.6", "3.7", "3.8"])
 def tests(session):
@@ -33,3 +33,10 @@ def coverage(session):
         webbrowser.open_new_tab("./build/coverage_html_report/index.html")
     else:
         session.run("coverage", action)
+
+
+@nox.session(python="3.7")
+def benchmarks(session):
+    session.install(".")
+    for script in sorted(glob.glob("benchmarks/bench_*.py")):
+        session.run("python", script)
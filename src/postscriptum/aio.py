@@ -0,0 +1,298 @@
+"""Report errors asyncio can't raise, and cancel tasks on terminate
+
+Exceptions in tasks nobody awaited, or in loop callbacks, don't reach
+sys.excepthook: asyncio passes them to the loop exception handler, which
+just logs them.
+
+The handler we install only computes a cheap key and puts the event in a
+queue, which never blocks. A dispatcher thread takes all the events
+available at once, and calls the handlers for each of them, so slow
+handlers don't slow down the loop.
+
+On terminate, LoopRegistry cancels the tasks of registered loops, and waits
+for them before the program finishes, like asyncio.run() does when
+the main coroutine returns.
+"""
+
+import io
+import queue
+import asyncio
+import weakref
+import threading
+import traceback
+import concurrent.futures
+
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from postscriptum.types import AsyncErrorEventType
+from postscriptum.utils import Deadline, format_stacktrace, raised_at
+
+# How long after the deadline we wait for a loop in another thread to report
+REPORT_SLACK = 1.0
+
+
+def async_error_key(context: Dict[str, Any]) -> Tuple[str, str, str]:
+    """ What makes two async errors duplicates of each other
+
+    The exception type and where it was raised, or, for errors without
+    exceptions like destroyed pending tasks, the message.
+    """
+    exception = context.get("exception")
+    if exception is None:
+        return ("", context.get("message", ""), "")
+    return (
+        type(exception).__qualname__,
+        "",
+        raised_at(exception.__traceback__),
+    )
+
+
+def make_async_error_event(
+    context: Dict[str, Any],
+    loop: asyncio.AbstractEventLoop,
+    key: Tuple[str, str, str],
+    suppressed: int,
+) -> AsyncErrorEventType:
+    exception = context.get("exception")
+    stacktrace: Callable[[], str] = lambda: ""
+    if exception is not None:
+        stacktrace = partial(
+            format_stacktrace,
+            type(exception),
+            exception,
+            exception.__traceback__,  # type: ignore
+        )
+    return {
+        "message": context.get("message", ""),
+        "exception": exception,
+        "stacktrace": stacktrace,
+        "context": context,
+        "loop": loop,
+        "key": key,
+        "suppressed": suppressed,
+    }
+
+
+class EventDispatcher:
+    """ Call a function for events put in a queue, in a background thread
+
+    Putting an event never blocks, and the thread processes all the
+    events available at once.
+
+    Args:
+        dispatch: the function to call for each event. Its exceptions are
+                  printed, and don't stop the dispatching of others.
+        name: the name of the thread.
+
+    Example:
+
+        dispatcher = EventDispatcher(print)
+        dispatcher.put("event")
+        dispatcher.stop(timeout=1)
+
+    """
+
+    def __init__(
+        self, dispatch: Callable[[Any], Any], name: str = "postscriptum-dispatcher"
+    ):
+        self.dispatch = dispatch
+        self.name = name
+        self.events: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, event: Any):
+        if self._thread is None:
+            self.start()
+        self.events.put_nowait(event)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """ Dispatch the events already queued, then stop the thread
+
+        Return False if the thread didn't stop before timeout.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return True
+        self.events.put_nowait(None)
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def _run(self):
+        while True:
+            batch: List[Any] = [self.events.get()]
+            while True:
+                try:
+                    batch.append(self.events.get_nowait())
+                except queue.Empty:
+                    break
+            for event in batch:
+                if event is None:
+                    return
+                try:
+                    self.dispatch(event)
+                except Exception:  # pylint: disable=broad-except
+                    traceback.print_exc()
+
+
+def all_tasks(loop: asyncio.AbstractEventLoop):
+    if hasattr(asyncio, "all_tasks"):  # Python 3.7+
+        return asyncio.all_tasks(loop)
+    return asyncio.Task.all_tasks(loop)  # type: ignore # pylint: disable=no-member
+
+
+def current_task(loop: asyncio.AbstractEventLoop):
+    if hasattr(asyncio, "current_task"):  # Python 3.7+
+        return asyncio.current_task(loop)
+    return asyncio.Task.current_task(loop)  # type: ignore # pylint: disable=no-member
+
+
+def running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """ The loop running in the current thread, or None """
+    try:
+        return asyncio.get_running_loop()  # type: ignore
+    except AttributeError:  # Python 3.6
+        loop = asyncio.get_event_loop()
+        return loop if loop.is_running() else None
+    except RuntimeError:
+        return None
+
+
+def describe_task(task: asyncio.Task) -> Dict[str, str]:
+    stack = io.StringIO()
+    task.print_stack(file=stack)
+    name = task.get_name() if hasattr(task, "get_name") else repr(task)
+    return {"task": name, "stack": stack.getvalue()}
+
+
+async def cancel_tasks(
+    loop: asyncio.AbstractEventLoop, protected: Any, deadline: Deadline
+) -> Dict[str, Any]:
+    """ Cancel the tasks of loop, then wait for them until deadline
+
+    Tasks in protected, and the one running this, are left alone. Async
+    generators and the default executor are shut down afterward.
+
+    Return a report with how many tasks were cancelled, and the name and
+    stack of the ones that didn't finish in time.
+    """
+    current = current_task(loop)
+    tasks = [
+        task
+        for task in all_tasks(loop)
+        if task is not current and task not in protected and not task.done()
+    ]
+    for task in tasks:
+        task.cancel()
+
+    # When the main task ends, asyncio.run() cancels all the others,
+    # including us. We keep going, since we want to report stuck tasks.
+    pending: Any = set(tasks)
+    while pending and not deadline.expired:
+        try:
+            _, pending = await asyncio.wait(pending, timeout=deadline.remaining())
+        except asyncio.CancelledError:
+            pass
+
+    shutdowns = [loop.shutdown_asyncgens()]
+    if hasattr(loop, "shutdown_default_executor"):  # Python 3.9+
+        shutdowns.append(loop.shutdown_default_executor())  # type: ignore
+    for shutdown in shutdowns:
+        try:
+            await asyncio.wait_for(shutdown, deadline.remaining())
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+
+    return {
+        "cancelled": len(tasks) - len(pending),
+        "unfinished": [describe_task(task) for task in pending],
+    }
+
+
+class LoopRegistry:
+    """ Event loops to cancel the tasks of when the program is terminated
+
+    Loops and protected tasks are held by weak references.
+
+    Example:
+
+        registry = LoopRegistry()
+        registry.register(loop)
+        registry.protect(flush_metrics_task)
+        report = registry.cancel_all(timeout=10)
+
+    """
+
+    def __init__(self):
+        self._loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+        self.protected: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+
+    def __len__(self) -> int:
+        return len(self._loops)
+
+    def register(self, loop: asyncio.AbstractEventLoop) -> asyncio.AbstractEventLoop:
+        self._loops.add(loop)
+        return loop
+
+    def protect(self, task: asyncio.Task) -> asyncio.Task:
+        self.protected.add(task)
+        return task
+
+    def cancel_all(
+        self, timeout: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], Optional[asyncio.AbstractEventLoop]]:
+        """ Cancel the tasks of all the loops we can wait for from here
+
+        Loops are forgotten afterward. Loops running in another thread are
+        given the cancellation to run, and waited for. Loops not running
+        are run until it's done.
+
+        But we can't wait for a loop running in the current thread, since
+        it's blocked by us. We return it instead, so you can schedule
+        cancel_tasks() in it.
+
+        Return a report with the number of cancelled tasks, and the name and
+        stack of the ones that didn't finish in time, and the loop running in
+        this thread, if it's registered.
+        """
+        deadline = Deadline(timeout)
+        loops, self._loops = list(self._loops), weakref.WeakSet()
+        current_loop = running_loop()
+        report: Dict[str, Any] = {"cancelled": 0, "unfinished": [], "timed_out": False}
+        left_loop = None
+
+        for loop in loops:
+            if loop.is_closed():
+                continue
+            coroutine = cancel_tasks(loop, self.protected, deadline)
+            if loop is current_loop:
+                coroutine.close()
+                left_loop = loop
+                continue
+            try:
+                if loop.is_running():
+                    # The coroutine stops at the deadline by itself, we just
+                    # make sure a blocked loop doesn't block us too
+                    remaining = deadline.remaining()
+                    loop_report = asyncio.run_coroutine_threadsafe(
+                        coroutine, loop
+                    ).result(None if remaining is None else remaining + REPORT_SLACK)
+                else:
+                    loop_report = loop.run_until_complete(coroutine)
+            except concurrent.futures.TimeoutError:
+                report["timed_out"] = True
+                continue
+            report["cancelled"] += loop_report["cancelled"]
+            report["unfinished"].extend(loop_report["unfinished"])
+
+        return report, left_loop
@@ -0,0 +1,178 @@
+"""Run many cleanups of the same kind in batches when the program finishes
+
+Registering a handler per temporary file, or per row to delete, means
+tens of thousands of closures, called one by one. Here, the function is
+registered once, and each cleanup is just a tuple of arguments appended
+to a deque. At exit, the function gets them by batches, so it can do the
+work at once: one ``rm`` for many paths, one ``DELETE`` for many rows.
+"""
+
+import threading
+
+from collections import deque
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from postscriptum.executors import describe_call
+from postscriptum.utils import Deadline, run_concurrently
+
+BatchFunctionType = Callable[[List[Tuple[Any, ...]]], Any]
+
+
+class BulkCleanup:
+    """ Arguments to call a function with, by batches, at exit
+
+    Appending is thread-safe, and doesn't allocate anything but the tuple
+    of arguments.
+
+    Args:
+        func: called with a list of argument tuples, at most batch_size.
+        batch_size: how many argument tuples func gets at once.
+
+    Example:
+
+        def delete_rows(rows):
+            cursor.executemany("DELETE FROM tmp WHERE id = ?", rows)
+
+        cleanup = BulkCleanup(delete_rows, batch_size=500)
+        cleanup.append(row_id)
+        cleanup.run()
+
+    """
+
+    def __init__(self, func: BatchFunctionType, batch_size: int = 1000):
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, not {batch_size}")
+        self.func = func
+        self.batch_size = batch_size
+        self.items: Deque[Tuple[Any, ...]] = deque()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({describe_call(self.func)}, {len(self)} items)"
+
+    def append(self, *args: Any):
+        """ Add a tuple of arguments to pass to the function at exit """
+        self.items.append(args)
+
+    def discard(self, *args: Any) -> bool:
+        """ Forget arguments, if the cleanup was done already
+
+        This scans the items, so it's slow with a lot of them.
+        """
+        try:
+            self.items.remove(args)
+        except ValueError:
+            return False
+        return True
+
+    def run(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """ Call the function on all arguments, by batches, until timeout
+
+        A batch that fails is not retried, and doesn't stop the others.
+        Arguments appended meanwhile are processed too, and the ones left
+        when the timeout is reached are dropped. A batch still running at
+        that point is left running in a daemon thread, and counted as left.
+
+        Return a report with how many items and batches were processed,
+        the errors, how many items were left, and if a batch timed out.
+        """
+        deadline = Deadline(timeout)
+        items = self.items
+        report: Dict[str, Any] = {
+            "items": 0,
+            "batches": 0,
+            "errors": [],
+            "left": 0,
+            "timed_out": False,
+        }
+        while items and not deadline.expired:
+            batch = []
+            try:
+                for _ in range(self.batch_size):
+                    batch.append(items.popleft())
+            except IndexError:  # Emptied by us, or another thread
+                pass
+            if not batch:
+                break
+            done, error = self._call(batch, deadline)
+            if not done:
+                report["timed_out"] = True
+                report["left"] += len(batch)
+                break
+            if error is not None:
+                report["errors"].append(error)
+            else:
+                report["items"] += len(batch)
+            report["batches"] += 1
+        report["left"] += len(items)
+        items.clear()
+        return report
+
+    def _call(
+        self, batch: List[Tuple[Any, ...]], deadline: Deadline
+    ) -> Tuple[bool, Optional[BaseException]]:
+        """ Call the function on batch, without waiting past deadline
+
+        Return if it's done, and the error it raised, if any.
+        """
+        if deadline.expires_at is None:  # No need for a thread to wait on
+            try:
+                self.func(batch)
+            except Exception as e:  # pylint: disable=broad-except
+                return True, e
+            return True, None
+        (outcome,) = run_concurrently(
+            [partial(self.func, batch)], max_workers=1, timeout=deadline.remaining()
+        )
+        return outcome.done, outcome.error
+
+
+class BulkCleanupRegistry:
+    """ One BulkCleanup per function, run in registration order at exit
+
+    Example:
+
+        registry = BulkCleanupRegistry()
+        registry.register(remove_paths).append("/tmp/upload-1")
+        report = registry.run_all(timeout=10)
+
+    """
+
+    def __init__(self):
+        self._cleanups: Dict[BatchFunctionType, BulkCleanup] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cleanups)
+
+    def register(self, func: BatchFunctionType, batch_size: int = 1000) -> BulkCleanup:
+        """ Return the BulkCleanup of func, created on the first call """
+        with self._lock:
+            cleanup = self._cleanups.get(func)
+            if cleanup is None:
+                cleanup = self._cleanups[func] = BulkCleanup(func, batch_size)
+            return cleanup
+
+    def forget_items(self):
+        """ Drop the arguments appended so far, but keep the functions """
+        for cleanup in list(self._cleanups.values()):
+            cleanup.items.clear()
+
+    def run_all(self, timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """ Run each cleanup, sharing the same deadline
+
+        Cleanups stay registered, but without items left.
+
+        Return the report of each cleanup, by function description.
+        """
+        deadline = Deadline(timeout)
+        with self._lock:
+            cleanups = list(self._cleanups.values())
+        return {
+            describe_call(cleanup.func): cleanup.run(deadline.remaining())
+            for cleanup in cleanups
+            if cleanup.items
+        }
@@ -0,0 +1,266 @@
+"""Terminate child processes together when the program finishes
+
+All children get the terminate signal in one pass, then are waited for
+concurrently, so shutdown takes as long as the slowest child, not the sum
+of all of them. Children still running after the grace period are killed.
+"""
+
+import os
+import sys
+import time
+import signal
+
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
+
+from postscriptum.utils import Deadline
+
+if TYPE_CHECKING:  # pragma: no cover
+    from subprocess import Popen
+
+ChildType = Union["Popen", int]
+
+# How often we check on children when we can't wait on them with pidfd_open()
+POLL_INTERVAL = 0.01
+
+# From linux/prctl.h
+PR_SET_PDEATHSIG = 1
+
+
+def child_pid(child: ChildType) -> int:
+    return child if isinstance(child, int) else child.pid
+
+
+def has_exited(child: ChildType) -> bool:
+    """ Check if a child is gone, reaping it if it's ours """
+    if not isinstance(child, int):
+        return child.poll() is not None
+    try:
+        pid, _ = os.waitpid(child, os.WNOHANG)
+        return pid == child
+    except ChildProcessError:  # Not our child, we can only check it exists
+        try:
+            os.kill(child, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+    return False
+
+
+def send_signal(child: ChildType, sig: int, process_group: bool = False):
+    """ Send sig to the child, or to its whole process group
+
+    We never signal our own process group, even if the child is part of it.
+    """
+    pid = child_pid(child)
+    try:
+        if process_group and hasattr(os, "killpg"):
+            group = os.getpgid(pid)  # type: ignore
+            if group != os.getpgrp():  # type: ignore
+                os.killpg(group, sig)  # type: ignore
+                return
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def wait_with_pidfds(children: List[ChildType], deadline: Deadline) -> bool:
+    """ Wait for children to exit with one pidfd each, until deadline
+
+    Return False, without waiting, if pidfds are not available: the kernel
+    may be too old (ENOSYS), or a seccomp filter may forbid them (EPERM).
+    """
+    import selectors
+
+    with selectors.DefaultSelector() as selector:
+        try:
+            for child in children:
+                try:
+                    fd = os.pidfd_open(child_pid(child))  # type: ignore
+                except ProcessLookupError:
+                    continue
+                except OSError:
+                    return False
+                selector.register(fd, selectors.EVENT_READ, child)
+            while selector.get_map() and not deadline.expired:
+                for key, _ in selector.select(deadline.remaining()):
+                    selector.unregister(key.fd)
+                    os.close(key.fd)
+        finally:
+            for key in list(selector.get_map().values()):
+                os.close(key.fd)
+    return True
+
+
+def wait_children(children: List[ChildType], deadline: Deadline) -> List[ChildType]:
+    """ Wait for all children to exit, until deadline
+
+    On Linux, from Python 3.9, we wait on one pidfd per child with a
+    selector. Otherwise, or if the kernel refuses, we poll them every
+    POLL_INTERVAL.
+
+    Return the children still running.
+    """
+    running = [child for child in children if not has_exited(child)]
+    if not running:
+        return running
+
+    if not (hasattr(os, "pidfd_open") and wait_with_pidfds(running, deadline)):
+        while running and not deadline.expired:
+            time.sleep(min(POLL_INTERVAL, deadline.remaining() or POLL_INTERVAL))
+            running = [child for child in running if not has_exited(child)]
+
+    return [child for child in running if not has_exited(child)]
+
+
+class ChildRegistry:
+    """ Child processes to terminate when the program finishes
+
+    Args:
+        terminate_signal: the signal to send first.
+        process_group: send signals to the process group of each child,
+                       which is useful if they start processes of their own.
+                       Start them with ``start_new_session=True``.
+        grace_period: how long to wait for children to exit before killing
+                      them.
+        kill: send SIGKILL to children still running after grace_period.
+              On Windows, terminate_signal is sent again instead.
+
+    Example:
+
+        registry = ChildRegistry(grace_period=5)
+        registry.register(subprocess.Popen(["worker"]))
+        report = registry.terminate_all(timeout=10)
+
+    """
+
+    def __init__(
+        self,
+        terminate_signal: int = signal.SIGTERM,
+        process_group: bool = False,
+        grace_period: float = 5.0,
+        kill: bool = True,
+    ):
+        self.terminate_signal = terminate_signal
+        self.process_group = process_group
+        self.grace_period = grace_period
+        self.kill = kill
+        self._children: Dict[int, ChildType] = {}
+
+    def __len__(self) -> int:
+        return len(self._children)
+
+    def register(self, child: ChildType) -> ChildType:
+        """ Add a Popen object or a pid to the children to terminate, and return it
+
+        Prefer Popen objects for your own children: a bare pid may have been
+        reused by another process by the time we signal it.
+        """
+        self._children[child_pid(child)] = child
+        return child
+
+    def unregister(self, child: ChildType) -> bool:
+        return self._children.pop(child_pid(child), None) is not None
+
+    def clear(self):
+        self._children.clear()
+
+    def terminate_all(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """ Signal all children, wait for them, and kill the ones left
+
+        Children are forgotten afterward.
+
+        Args:
+            timeout: the maximum time all of this may take, grace period
+                     and killing included.
+
+        Return a report with the pids of the children that exited after
+        being signaled, the ones that were killed, and the ones still running.
+        """
+        deadline = Deadline(timeout)
+        children, self._children = list(self._children.values()), {}
+        running = [child for child in children if not has_exited(child)]
+
+        for child in running:
+            send_signal(child, self.terminate_signal, self.process_group)
+
+        grace_deadline = Deadline(self.grace_period)
+        if deadline.expires_at is not None:
+            grace_deadline.expires_at = min(  # type: ignore
+                grace_deadline.expires_at, deadline.expires_at
+            )
+        left = wait_children(running, grace_deadline)
+
+        killed: List[int] = []
+        if left and self.kill:
+            kill_signal = getattr(signal, "SIGKILL", self.terminate_signal)
+            for child in left:
+                send_signal(child, kill_signal, self.process_group)
+                killed.append(child_pid(child))
+            left = wait_children(left, deadline)
+
+        left_pids = {child_pid(child) for child in left}
+        return {
+            "terminated": [
+                child_pid(child)
+                for child in running
+                if child_pid(child) not in left_pids
+                and child_pid(child) not in killed
+            ],
+            "killed": [pid for pid in killed if pid not in left_pids],
+            "still_running": sorted(left_pids),
+        }
+
+
+def set_parent_death_signal(
+    sig: int = signal.SIGTERM, parent_pid: Optional[int] = None
+) -> bool:
+    """ Ask Linux to send sig to the current process when its parent dies
+
+    This is how a child learns that its parent was SIGKILLed, which the
+    parent can't react to. If the child uses postscriptum and sig is a
+    terminating signal, its on_terminate handlers run as usual.
+
+    If parent_pid is given and the parent is already gone, sig is sent
+    right away, since the kernel would not do it.
+
+    On other OSes, this does nothing and returns False.
+
+    Be aware that Linux sends the signal when the thread that started the
+    child exits, not the whole parent process, so start children from a
+    long lived thread.
+
+    Use parent_death_signal() to get a function to pass as preexec_fn or
+    initializer.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.prctl(PR_SET_PDEATHSIG, int(sig), 0, 0, 0) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+    if parent_pid is not None and os.getppid() != parent_pid:
+        os.kill(os.getpid(), sig)
+    return True
+
+
+def parent_death_signal(sig: int = signal.SIGTERM) -> Callable[[], bool]:
+    """ Return a function setting the parent death signal in a child process
+
+    It remembers the current process as the parent, to catch the case where
+    it dies before the child is set up. The function can be pickled, so it
+    works as a multiprocessing initializer.
+
+    Example:
+
+        subprocess.Popen(["worker"], preexec_fn=parent_death_signal())
+
+        ProcessPoolExecutor(initializer=parent_death_signal())
+
+    """
+    return partial(set_parent_death_signal, sig, os.getpid())
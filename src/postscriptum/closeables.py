@@ -0,0 +1,256 @@
+"""Close resources in bulk when the program finishes
+
+Resources closed by a coroutine, like ``aclose()``, are bound to the event
+loop they were created in: their close coroutine is run in that loop, and
+they are skipped if it's not running anymore.
+"""
+
+import sys
+import inspect
+import threading
+import weakref
+
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple
+
+from postscriptum.exceptions import LoopUnavailable
+from postscriptum.utils import Deadline, run_concurrently, sort_outcomes
+
+if TYPE_CHECKING:  # pragma: no cover
+    from asyncio import AbstractEventLoop
+
+# Method names we look for to close an object, by order of preference
+CLOSE_METHODS = ("close", "aclose", "shutdown")
+
+DEFAULT_GROUP = "default"
+
+
+def find_close_method_name(obj: Any) -> str:
+    """ Return the name of the method to call to close obj
+
+    Raise TypeError if there is none.
+    """
+    for name in CLOSE_METHODS:
+        if callable(getattr(obj, name, None)):
+            return name
+    raise TypeError(
+        f"{obj!r} has no {', '.join(CLOSE_METHODS)} method, it can't be closed"
+    )
+
+
+def running_loop() -> Optional["AbstractEventLoop"]:
+    """ The event loop running in the current thread, or None
+
+    asyncio is slow to import, and if it's not imported, no loop is running.
+    """
+    if "asyncio" not in sys.modules:
+        return None
+    from postscriptum.aio import running_loop as aio_running_loop
+
+    return aio_running_loop()
+
+
+async def _wait_for(awaitable: Any) -> Any:
+    return await awaitable
+
+
+def close_object(
+    obj: Any,
+    method_name: str,
+    loop: Optional["AbstractEventLoop"] = None,
+    blocked_thread: Optional[int] = None,
+):
+    """ Call obj.method_name(), and await the result in loop if it's awaitable
+
+    Raise LoopUnavailable if it's awaitable, and loop is None, not running,
+    or run by blocked_thread, which is waiting for us.
+    """
+    result = getattr(obj, method_name)()
+    if not inspect.isawaitable(result):
+        return
+    if (
+        loop is None
+        or not loop.is_running()
+        or getattr(loop, "_thread_id", None) == blocked_thread
+    ):
+        if hasattr(result, "close"):  # No "coroutine was never awaited" warning
+            result.close()  # type: ignore
+        raise LoopUnavailable(f"The event loop of {obj!r} is not running")
+
+    import asyncio
+
+    asyncio.run_coroutine_threadsafe(_wait_for(result), loop).result()
+
+
+class CloseableRegistry:
+    """ Objects to close in bulk, grouped, and held by weak references
+
+    Groups are closed in the reverse order of their creation, like an
+    ExitStack would. Objects inside the same group are closed concurrently,
+    using at most max_workers threads. An error while closing one object
+    doesn't prevent closing the others, it's collected instead.
+
+    Registered objects are not kept alive by the registry: once garbage
+    collected, they are removed from it automatically.
+
+    Objects closed with a coroutine are closed in their event loop, if it
+    still runs in another thread. Otherwise, they are skipped.
+
+    Args:
+        max_workers: the maximum number of objects closed at the same time
+                     in a group.
+
+    Example:
+
+        registry = CloseableRegistry()
+        registry.register(db_pool, group="db")
+        registry.register(open("log.txt", "a"))
+        report = registry.close_all()
+
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        # group name -> id(obj) -> (weakref to obj, name of the close method,
+        # loop it was registered from)
+        self._groups: Dict[
+            str, Dict[int, Tuple[weakref.ref, str, Optional["AbstractEventLoop"]]]
+        ] = {}
+        self._lock = threading.Lock()
+        # (group, id(obj), weakref) of collected objects, removed from _groups
+        # later. Weakref callbacks can run during any allocation, including
+        # ours while we hold the lock, so they must not take it.
+        self._collected: Deque[Tuple[str, int, weakref.ref]] = deque()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge()
+            return sum(len(group) for group in self._groups.values())
+
+    def _purge(self):
+        """ Remove the collected objects from their group. Call it locked """
+        collected = self._collected
+        while collected:
+            group, key, ref = collected.popleft()
+            entries = self._groups.get(group, {})
+            # The id may have been reused by a new object in the meantime
+            if key in entries and entries[key][0] is ref:
+                del entries[key]
+
+    def register(
+        self,
+        obj: Any,
+        group: str = DEFAULT_GROUP,
+        loop: Optional["AbstractEventLoop"] = None,
+    ) -> Any:
+        """ Add obj to the objects to close and return it
+
+        loop is the event loop to run its close coroutine in, if it has one.
+        By default, the loop running in the current thread, if any.
+
+        Raise TypeError if obj has no close method or can't be weakly referenced.
+        """
+        method_name = find_close_method_name(obj)
+        key = id(obj)
+        if loop is None:
+            loop = running_loop()
+
+        def forget(ref: weakref.ref, collected=self._collected):
+            collected.append((group, key, ref))
+
+        try:
+            ref = weakref.ref(obj, forget)
+        except TypeError:
+            raise TypeError(
+                f"{obj!r} can't be weakly referenced, close it in a handler instead"
+            ) from None
+
+        with self._lock:
+            self._purge()
+            self._groups.setdefault(group, {})[key] = (ref, method_name, loop)
+
+        return obj
+
+    def unregister(self, obj: Any) -> bool:
+        """ Remove obj from the objects to close. Return False if it was not there """
+        key = id(obj)
+        with self._lock:
+            self._purge()
+            for entries in self._groups.values():
+                entry = entries.get(key)
+                if entry and entry[0]() is obj:
+                    del entries[key]
+                    return True
+        return False
+
+    def close_all(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """ Close all registered objects, last created group first
+
+        The registry is empty afterward.
+
+        Args:
+            timeout: how long closing all groups may take. Objects not
+                     closed by then are reported as timed out.
+
+        Return a report with the number of objects closed, the list of
+        (repr(obj), exception) for the ones that failed, and the repr
+        of the ones that timed out, or were skipped since their event loop
+        doesn't run.
+        """
+        deadline = Deadline(timeout)
+        with self._lock:
+            self._purge()
+            groups = list(self._groups.values())
+            self._groups = {}
+
+        # The loop running in this thread can't run anything until we're done
+        this_thread = threading.get_ident()
+        closed = 0
+        errors: List[Tuple[str, BaseException]] = []
+        timed_out: List[str] = []
+        skipped: List[str] = []
+        for entries in reversed(groups):
+            calls = []
+            for ref, method_name, loop in entries.values():
+                obj = ref()
+                if obj is not None:
+                    calls.append(CloseCall(obj, method_name, loop, this_thread))
+
+            outcomes = run_concurrently(
+                calls, max_workers=self.max_workers, timeout=deadline.remaining()
+            )
+            done, group_errors, group_timed_out = sort_outcomes(calls, outcomes)
+            closed += done
+            timed_out.extend(group_timed_out)
+            for description, error in group_errors:
+                if isinstance(error, LoopUnavailable):
+                    skipped.append(description)
+                else:
+                    errors.append((description, error))
+
+        return {
+            "closed": closed,
+            "errors": errors,
+            "timed_out": timed_out,
+            "skipped": skipped,
+        }
+
+
+class CloseCall:
+    """ A callable closing one object, remembering what it was for reporting """
+
+    def __init__(
+        self,
+        obj: Any,
+        method_name: str,
+        loop: Optional["AbstractEventLoop"] = None,
+        blocked_thread: Optional[int] = None,
+    ):
+        self.obj = obj
+        self.method_name = method_name
+        self.loop = loop
+        self.blocked_thread = blocked_thread
+        self.description = f"{obj!r}.{method_name}()"
+
+    def __call__(self):
+        close_object(self.obj, self.method_name, self.loop, self.blocked_thread)
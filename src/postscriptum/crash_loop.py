@@ -0,0 +1,138 @@
+"""Detect restart storms from a small per-app exit history file
+
+The history uses the same records as the exit journal, but only keeps the
+last ones, so that reading it on startup costs a few microseconds.
+"""
+
+import os
+import time
+
+from typing import Counter, List, NamedTuple, Optional, Union
+
+from postscriptum.journal import (
+    RECORD,
+    ExitReason,
+    ExitRecord,
+    pack_record,
+    unpack_record,
+)
+
+
+class CrashLoop(NamedTuple):
+    """ A crash repeating itself, as found by CrashLoopGuard.check() """
+
+    fingerprint: int
+    crashes: int
+    # How long we recommend to wait before starting again
+    delay: float
+
+
+class CrashLoopGuard:
+    """ Record crashes and terminations, and tell when they repeat too often
+
+    A crash loop is the same traceback fingerprint crashing the program at
+    least threshold times in window seconds. The recommended delay doubles
+    with each crash beyond the threshold, up to max_delay.
+
+    Args:
+        path: the history file. It's created if it doesn't exist.
+        threshold: how many identical crashes make a loop.
+        window: how many seconds back we look for crashes.
+        base_delay: the delay recommended when threshold is reached.
+        max_delay: the maximum delay recommended.
+        history_size: how many records to keep in the file.
+
+    Example:
+
+        guard = CrashLoopGuard("/var/lib/myapp/exits.history")
+        crash_loop = guard.check()
+        if crash_loop:
+            time.sleep(crash_loop.delay)
+
+    """
+
+    def __init__(
+        self,
+        path: Union[str, "os.PathLike[str]"],
+        threshold: int = 5,
+        window: float = 60.0,
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+        history_size: int = 32,
+    ):
+        self.path = os.fspath(path)
+        self.threshold = threshold
+        self.window = window
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.history_size = history_size
+
+    def read(self) -> List[ExitRecord]:
+        """ The records in the history, oldest first """
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        data = data[: len(data) - len(data) % RECORD.size]
+        return [unpack_record(values) for values in RECORD.iter_unpack(data)]
+
+    def record(
+        self,
+        reason: ExitReason,
+        exit_code: int = 0,
+        signal: int = 0,
+        fingerprint: int = 0,
+    ):
+        """ Append an exit to the history, trimming it if it grew too big
+
+        The append is a single os.write() on a file opened with O_APPEND.
+        Trimming is done by atomically replacing the file, and only once it
+        holds twice history_size records, to keep writes cheap.
+        """
+        data = pack_record(reason, exit_code, signal, fingerprint)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+        if size >= 2 * self.history_size * RECORD.size:
+            self.trim()
+
+    def trim(self):
+        """ Only keep the last history_size records """
+        records = self.read()[-self.history_size :]
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            for record in records:
+                f.write(
+                    pack_record(
+                        record.reason,
+                        record.exit_code,
+                        record.signal,
+                        record.fingerprint,
+                        timestamp=record.timestamp,
+                        pid=record.pid,
+                    )
+                )
+        os.replace(temporary_path, self.path)
+
+    def check(self, now: Optional[float] = None) -> Optional[CrashLoop]:
+        """ Return the worst crash loop in the history, or None """
+        since = (time.time() if now is None else now) - self.window
+        crashes: Counter[int] = Counter(
+            record.fingerprint
+            for record in self.read()
+            if record.reason == ExitReason.CRASH and record.timestamp >= since
+        )
+        if not crashes:
+            return None
+
+        fingerprint, count = crashes.most_common(1)[0]
+        if count < self.threshold:
+            return None
+
+        delay = self.base_delay * 2 ** (count - self.threshold)
+        return CrashLoop(fingerprint, count, min(delay, self.max_delay))
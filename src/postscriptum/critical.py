@@ -0,0 +1,146 @@
+"""Defer terminating signals while a block of code must not be interrupted
+
+A signal can arrive in the middle of a multi-step write, and the program
+exits with half of it done. In a critical section, the signal is put
+aside instead, and handled when the outermost section ends.
+
+Two mechanisms work together:
+
+- On Unix, the main thread blocks the signals with pthread_sigmask(),
+  so the kernel keeps them pending. This also protects the sections
+  entered before signal handlers are installed.
+- Python runs signal handlers in the main thread, even when another
+  thread received the signal, or is the one in the critical section.
+  So our handler asks defer() first, which records the signal if any
+  thread is in a critical section. It's raised again once they all left.
+
+Only the outermost section of each thread does any work: nested ones just
+count. Outside of the main thread, no system call is made unless a signal
+was deferred.
+"""
+
+import os
+import signal
+import threading
+
+from contextlib import ContextDecorator
+from typing import Any, Iterable, List, Set, Union
+
+from postscriptum.signals import signals_from_names
+
+try:
+    # signal.pthread_sigmask() turns the mask it returns into Signals enums,
+    # which takes more time than the system call itself
+    from _signal import pthread_sigmask  # type: ignore
+except ImportError:  # Not on Unix, or not CPython
+    pthread_sigmask = getattr(signal, "pthread_sigmask", None)
+
+
+def raise_signal(sig: signal.Signals):
+    if hasattr(signal, "raise_signal"):  # Python 3.8+
+        signal.raise_signal(sig)  # type: ignore
+    else:
+        os.kill(os.getpid(), sig)
+
+
+class CriticalSection(ContextDecorator):
+    """ A reentrant block during which signals are deferred
+
+    It can be used as a decorator and a context manager, from any thread,
+    and the same object can be entered any number of times.
+
+    Args:
+        signals: names or values of the signals to defer.
+
+    Example:
+
+        critical = CriticalSection(["SIGTERM", "SIGINT"])
+
+        with critical:
+            write_batch()  # SIGTERM waits until the batch is written
+
+    .. warning::
+        Threads and processes started from the main thread in a critical
+        section inherit its blocked signals. Start them outside of it.
+
+    """
+
+    def __init__(self, signals: Iterable[Union[str, signal.Signals]]):
+        self.signals = set(signals_from_names(signals))
+        self._sigset = tuple(int(sig) for sig in self.signals)
+        # Signals received during a section, raised again when they all end
+        self.pending: List[signal.Signals] = []
+        # The threads in a section. There is no lock: signal handlers
+        # can interrupt the main thread anywhere, and adding to a set, or
+        # appending to a list, is atomic already.
+        self._threads: Set[int] = set()
+        # How deep the current thread is, and the mask it had before
+        self._local = threading.local()
+        self._main_thread_id = threading.main_thread().ident
+
+    @property
+    def active(self) -> bool:
+        """ Is any thread in a critical section """
+        return bool(self._threads)
+
+    def defer(self, sig: signal.Signals) -> bool:
+        """ Call this first in signal handlers. If it returns True, return
+
+        The signal is then raised again once all critical sections ended.
+        """
+        if not self._threads:
+            return False
+        if sig not in self.pending:
+            self.pending.append(sig)
+        if self._threads:
+            return True
+        # The last section ended meanwhile, and may not have seen the signal
+        try:
+            self.pending.remove(sig)
+        except ValueError:  # It did, and raises it again
+            return True
+        return False
+
+    def __enter__(self):
+        local = self._local
+        depth = getattr(local, "depth", 0)
+        local.depth = depth + 1
+        if depth:
+            return self
+
+        ident = threading.get_ident()
+        self._threads.add(ident)
+        if pthread_sigmask and ident == self._main_thread_id:
+            local.mask = pthread_sigmask(signal.SIG_BLOCK, self._sigset)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        local = self._local
+        local.depth -= 1
+        if local.depth:
+            return
+
+        self._threads.discard(threading.get_ident())
+        mask = getattr(local, "mask", None)
+        if mask is not None:
+            local.mask = None
+            # Signals the kernel kept pending are delivered right here
+            pthread_sigmask(signal.SIG_SETMASK, mask)  # type: ignore
+        # If a section started since, the handler just defers them again
+        while self.pending and not self._threads:
+            try:
+                sig = self.pending.pop(0)
+            except IndexError:
+                break
+            raise_signal(sig)
+
+    def reset_after_fork(self):
+        """ Forget the sections of the threads that didn't survive a fork
+
+        Only the thread that forked exists in the child, and becomes its
+        main thread. Signals deferred in the parent are the parent's.
+        """
+        in_section = getattr(self._local, "depth", 0) > 0
+        self._threads = {threading.get_ident()} if in_section else set()
+        self.pending = []
+        self._main_thread_id = threading.main_thread().ident
@@ -0,0 +1,125 @@
+"""Write one crash report per fingerprint, even across processes
+
+When the same bug crashes hundreds of workers, writing the full stack trace
+each time floods disks and log ingestion. CrashReportSink writes it for the
+first occurrence only, and counts the others.
+
+State is shared through files in a directory, without locks:
+
+- the report is written to a temporary file, then hard linked to its final
+  name. Linking fails if the name exists, so exactly one process wins, and
+  the report appears complete or not at all. Without hard links, the final
+  name is created with O_EXCL, which also lets only one process win.
+- each occurrence appends one byte to a counter file opened with O_APPEND,
+  so the count is the size of the file.
+"""
+
+import os
+import time
+import threading
+
+from typing import Dict, Optional, Union
+
+from postscriptum.types import CrashEventType
+
+
+class CrashReportSink:
+    """ A crash handler deduplicating reports by fingerprint
+
+    Args:
+        directory: where to put reports and counters. It's created if needed.
+
+    Example:
+
+        ps.on_crash()(CrashReportSink("/var/log/myapp/crashes"))
+
+    """
+
+    def __init__(self, directory: Union[str, "os.PathLike[str]"]):
+        self.directory = os.fspath(directory)
+
+    def report_path(self, fingerprint: int) -> str:
+        return os.path.join(self.directory, f"{fingerprint:016x}.txt")
+
+    def counter_path(self, fingerprint: int) -> str:
+        return os.path.join(self.directory, f"{fingerprint:016x}.count")
+
+    def __call__(self, event: CrashEventType) -> bool:
+        """ Count the crash, and write its report if it's the first one
+
+        Return True if the report was written.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fingerprint = event["fingerprint"]
+
+        fd = os.open(
+            self.counter_path(fingerprint), os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        )
+        try:
+            os.write(fd, b".")
+        finally:
+            os.close(fd)
+
+        report_path = self.report_path(fingerprint)
+        if os.path.exists(report_path):
+            return False
+        return self.write_report(report_path, event)
+
+    def write_report(self, report_path: str, event: CrashEventType) -> bool:
+        """ Atomically create the report, unless another process did it first
+
+        On file systems without hard links, the report is created with
+        O_EXCL instead: still by one process only, but it may be read before
+        it's complete.
+        """
+        temporary_path = f"{report_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        header = (
+            f"First seen: {time.strftime('%Y-%m-%d %H:%M:%S')} "
+            f"(pid {os.getpid()})\n\n"
+        )
+        content = header + event["stacktrace"]()  # type: ignore
+        with open(temporary_path, "w") as f:
+            f.write(content)
+        try:
+            os.link(temporary_path, report_path)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:  # Like PermissionError, with no hard link support
+            return self._create_report(report_path, content)
+        finally:
+            os.unlink(temporary_path)
+
+    @staticmethod
+    def _create_report(report_path: str, content: str) -> bool:
+        try:
+            fd = os.open(report_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        with open(fd, "w") as f:
+            f.write(content)
+        return True
+
+    def count(self, fingerprint: int) -> int:
+        """ How many times this crash happened """
+        try:
+            return os.stat(self.counter_path(fingerprint)).st_size
+        except FileNotFoundError:
+            return 0
+
+    def counts(self) -> Dict[int, int]:
+        """ How many times each crash happened, by fingerprint """
+        counts = {}
+        for name in os.listdir(self.directory):
+            if name.endswith(".count"):
+                fingerprint = int(name[: -len(".count")], 16)
+                counts[fingerprint] = self.count(fingerprint)
+        return counts
+
+    def report(self, fingerprint: int) -> Optional[str]:
+        """ The full report written for the first occurrence of this crash """
+        try:
+            with open(self.report_path(fingerprint)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
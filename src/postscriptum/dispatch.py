@@ -0,0 +1,128 @@
+"""What to call for each event, worked out before the event happens
+
+A handler used for several events is only called once, on the first of
+them. Instead of looking up each handler in a set of the ones already
+called, on each event, a DispatchPlan gives each handler a slot, once, and
+lists for each event the handlers to call with their slot. CalledHandlers
+is then a map of flags, one byte per slot: unlike bits of an int, setting
+one doesn't allocate a new object.
+
+Handlers that must not run in this process are left out of the plan, so
+dispatching doesn't check for them either.
+"""
+
+from typing import (
+    Any,
+    Callable,
+    Container,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from postscriptum.handlers import HandlerSet
+
+StepsType = Tuple[Tuple[int, Callable], ...]  # Slot, handler
+
+
+class DispatchPlan:
+    """ For each handler collection, the handlers to call, and their slot
+
+    Args:
+        collections: the handler collections of all events.
+        excluded: handlers to leave out.
+
+    Example:
+
+        plan = DispatchPlan([terminate_handlers, finish_handlers], set())
+        for slot, handler in plan.steps[id(terminate_handlers)]:
+            ...
+
+    """
+
+    def __init__(self, collections: Iterable[HandlerSet], excluded: Container):
+        # The tuples we read, to tell if the plan is still current
+        self._sources = [(handlers, handlers.snapshot()) for handlers in collections]
+        self.slots: Dict[Callable, int] = {}
+        self.steps: Dict[int, StepsType] = {}
+        for handlers, snapshot in self._sources:
+            steps = []
+            for handler in snapshot:
+                if handler in excluded:
+                    continue
+                slot = self.slots.setdefault(handler, len(self.slots))
+                steps.append((slot, handler))
+            self.steps[id(handlers)] = tuple(steps)
+
+    def is_current(self) -> bool:
+        """ Has no handler been added or removed since the plan was made """
+        return all(
+            handlers.snapshot() is snapshot for handlers, snapshot in self._sources
+        )
+
+    def handlers(self, handlers: HandlerSet) -> Tuple[Callable, ...]:
+        """ The handlers of a collection to call in this process """
+        return tuple(handler for _, handler in self.steps[id(handlers)])
+
+
+class CalledHandlers:
+    """ The handlers called already, as flags for the slots of a plan
+
+    It behaves like a set of handlers. Handlers without a slot in the plan,
+    like the ones called then removed, are kept in a real set.
+
+    Example:
+
+        called = CalledHandlers()
+        called.use(plan)
+        for slot, handler in plan.steps[id(terminate_handlers)]:
+            if not called.flags[slot]:
+                called.flags[slot] = 1
+                handler(event)
+
+    """
+
+    def __init__(self):
+        self.plan: Optional[DispatchPlan] = None
+        self.flags = bytearray()
+        self._others: Set[Callable] = set()
+
+    def __contains__(self, handler: Any) -> bool:
+        slot = self.plan.slots.get(handler) if self.plan else None
+        if slot is not None and self.flags[slot]:
+            return True
+        return handler in self._others
+
+    def __iter__(self) -> Iterator[Callable]:
+        if self.plan:
+            for handler, slot in self.plan.slots.items():
+                if self.flags[slot]:
+                    yield handler
+        yield from self._others
+
+    def __bool__(self) -> bool:
+        return any(self.flags) or bool(self._others)
+
+    def add(self, handler: Callable):
+        slot = self.plan.slots.get(handler) if self.plan else None
+        if slot is None:
+            self._others.add(handler)
+        else:
+            self.flags[slot] = 1
+
+    def clear(self):
+        # In place, since dispatching may hold a reference to it
+        self.flags[:] = bytes(len(self.flags))
+        self._others = set()
+
+    def use(self, plan: DispatchPlan):
+        """ Switch to the slots of plan, keeping track of what was called """
+        called = list(self)
+        self.plan = plan
+        self.flags = bytearray(len(plan.slots))
+        self._others = set()
+        for handler in called:
+            self.add(handler)
@@ -0,0 +1,292 @@
+"""Make sure files written by the program reach the disk before it exits
+
+File objects are held by weak references: once garbage collected, they
+are closed, and so flushed to the OS, which we sync using their name. We
+remember it as an absolute path, since the program may change its working
+directory before exiting. File objects opened on a file descriptor have
+no path, so once closed, there is nothing we can sync them by.
+
+A raw file descriptor can be closed, and its number reused for another
+file, by the time we sync it. So we remember which file it was when it's
+registered, and skip it at exit if it's not the same anymore.
+"""
+
+import os
+import sys
+import time
+import weakref
+import threading
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, IO
+
+from postscriptum.utils import run_concurrently, sort_outcomes
+
+DurableTargetType = Union[str, "os.PathLike[str]", int, IO]
+
+_SYNCFS: List[Optional[Callable[[int], int]]] = []
+
+
+def get_syncfs() -> Optional[Callable[[int], int]]:
+    """ Return libc syncfs() if we are on Linux and it is available, or None
+
+    The lookup is done once, then cached.
+    """
+    if not _SYNCFS:
+        syncfs = None
+        if sys.platform.startswith("linux"):
+            import ctypes
+
+            try:
+                syncfs = ctypes.CDLL(None, use_errno=True).syncfs
+            except (OSError, AttributeError):
+                pass
+        _SYNCFS.append(syncfs)
+    return _SYNCFS[0]
+
+
+def fsync_target(target: DurableTargetType):
+    """ Flush and fsync a path, a file descriptor or a file object
+
+    Raise ValueError for a closed file object that was not opened by path.
+    """
+    if isinstance(target, int):
+        os.fsync(target)
+        return
+
+    if hasattr(target, "fileno"):
+        file_obj: Any = target
+        if not file_obj.closed:
+            file_obj.flush()
+            os.fsync(file_obj.fileno())
+            return
+        # Closing flushed the data to the OS, we just need to fsync it.
+        # An int name is the closed fd, which may be another file now.
+        if not isinstance(getattr(file_obj, "name", None), str):
+            raise ValueError(f"{file_obj!r} is closed, and has no path to sync")
+        target = file_obj.name
+
+    fd = os.open(target, os.O_RDONLY)  # type: ignore
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def file_identity(fd: int) -> Tuple[int, int]:
+    """ The device and inode of the file fd is open on """
+    stat = os.fstat(fd)
+    return stat.st_dev, stat.st_ino
+
+
+def sync_everything(_):
+    """ Ask the OS to write all its buffers to disk """
+    os.sync()  # type: ignore
+
+
+def flush_target(target: DurableTargetType) -> Optional[str]:
+    """ Flush a file object userland buffer, and return a path to the target
+
+    Used before a global sync, which only deals with data the OS knows about.
+    """
+    if isinstance(target, int):
+        return None
+    if hasattr(target, "fileno"):
+        file_obj: Any = target
+        if not file_obj.closed:
+            file_obj.flush()
+        name = getattr(file_obj, "name", None)
+        return name if isinstance(name, str) else None
+    return os.fspath(target)  # type: ignore
+
+
+class DurabilityRegistry:
+    """ Files to flush and fsync in parallel when the program finishes
+
+    Up to sync_all_threshold files, each one is fsynced on its own, using at
+    most max_workers threads. Beyond that, one syncfs() per file system
+    (on Linux), or one os.sync() call, is faster than many fsync().
+
+    Args:
+        max_workers: the maximum number of fsync() running at the same time.
+        sync_all_threshold: the number of files above which we sync whole
+                            file systems.
+        on_terminate: also sync when a terminating signal doesn't result in
+                      an exit (see the exit_on_terminate param of PubSub).
+
+    Example:
+
+        registry = DurabilityRegistry()
+        registry.register("/data/output.csv")
+        report = registry.sync_all(timeout=10)
+
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        sync_all_threshold: int = 64,
+        on_terminate: bool = False,
+    ):
+        self.max_workers = max_workers
+        self.sync_all_threshold = sync_all_threshold
+        self.on_terminate = on_terminate
+        # Keyed to avoid syncing the same file twice. Paths are stored as is,
+        # file objects as (weakref, absolute path or None), and fds as
+        # (fd, file identity).
+        self._targets: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+    def register(self, target: DurableTargetType) -> DurableTargetType:
+        """ Add a path, a file descriptor or a file object to sync, and return it
+
+        File objects are not kept alive, and file descriptors are only
+        synced if they are still open on the same file at exit.
+
+        Raise OSError if target is a file descriptor that is not open, and
+        TypeError if it's a file object that can't be weakly referenced.
+        """
+        entry: Any
+        if isinstance(target, int):
+            key: Any = target
+            entry = (target, file_identity(target))
+        elif hasattr(target, "fileno"):
+            key = id(target)
+            name = getattr(target, "name", None)
+            try:
+                ref = weakref.ref(target)
+            except TypeError:
+                raise TypeError(
+                    f"{target!r} can't be weakly referenced, sync it in a handler"
+                ) from None
+            entry = (ref, os.path.abspath(name) if isinstance(name, str) else None)
+        else:
+            key = os.fspath(target)  # type: ignore
+            entry = target
+        with self._lock:
+            self._targets[key] = entry
+        return target
+
+    def clear(self):
+        with self._lock:
+            self._targets.clear()
+
+    def sync_all(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """ Flush and sync all registered files
+
+        Args:
+            timeout: how long syncing may take. A sync still running after
+                     that is reported as timed out, and left running.
+
+        Return a report with the number of files, the method used,
+        how long it took, the errors, the targets that timed out, and the
+        file descriptors skipped because they are not open on the same file,
+        or closed file objects without a path.
+        """
+        with self._lock:
+            entries = list(self._targets.values())
+        targets, skipped = self._resolve(entries)
+
+        start = time.monotonic()
+        method = "fsync"
+        if len(targets) > self.sync_all_threshold and hasattr(os, "sync"):
+            method, calls = self._global_sync_calls(targets)
+        else:
+            calls = [SyncCall(fsync_target, target) for target in targets]
+
+        outcomes = run_concurrently(
+            calls, max_workers=self.max_workers, timeout=timeout
+        )
+        _, errors, timed_out = sort_outcomes(calls, outcomes)
+
+        return {
+            "files": len(targets),
+            "method": method,
+            "duration": time.monotonic() - start,
+            "errors": errors,
+            "timed_out": timed_out,
+            "skipped": skipped,
+        }
+
+    @staticmethod
+    def _resolve(entries: List[Any]) -> Tuple[List[DurableTargetType], List[str]]:
+        """ The targets to sync, and the descriptions of the ones to skip """
+        targets: List[DurableTargetType] = []
+        skipped: List[str] = []
+        for entry in entries:
+            if not isinstance(entry, tuple):
+                targets.append(entry)
+            elif isinstance(entry[0], int):
+                fd, identity = entry
+                try:
+                    same_file = file_identity(fd) == identity
+                except OSError:
+                    same_file = False
+                if same_file:
+                    targets.append(fd)
+                else:
+                    skipped.append(f"file descriptor {fd}")
+            else:
+                ref, name = entry
+                file_obj = ref()
+                if file_obj is not None and not file_obj.closed:
+                    targets.append(file_obj)
+                # Closed, or collected so closed: only the OS has the data
+                elif name is not None:
+                    targets.append(name)
+                elif file_obj is not None:
+                    skipped.append(f"closed file {file_obj!r}")
+        return targets, skipped
+
+    def _global_sync_calls(
+        self, targets: List[DurableTargetType]
+    ) -> Tuple[str, List["SyncCall"]]:
+        """ Flush all targets, and return calls syncing their file systems
+
+        We use one syncfs() per file system if possible, one os.sync() if not.
+        """
+        paths = []
+        for target in targets:
+            path = flush_target(target)
+            if path:
+                paths.append(path)
+
+        syncfs = get_syncfs()
+        if not syncfs or len(paths) != len(targets):
+            # Raw file descriptors don't tell us which file system they are on
+            return "sync", [SyncCall(sync_everything, "os.sync()")]
+
+        one_path_per_device: Dict[int, str] = {}
+        for path in paths:
+            try:
+                one_path_per_device.setdefault(os.stat(path).st_dev, path)
+            except OSError:
+                return "sync", [SyncCall(sync_everything, "os.sync()")]
+
+        import ctypes
+
+        def sync_file_system(path):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                if syncfs(fd) != 0:  # type: ignore
+                    errno = ctypes.get_errno()
+                    raise OSError(errno, os.strerror(errno), path)
+            finally:
+                os.close(fd)
+
+        calls = [SyncCall(sync_file_system, p) for p in one_path_per_device.values()]
+        return "syncfs", calls
+
+
+class SyncCall:
+    """ A callable syncing one target, remembering what it was for reporting """
+
+    def __init__(self, sync: Callable[[Any], None], target: Any):
+        self.sync = sync
+        self.target = target
+        self.description = target if isinstance(target, str) else repr(target)
+
+    def __call__(self):
+        self.sync(self.target)
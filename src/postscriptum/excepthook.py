@@ -1,12 +1,22 @@
 import sys
+import threading
 
-from typing import List, Type
+from typing import Any, List, Type
 from types import TracebackType
 
-from postscriptum.types import ExceptionHandlerType, PostScripumExceptionHandlerType
+from postscriptum.types import (
+    ExceptionHandlerType,
+    PostScripumExceptionHandlerType,
+    ThreadExceptionHandlerType,
+    PostScripumThreadExceptionHandlerType,
+    UnraisableHookType,
+    PostScripumUnraisableHookType,
+)
 
 
 EXCEPTION_HANDLERS_HISTORY: List[ExceptionHandlerType] = []
+THREAD_EXCEPTION_HANDLERS_HISTORY: List[ThreadExceptionHandlerType] = []
+UNRAISABLE_HANDLERS_HISTORY: List[UnraisableHookType] = []
 
 
 def register_exception_handler(
@@ -81,3 +91,96 @@ def restore_previous_exception_handler():
     handler = EXCEPTION_HANDLERS_HISTORY.pop()
     sys.excepthook = handler
     return replacing_handler
+
+
+def _register_hook(
+    owner: Any, name: str, history: List, handler, call_previous_handler
+):
+    """ Replace owner.name with a wrapper calling handler(args, previous_hook) """
+    previous_hook = getattr(owner, name)
+    history.append(previous_hook)
+
+    def handler_wrapper(args: Any):
+        if call_previous_handler:
+            previous_hook(args)
+        return handler(args, previous_hook)
+
+    handler_wrapper.__wrapped__ = handler  # type: ignore
+
+    setattr(owner, name, handler_wrapper)
+    return previous_hook
+
+
+def _restore_hook(owner: Any, name: str, history: List):
+    replacing_hook = getattr(owner, name)
+    if not history:
+        raise IndexError(f"No previous {name} found to restore")
+    setattr(owner, name, history.pop())
+    return replacing_hook
+
+
+def register_thread_exception_handler(
+    handler: PostScripumThreadExceptionHandlerType, call_previous_handler: bool = True
+) -> ThreadExceptionHandlerType:
+    """ Set the callable to use when an exception is not handled in a thread
+
+    The same as register_exception_handler(), but for threading.excepthook,
+    which is called with a single argument holding the exception and
+    the thread. It needs Python 3.8.
+
+    The previous one is added in the THREAD_EXCEPTION_HANDLERS_HISTORY stack.
+
+    Example:
+
+        def handler(args, previous_except_handler):
+            print(f"{args.thread.name} crashed")
+
+        register_thread_exception_handler(handler)
+
+    """
+    return _register_hook(
+        threading,
+        "excepthook",
+        THREAD_EXCEPTION_HANDLERS_HISTORY,
+        handler,
+        call_previous_handler,
+    )
+
+
+def restore_previous_thread_exception_handler():
+    """ Restore threading.excepthook to contain the previous handler """
+    return _restore_hook(threading, "excepthook", THREAD_EXCEPTION_HANDLERS_HISTORY)
+
+
+def register_unraisable_handler(
+    handler: PostScripumUnraisableHookType, call_previous_handler: bool = True
+) -> UnraisableHookType:
+    """ Set the callable to use for exceptions Python can't raise
+
+    Those happen in __del__ methods or garbage collector callbacks, and
+    go to sys.unraisablehook, called with a single argument holding the
+    exception, an error message and the object involved. It needs
+    Python 3.8.
+
+    The previous one is added in the UNRAISABLE_HANDLERS_HISTORY stack.
+
+    Example:
+
+        def handler(args, previous_unraisable_handler):
+            print(f"Error in {args.object!r}")
+
+        register_unraisable_handler(handler)
+
+    """
+    return _register_hook(
+        sys,
+        "unraisablehook",
+        UNRAISABLE_HANDLERS_HISTORY,
+        handler,
+        call_previous_handler,
+    )
+
+
+def restore_previous_unraisable_handler():
+    """ Restore sys.unraisablehook to contain the previous handler """
+    return _restore_hook(sys, "unraisablehook", UNRAISABLE_HANDLERS_HISTORY)
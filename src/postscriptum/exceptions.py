@@ -8,3 +8,7 @@ class PubSubExit(SystemExit):
         This is done to catch it specifically later and deal with this exit
         as a special case.
     """
+
+
+class LoopUnavailable(RuntimeError):
+    """ The event loop a coroutine must run in is closed, stopped or blocked """
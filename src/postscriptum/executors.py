@@ -0,0 +1,141 @@
+"""Shut down executors together when the program finishes
+
+By default, Python joins the threads of each executor one after the
+other at exit, after running all the work still queued, and waits forever
+for a stuck task. Here, queued work is cancelled, all executors are shut
+down at once, and waited for together until a deadline.
+"""
+
+import sys
+import weakref
+
+from functools import partial, wraps
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from postscriptum.utils import run_concurrently
+
+if TYPE_CHECKING:  # pragma: no cover
+    from concurrent.futures import Executor, Future
+
+
+def describe_call(fn: Callable[..., Any]) -> str:
+    name = getattr(fn, "__qualname__", None) or repr(fn)
+    return f"{getattr(fn, '__module__', None) or '?'}.{name}()"
+
+
+def executor_name(executor: "Executor") -> str:
+    return f"{type(executor).__name__}@{id(executor):x}"
+
+
+class ExecutorRegistry:
+    """ Executors to shut down in bulk, held by weak references
+
+    To know what is still running when we give up waiting, work submitted
+    to registered executors is tracked, by replacing their submit() method.
+
+    Example:
+
+        registry = ExecutorRegistry()
+        pool = registry.register(ThreadPoolExecutor())
+        report = registry.shutdown_all(timeout=10)
+
+    """
+
+    def __init__(self):
+        self._executors: Dict[int, "weakref.ref[Executor]"] = {}
+        # Submitted work, with the id of its executor and its description
+        self._work: "weakref.WeakKeyDictionary[Future, Tuple[int, str]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def __len__(self) -> int:
+        return len(self._executors)
+
+    def register(self, executor: "Executor") -> "Executor":
+        """ Add executor to the ones to shut down, and track its work
+
+        Return executor.
+        """
+        key = id(executor)
+        if key in self._executors:
+            return executor
+
+        def forget(_):
+            self._executors.pop(key, None)
+
+        executor_ref = self._executors[key] = weakref.ref(executor, forget)
+
+        # Not the bound method, which would keep the executor alive
+        submit: Callable[..., "Future"] = type(executor).submit
+        work = self._work
+
+        @wraps(submit)
+        def tracked_submit(fn, *args, **kwargs):
+            tracked = executor_ref()
+            if tracked is None:  # Only reachable through a leaked reference
+                raise RuntimeError("cannot schedule work on a collected executor")
+            future = submit(tracked, fn, *args, **kwargs)
+            work[future] = (key, describe_call(fn))
+            return future
+
+        executor.submit = tracked_submit  # type: ignore
+        return executor
+
+    def shutdown_all(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """ Cancel queued work, then shut down all executors concurrently
+
+        Executors are forgotten afterward.
+
+        Return a report with the executors that shut down in time, how many
+        queued work items were cancelled, the errors, and for each
+        executor that didn't shut down in time, the work it was running.
+        """
+        executors: List["Executor"] = []
+        for ref in self._executors.values():
+            executor = ref()
+            if executor is not None:
+                executors.append(executor)
+        self._executors = {}
+        pending = [future for future in list(self._work) if not future.done()]
+
+        errors: Dict[str, BaseException] = {}
+        for executor in executors:
+            try:
+                if sys.version_info >= (3, 9):
+                    executor.shutdown(wait=False, cancel_futures=True)
+                else:
+                    executor.shutdown(wait=False)
+            except Exception as e:  # pylint: disable=broad-except
+                errors[executor_name(executor)] = e
+        if sys.version_info < (3, 9):
+            for future in pending:
+                future.cancel()
+
+        outcomes = run_concurrently(
+            [partial(executor.shutdown, wait=True) for executor in executors],
+            max_workers=len(executors) or 1,
+            timeout=timeout,
+        )
+
+        report: Dict[str, Any] = {
+            "shutdown": [],
+            "cancelled": sum(future.cancelled() for future in pending),
+            "errors": errors,
+            "still_running": {},
+        }
+        running = [
+            (key, description)
+            for future, (key, description) in list(self._work.items())
+            if future.running()
+        ]
+        for executor, outcome in zip(executors, outcomes):
+            name = executor_name(executor)
+            if outcome.error is not None:
+                errors[name] = outcome.error
+            elif outcome.done:
+                report["shutdown"].append(name)
+            else:
+                report["still_running"][name] = [
+                    description for key, description in running if key == id(executor)
+                ]
+        return report
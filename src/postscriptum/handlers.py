@@ -0,0 +1,194 @@
+"""Handler collections that can be read while other threads write them
+
+A signal, or a crash, can interrupt the code registering a handler, and
+handlers can be registered from any thread. So readers never lock: they
+get a tuple of the handlers, that nobody modifies. Iterating gives you the
+tuple of the moment.
+
+Writers lock to not lose each other's changes, and update an ordered dict
+of the handlers, so that adding or removing one doesn't copy all the
+others. The tuple is made from it again on the first read after a change:
+registering thousands of handlers in a row costs one copy, not thousands.
+The lock is reentrant, since a signal handler may register a handler while
+the main thread is already doing it.
+
+Handlers can also be held by weak references, with WeakHandler, so that
+registering obj.cleanup doesn't keep obj alive.
+"""
+
+import weakref
+import threading
+
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+HandlerTypeVar = TypeVar("HandlerTypeVar", bound=Callable)
+
+
+class HandlerSet(AbstractSet[HandlerTypeVar]):
+    """ An ordered set of handlers, copied on write
+
+    It compares equal to a set with the same handlers.
+
+    Args:
+        handlers: the initial handlers.
+        on_change: called after each change, from the thread making it.
+
+    Example:
+
+        handlers = HandlerSet()
+        handlers.add(print)
+        for handler in handlers:  # A snapshot: adding now changes nothing
+            handler("event")
+
+    """
+
+    def __init__(
+        self,
+        handlers: Iterable[HandlerTypeVar] = (),
+        on_change: Optional[Callable[[], Any]] = None,
+    ):
+        # Insertion ordered, the values are unused
+        self._index: Dict[HandlerTypeVar, None] = dict.fromkeys(handlers)
+        # The version of _index the snapshot was made from. Writers bump
+        # the version after changing _index, so a snapshot made during a
+        # change is labeled with the previous one, and made again later.
+        self._version = 0
+        self._snapshot: Tuple[int, Tuple[HandlerTypeVar, ...]] = (-1, ())
+        self._lock = threading.RLock()
+        self.on_change = on_change
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self.snapshot())!r})"
+
+    def __iter__(self) -> Iterator[HandlerTypeVar]:
+        return iter(self.snapshot())
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, handler: object) -> bool:
+        return handler in self._index
+
+    def snapshot(self) -> Tuple[HandlerTypeVar, ...]:
+        """ The handlers right now, in the order they were added
+
+        The same tuple is returned until the handlers change.
+        """
+        version, snapshot = self._snapshot
+        if version != self._version:
+            version = self._version
+            # A single C call, so other threads can't change _index meanwhile
+            snapshot = tuple(self._index)
+            self._snapshot = (version, snapshot)
+        return snapshot
+
+    def add(self, handler: HandlerTypeVar):
+        with self._lock:
+            if handler not in self._index:
+                self._index[handler] = None
+                self._changed()
+
+    def discard(self, handler: HandlerTypeVar):
+        with self._lock:
+            if handler in self._index:
+                del self._index[handler]
+                self._changed()
+
+    def remove(self, handler: HandlerTypeVar):
+        with self._lock:
+            if handler not in self._index:
+                raise KeyError(handler)
+            self.discard(handler)
+
+    def clear(self):
+        with self._lock:
+            self._index.clear()
+            self._changed()
+
+    def reset_lock(self):
+        """ Use a new lock, in a child process the old one may be held in """
+        self._lock = threading.RLock()
+
+    def _changed(self):
+        self._version += 1
+        if self.on_change is not None:
+            self.on_change()
+
+
+class WeakHandler:
+    """ Call a handler held by a weak reference, if it's still alive
+
+    Bound methods are held with a WeakMethod, so they live as long as
+    their object, and not just as long as the method object.
+
+    Two WeakHandler for the same function, or the same method of the same
+    object, are equal, so a handler registered for several events is still
+    only called once. They are also equal to the handler itself while it's
+    alive, so registering it both weakly and strongly doesn't add it twice.
+
+    Args:
+        handler: the function or bound method to call.
+        on_death: called with this WeakHandler once the handler is
+                  garbage collected.
+
+    Example:
+
+        handlers.add(WeakHandler(session.cleanup, handlers.discard))
+
+    """
+
+    def __init__(
+        self,
+        handler: Callable,
+        on_death: Optional[Callable[["WeakHandler"], Any]] = None,
+    ):
+        callback = None
+        if on_death is not None:
+            callback = lambda _: on_death(self)  # type: ignore
+        if hasattr(handler, "__self__") and hasattr(handler, "__func__"):
+            self.ref: Callable[[], Any] = weakref.WeakMethod(handler, callback)
+            self._key: Any = (id(handler.__self__), handler.__func__)  # type: ignore
+        else:
+            self.ref = weakref.ref(handler, callback)
+            self._key = id(handler)
+        try:
+            # Like the handler, to find it in a set holding the handler itself
+            self._hash = hash(handler)
+        except TypeError:  # A method of an unhashable object, before 3.8
+            self._hash = hash(self._key)
+        # The collections holding it, to remove it from them only
+        self.collections: List[HandlerSet] = []
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.ref()!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, WeakHandler):
+            return self._key == other._key
+        if not callable(other):
+            return NotImplemented
+        handler = self.ref()
+        return handler is not None and handler == other
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    @property
+    def alive(self) -> bool:
+        return self.ref() is not None
+
+    def __call__(self, event: Any):
+        handler = self.ref()
+        if handler is not None:
+            handler(event)
@@ -0,0 +1,205 @@
+"""An append-only binary log of why the process exited, across runs
+
+Each exit is one fixed-size record, written with a single os.write() on a
+file opened with O_APPEND, so processes sharing the same journal don't
+corrupt each other's records.
+
+Since records are appended as processes exit, they are sorted by timestamp
+(give or take concurrent exits), which lets the reader find a time window
+with a bisection instead of a full scan.
+"""
+
+import os
+import mmap
+import time
+import struct
+
+from collections import Counter
+from enum import IntEnum
+from typing import Iterator, NamedTuple, Optional, Union
+
+# timestamp, pid, exit code, fingerprint, reason, signal, padding to 32 bytes
+RECORD = struct.Struct("<dIiQBB6x")
+
+# What the exit code field can hold
+EXIT_CODE_MIN, EXIT_CODE_MAX = -(2 ** 31), 2 ** 31 - 1
+
+# Records can be appended slightly out of order by processes exiting at the
+# same time. We look that many seconds before the requested start of a time
+# window to not miss them.
+ORDERING_SLACK = 60.0
+
+
+class ExitReason(IntEnum):
+    FINISH = 0
+    QUIT = 1
+    TERMINATE = 2
+    CRASH = 3
+
+
+class ExitRecord(NamedTuple):
+    timestamp: float
+    pid: int
+    exit_code: int
+    fingerprint: int
+    reason: ExitReason
+    signal: int
+
+
+def pack_record(
+    reason: ExitReason,
+    exit_code: int = 0,
+    signal: int = 0,
+    fingerprint: int = 0,
+    timestamp: Optional[float] = None,
+    pid: Optional[int] = None,
+) -> bytes:
+    """ Serialize one exit record
+
+    sys.exit() accepts any integer, so exit codes are clamped to fit.
+    """
+    return RECORD.pack(
+        time.time() if timestamp is None else timestamp,
+        os.getpid() if pid is None else pid,
+        min(max(int(exit_code), EXIT_CODE_MIN), EXIT_CODE_MAX),
+        fingerprint,
+        reason,
+        signal,
+    )
+
+
+def unpack_record(values: tuple) -> ExitRecord:
+    timestamp, pid, exit_code, fingerprint, reason, signal = values
+    return ExitRecord(
+        timestamp, pid, exit_code, fingerprint, ExitReason(reason), signal
+    )
+
+
+class ExitJournal:
+    """ Write exit records at the end of a journal file
+
+    Args:
+        path: the journal file. It's created if it doesn't exist.
+
+    Example:
+
+        journal = ExitJournal("/var/lib/myapp/exits.journal")
+        journal.write(ExitReason.CRASH, exit_code=1, fingerprint=fingerprint)
+
+    """
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"]):
+        self.path = os.fspath(path)
+
+    def write(
+        self,
+        reason: ExitReason,
+        exit_code: int = 0,
+        signal: int = 0,
+        fingerprint: int = 0,
+    ):
+        data = pack_record(reason, exit_code, signal, fingerprint)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def reader(self) -> "JournalReader":
+        return JournalReader(self.path)
+
+
+class JournalReader:
+    """ Query an exit journal
+
+    The file is memory mapped, and read without parsing records outside of
+    the requested time window. A truncated last record, from a process
+    killed while writing, is ignored.
+
+    Example:
+
+        with JournalReader("exits.journal") as reader:
+            crashes = reader.count_by_fingerprint(since=time.time() - 3600)
+
+    """
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"]):
+        self.path = os.fspath(path)
+        self._buffer: Union[mmap.mmap, bytes] = b""
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = len(self._buffer) // RECORD.size
+
+    def __enter__(self) -> "JournalReader":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._buffer = b""
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[ExitRecord]:
+        return self.since(float("-inf"))
+
+    def timestamp_at(self, index: int) -> float:
+        return struct.unpack_from("<d", self._buffer, index * RECORD.size)[0]
+
+    def bisect(self, timestamp: float) -> int:
+        """ Index of the first record at or after timestamp """
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamp_at(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def since(self, timestamp: float) -> Iterator[ExitRecord]:
+        """ Yield the records written at or after timestamp """
+        start = self.bisect(timestamp - ORDERING_SLACK) * RECORD.size
+        end = self._count * RECORD.size
+        view = memoryview(self._buffer)[start:end]
+        try:
+            for values in RECORD.iter_unpack(view):
+                if values[0] >= timestamp:
+                    yield unpack_record(values)
+        finally:
+            view.release()
+
+    def count_by_fingerprint(
+        self, since: float, reason: Optional[ExitReason] = ExitReason.CRASH
+    ) -> Counter:
+        """ Count the exits since a timestamp, grouped by fingerprint
+
+        Args:
+            since: the timestamp where to start counting.
+            reason: only count exits for this reason. None means all of them.
+
+        Example:
+
+            # Crashes in the last hour
+            reader.count_by_fingerprint(time.time() - 3600)
+
+        """
+        counter: Counter = Counter()
+        start = self.bisect(since - ORDERING_SLACK) * RECORD.size
+        end = self._count * RECORD.size
+        view = memoryview(self._buffer)[start:end]
+        try:
+            for timestamp, _, _, fingerprint, record_reason, _ in RECORD.iter_unpack(
+                view
+            ):
+                if timestamp >= since and (reason is None or record_reason == reason):
+                    counter[fingerprint] += 1
+        finally:
+            view.release()
+        return counter
@@ -0,0 +1,109 @@
+"""Drain logging.handlers.QueueListener queues before the program exits
+"""
+
+import queue
+import threading
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from postscriptum.utils import Deadline
+
+if TYPE_CHECKING:  # pragma: no cover
+    from logging.handlers import QueueListener
+
+
+def safe_qsize(a_queue: Any) -> int:
+    """ Approximate size of a queue, 0 if the platform can't tell """
+    try:
+        return a_queue.qsize()
+    except NotImplementedError:  # multiprocessing queues on macOS
+        return 0
+
+
+def drain_listener(
+    listener: "QueueListener", deadline: Deadline, batch_size: int = 100
+) -> Tuple[int, int]:
+    """ Let listener handle all queued records before deadline
+
+    If the listener thread is running, it's asked to stop after processing
+    what is queued. Records left after that, or all of them if the listener
+    is not running, are handled in the current thread, batch_size at a time,
+    checking the deadline between batches.
+
+    Return how many records were handled, and how many were dropped.
+    """
+    queued = safe_qsize(listener.queue)
+    thread: Optional[threading.Thread] = getattr(listener, "_thread", None)
+    if thread is not None and thread.is_alive():
+        listener.enqueue_sentinel()
+        thread.join(deadline.remaining())
+        if thread.is_alive():
+            # The thread is a daemon, it won't prevent exiting
+            left = max(0, safe_qsize(listener.queue) - 1)  # - 1 for the sentinel
+            return max(0, queued - left), left
+        listener._thread = None  # type: ignore
+
+    handled = queued - safe_qsize(listener.queue)
+    while not deadline.expired:
+        batch = []
+        for _ in range(batch_size):
+            try:
+                record = listener.dequeue(False)
+            except queue.Empty:
+                break
+            if record is not listener._sentinel:  # type: ignore
+                batch.append(record)
+        if not batch:
+            break
+        for record in batch:
+            listener.handle(record)
+        handled += len(batch)
+
+    return max(0, handled), safe_qsize(listener.queue)
+
+
+class LogListenerRegistry:
+    """ QueueListener objects to drain when the program finishes
+
+    Args:
+        batch_size: how many records we handle between two deadline checks
+                    when we drain a queue ourself.
+
+    Example:
+
+        registry = LogListenerRegistry()
+        registry.register(listener)
+        report = registry.drain_all(timeout=2)
+
+    """
+
+    def __init__(self, batch_size: int = 100):
+        self.batch_size = batch_size
+        self._listeners: List["QueueListener"] = []
+
+    def __len__(self) -> int:
+        return len(self._listeners)
+
+    def register(self, listener: "QueueListener") -> "QueueListener":
+        """ Add listener to the ones to drain, and return it """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+        return listener
+
+    def drain_all(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """ Drain all listeners, one after the other, before timeout
+
+        Listeners are forgotten afterward.
+
+        Return a report with the number of records handled and dropped.
+        """
+        deadline = Deadline(timeout)
+        listeners, self._listeners = self._listeners, []
+        handled = dropped = 0
+        for listener in listeners:
+            listener_handled, listener_dropped = drain_listener(
+                listener, deadline, self.batch_size
+            )
+            handled += listener_handled
+            dropped += listener_dropped
+        return {"listeners": len(listeners), "handled": handled, "dropped": dropped}
@@ -81,6 +81,20 @@ Or as a context manager:
 
 In that case, don't call ``ps.start()``, it is done for you.
 
+Handlers only needed while some code runs can be registered in a scope,
+from any thread. They are removed when the block ends, without
+reinstalling signal handlers or hooks:
+
+::
+
+    with ps.scope() as scope:
+
+        @scope.on_terminate()
+        def _(event):
+            os.unlink(partial_file)
+
+        upload(partial_file)
+
 
 All decorators are stackable. If you use other decorators than the ones
 from postcriptum, put postcriptum decorators at the top:
@@ -103,6 +117,25 @@ Alternatively, you can add the handler imperatively:
 ``ps.add_quit_handler(handler)``. All ``on_*`` method have their
 imperative equivalent.
 
+Handlers are held by strong references, so registering ``obj.cleanup``
+keeps ``obj`` alive until the program exits. For handlers tied to objects
+that come and go, like sessions, pass ``weak=True``:
+
+::
+
+    ps.add_finish_handler(session.cleanup, weak=True)
+
+The handler is removed once ``session`` is garbage collected.
+``ps.handler_metrics()`` tells you how many handlers are registered for
+each event, and how many weak ones are alive.
+
+If the program forks, like prefork servers do, the PubSub is copied into
+each worker. To run a handler only in the original process, or only in
+the forked ones, use ``@ps.on_finish(scope="master")`` or
+``@ps.on_finish(scope="worker")``. ``ps.is_worker`` tells you where you are.
+A handler registered for several events has the same scope for all of
+them: registering it again with another one raises ValueError.
+
 The event is a dictionary that can contain:
 
 For ``on_crash`` handlers:
@@ -110,6 +143,10 @@ For ``on_crash`` handlers:
 - **exception**: the value of the exception that lead to the crash
 - **traceback**: the traceback at the moment of the crash
 - **stacktrace**: a function to get the formatted stack trace as a string
+- **fingerprint**: a 64 bits integer identifying the crash, the same for
+  the same exception type raised through the same functions. Use
+  ``postscriptum.dedup.CrashReportSink`` as a handler to write only one
+  report per fingerprint, even across processes.
 - **previous_exception_handler**: the callable that was the exception handler
                                  before we called setup()
 
@@ -122,23 +159,156 @@ For ``on_terminate`` handlers:
   we called setup()
 - **exit**: a callable you can use to manually trigger the exit.
 
+For ``on_thread_crash`` handlers, called when an exception is not handled
+in a thread other than the main one (from Python 3.8):
+
+- **exception**, **traceback**, **stacktrace**, **fingerprint**: the same as
+  for ``on_crash``
+- **thread**: the thread that crashed, or None if it's already gone
+- **thread_name** and **thread_ident**: its name and identifier
+- **suppressed**: how many crashes with the same fingerprint were not
+  passed to handlers since the last one
+
+Thread crashes don't end the program, so those handlers run for each crash,
+unlike other handlers. However, they run at most 10 times per second for
+the same fingerprint. Change that with ``ps.thread_crashes.rate`` and
+``ps.thread_crashes.period``. Counts are in
+``shutdown_report["thread_crashes"]``.
+
+For ``on_unraisable`` handlers, called for exceptions Python can't raise,
+like the ones in ``__del__`` methods or garbage collector callbacks (from
+Python 3.8):
+
+- **exception**, **traceback**, **stacktrace**: the same as for ``on_crash``
+- **error_message**: the message Python would print, or None
+- **object**: the object involved, if any. Don't keep a reference to it.
+- **key**: the exception type, the type of the object and where the
+  exception was raised, as strings. Unraisables with the same key are
+  considered duplicates.
+- **suppressed**: how many duplicates were not passed to handlers since
+  the last one
+
+Those can be very frequent, so by default handlers run once per minute per
+key. They are configured with ``ps.unraisables.rate``, ``period`` and
+``sample_rate``, to only pass a random share of them. The previous hook,
+which prints the error, is called for the ones passed to handlers only.
+All of them are counted in ``shutdown_report["unraisables"]``.
+
+For ``on_async_error`` handlers, called for errors asyncio passes to the
+exception handler of a loop given to ``ps.watch_loop()``, like exceptions
+in tasks nobody awaited:
+
+- **message**: the asyncio error message
+- **exception**: the exception, or None
+- **stacktrace**: a function to get the formatted stack trace as a string
+- **context**: the whole asyncio context dictionary
+- **loop**: the loop the error happened in
+- **key**: the exception type and where it was raised, or the message if
+  there is no exception. Errors with the same key are duplicates.
+- **suppressed**: how many duplicates were not passed to handlers since
+  the last one
+
+Those handlers run in a background thread, so they never block the loop.
+Duplicates are throttled with ``ps.async_errors`` like unraisables, and
+counted in ``shutdown_report["async_errors"]``. Set
+``ps.async_error_limit = 10`` to crash the program on the 10th async
+error, calling ``on_crash`` handlers.
+
 For ``on_quit`` handlers:
 
 - **exit_code**: the code passed to ``SystemExit``/``sys.exit``.
 - **exit**: a callable you can use to manually trigger the exit.
 
+For ``on_child_crash`` handlers, called when a worker of a pool using
+``ps.worker_initializer()`` as initializer crashes, is terminated, or dies
+without warning:
+
+- **pid**: the pid of the worker
+- **reason**: "crash", "terminate", "initializer" if your own initializer
+  failed, "killed" if it died from a signal it could not handle, like
+  SIGKILL or SIGSEGV, or "exit" if it exited with an error code
+- **exception_type**, **fingerprint**, **stacktrace**: what the crash was
+- **signal**: the signal that terminated or killed the worker
+- **exit_code**: the code it exited with, for "exit"
+
 For ``on_finish`` handlers:
 
 - The contex is empty if the program ends cleanly, otherwise,
   it will contain the same entries as one of the events above.
 
-Currently, postscriptum does not provide hooks for
+For asyncio programs, use ``ps.register_loop()`` from your main
+coroutine. On terminate, before ``on_finish`` handlers, the tasks of the
+loop are cancelled and waited for, except the ones given to
+``ps.protect_task(task)``.
+
+Threads, coroutines and select() loops can watch ``ps.stopping`` to
+know when to stop working. It's set first thing on terminate, quit or
+crash, before any handler, and when the program finishes:
+
+::
+
+    while not ps.stopping.wait(timeout=1):  # In a thread
+        do_work()
+
+    await ps.stopping  # In a coroutine
+
+    selector.register(ps.stopping, selectors.EVENT_READ)  # It has a fileno()
+
+It's cleared if the program holds instead of exiting.
+
+To make sure a block is not interrupted by a terminating signal, use
+``with ps.critical():``. The signal is handled when the block ends.
 
-- ``sys.unraisablehook``
-- exception occuring in other threads (``threading.excepthook`` from 3.8
-  will allow us to do that later)
-- unhandled exception errors in unawaited asyncio (not sure we should do
-  something though)
+Child processes registered with ``ps.register_child(popen)`` are
+terminated together once ``on_finish`` handlers have run, so they don't
+outlive the program.
+
+``concurrent.futures`` executors registered with
+``ps.register_executor(pool)`` are shut down together right after that,
+cancelling the work they didn't start, and without waiting past the
+shutdown deadline for stuck tasks. Then threads registered with
+``ps.register_thread(thread, stop_event)`` are asked to stop, and all
+non-daemon threads are waited for until the deadline. The stacks of the
+ones that are stuck are printed. Last, ``multiprocessing.Queue`` objects
+registered with ``ps.register_queue(queue)`` are flushed, without
+waiting past the deadline if nobody reads them.
+
+Many cleanups of the same kind, like removing temporary files, can be
+done by batches right after that, with one function call per batch instead
+of one handler per file:
+
+::
+
+    temporary_files = ps.register_bulk_cleanup(remove_paths, batch_size=500)
+    temporary_files.append(path)  # remove_paths([(path,), ...]) at exit
+
+Resources can be closed for you right after that:
+
+::
+
+    pool = ps.register_closeable(create_pool(), group="db")
+
+Anything with a ``close()``, ``aclose()`` or ``shutdown()`` method works.
+Close coroutines run in the event loop the object was registered from, if
+it still runs in another thread, since that's the loop the object belongs to.
+Groups are closed last created first, objects in the same group concurrently.
+What happened is stored in ``ps.shutdown_report``, that ``always``
+handlers can read.
+
+Files can be flushed and fsynced in parallel right after that, with
+``ps.register_durable(path_or_file)``. Pass ``PubSub(shutdown_timeout=10)``
+to make sure those steps don't take longer than 10 seconds overall.
+
+Last, ``logging.handlers.QueueListener`` objects registered with
+``ps.register_log_listener(listener)`` are drained, so that records logged by
+any handler are not lost.
+
+To keep track of why the program exited across runs, use
+``ps.enable_journal(path)``. Each exit appends a small binary record to
+the file, that ``postscriptum.journal.JournalReader`` can query.
+
+To avoid hammering shared resources when the program crashes in a loop
+after each restart, use ``ps.detect_crash_loops(path)`` before ``start()``.
 
 .. warning::
     You must be very careful about the code you put in handlers. If you mess
@@ -148,12 +318,20 @@ Currently, postscriptum does not provide hooks for
 
 """
 
+import os
+import sys
+import time
+import struct
+import itertools
 import atexit
 import signal
+import weakref
+import threading
 
 from functools import partial
+from traceback import print_exc
 
-from typing import Set, Type, Callable
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set, Tuple, Type, Callable
 from types import TracebackType, FrameType
 
 from postscriptum.types import (
@@ -162,6 +340,10 @@ from postscriptum.types import (
     TerminateHandlerType,
     QuitHandlerType,
     CrashHandlerType,
+    ChildCrashHandlerType,
+    ThreadCrashHandlerType,
+    UnraisableHandlerType,
+    AsyncErrorHandlerType,
     FinishHandlerType,
     HoldHandlerType,
     AlwaysHandlerType,
@@ -170,24 +352,71 @@ from postscriptum.types import (
     EventTypeVar,
     TerminateEventType,
     CrashEventType,
+    ThreadCrashEventType,
+    UnraisableEventType,
+    AsyncErrorEventType,
     QuitEventType,
-    OrderedSetType,
 )
 
 from postscriptum.system_exit import catch_system_exit
+from postscriptum.children import ChildRegistry, ChildType
+from postscriptum.closeables import CloseableRegistry, DEFAULT_GROUP
+from postscriptum.bulk import BatchFunctionType, BulkCleanup, BulkCleanupRegistry
+from postscriptum.executors import ExecutorRegistry
+from postscriptum.threads import StopType, ThreadRegistry
+from postscriptum.queues import QueueRegistry
+from postscriptum.stopping import StopToken
+from postscriptum.critical import CriticalSection
+from postscriptum.handlers import HandlerSet, WeakHandler
+from postscriptum.dispatch import CalledHandlers, DispatchPlan
+from postscriptum.scopes import (
+    HandlerScope,
+    SCOPE_BOTH,
+    SCOPE_MASTER,
+    SCOPE_WORKER,
+    HANDLER_SCOPES,
+)
+from postscriptum.durability import DurabilityRegistry, DurableTargetType
+from postscriptum.log_listeners import LogListenerRegistry
+from postscriptum.journal import ExitJournal, ExitReason
+from postscriptum.crash_loop import CrashLoop, CrashLoopGuard
+from postscriptum.workers import ChildCrashListener
+from postscriptum.throttle import Throttle
 from postscriptum.excepthook import (
     register_exception_handler,
     restore_previous_exception_handler,
+    register_thread_exception_handler,
+    restore_previous_thread_exception_handler,
+    register_unraisable_handler,
+    restore_previous_unraisable_handler,
 )
 from postscriptum.signals import (
     register_signals_handler,
     restore_previous_signals_handlers,
 )
 from postscriptum.exceptions import PubSubExit
-from postscriptum.utils import create_handler_decorator, force_exit, format_stacktrace
+from postscriptum.utils import (
+    create_handler_decorator,
+    force_exit,
+    format_stacktrace,
+    fingerprint_exception,
+    raised_at,
+    Deadline,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    # Slow to import, and only needed by programs using them, which did
+    import asyncio
+    import multiprocessing.queues
+
+    from concurrent.futures import Executor
+    from logging.handlers import QueueListener
+
+    from postscriptum.aio import EventDispatcher, LoopRegistry
 
 PROCESS_TERMINATING_SIGNAL = ("SIGINT", "SIGQUIT", "SIGTERM", "SIGBREAK")
 
+
 # TODO: test examples
 # TODO: test overriding setup/teardown method with noop
 # TODO: test normal finish
@@ -204,9 +433,6 @@ PROCESS_TERMINATING_SIGNAL = ("SIGINT", "SIGQUIT", "SIGTERM", "SIGBREAK")
 # TODO: improve error messages
 # TODO: e2e on decorators
 # TODO: test on azur cloud
-# TODO: unraisable hook: https://docs.python.org/3/library/sys.html#sys.unraisablehook
-# TODO: threading excepthook: threading.excepthook()
-# TODO: default for unhandled error in asyncio
 # TODO: more doc
 # TODO: write docstrings
 
@@ -222,54 +448,760 @@ class PubSub:
         call_previous_exception_handler: bool = True,
         exit_on_terminate: bool = True,
         exit_after_quit_handlers: bool = True,
+        shutdown_timeout: Optional[float] = None,
     ):
 
         self.exit_after_quit_handlers = exit_after_quit_handlers
+        # How long the built-in shutdown stages may take, from the moment
+        # the program starts to finish. None means no limit.
+        self.shutdown_timeout = shutdown_timeout
         self.exit_on_terminate = exit_on_terminate
         self.call_previous_exception_handlers = call_previous_exception_handler
 
         # Called when terminate, crash or quit results in an exit
-        self.finish_handlers = OrderedSetType[FinishHandlerType]()
+        self.finish_handlers = HandlerSet[FinishHandlerType]()
         # Called on SIGINT (so Ctrl + C), SIGTERM, SIGQUIT and SIGBREAK
-        self.terminate_handlers = OrderedSetType[TerminateHandlerType]()
+        self.terminate_handlers = HandlerSet[TerminateHandlerType]()
         # Call when there is an unhandled exception
-        self.crash_handlers = OrderedSetType[CrashHandlerType]()
+        self.crash_handlers = HandlerSet[CrashHandlerType]()
         # Call on sys.exit and manual raise of SystemExit
-        self.quit_handlers = OrderedSetType[QuitHandlerType]()
+        self.quit_handlers = HandlerSet[QuitHandlerType]()
         # Always called
-        self.always_handlers = OrderedSetType[AlwaysHandlerType]()
+        self.always_handlers = HandlerSet[AlwaysHandlerType]()
         # Called when the user chose to abort exit
-        self.hold_handlers = OrderedSetType[HoldHandlerType]()
+        self.hold_handlers = HandlerSet[HoldHandlerType]()
+        # Called when a worker started with worker_initializer() crashes
+        self.child_crash_handlers = HandlerSet[ChildCrashHandlerType]()
+        self._child_crash_listener: Optional[ChildCrashListener] = None
+        # Called when an exception is not handled in a thread
+        self.thread_crash_handlers = HandlerSet[ThreadCrashHandlerType]()
+        # How often thread crash handlers may run for the same crash
+        self.thread_crashes = Throttle(rate=10, period=1.0)
+        # Called for exceptions Python can't raise, like in __del__
+        self.unraisable_handlers = HandlerSet[UnraisableHandlerType]()
+        # How often unraisable handlers may run for duplicates
+        self.unraisables = Throttle(rate=1, period=60.0)
+        # Called for errors asyncio passes to the loop exception handler
+        self.async_error_handlers = HandlerSet[AsyncErrorHandlerType]()
+        # How often async error handlers may run for duplicates
+        self.async_errors = Throttle(rate=1, period=60.0)
+        # Crash after that many async errors. None means never.
+        self.async_error_limit: Optional[int] = None
+        self._async_error_counter = itertools.count(1)
+        # Created by watch_loop(), since only asyncio programs need it
+        self._async_dispatcher: Optional["EventDispatcher"] = None
+        # Loops we handle errors for, and their previous exception handler
+        self._watched_loops: "weakref.WeakKeyDictionary[Any, Any]" = (
+            weakref.WeakKeyDictionary()
+        )
 
-        # A set of already called handlers to avoid duplicate calls
-        self._called_handlers: Set[EventHandlerType] = set()  # type: ignore
+        # Child processes to terminate once the finish handlers have been called
+        self.children = ChildRegistry()
+        # Executors to shut down once the finish handlers have been called
+        self.executors = ExecutorRegistry()
+        # Threads to stop, and wait for with a deadline, after executors
+        self.threads = ThreadRegistry()
+        self._thread_shutdown_hooked = False
+        # Multiprocessing queues to flush, once threads stopped putting items
+        self.queues = QueueRegistry()
+        # Set as soon as the program starts to stop, for workers to watch
+        self.stopping = StopToken()
+        # Blocks during which terminating signals wait, see critical()
+        self._critical = CriticalSection(PROCESS_TERMINATING_SIGNAL)
+        # Set when threads are stuck and we exit without waiting for them
+        self._forced_exit = False
+        # Functions to call with batches of arguments, before closing
+        self.bulk_cleanups = BulkCleanupRegistry()
+        # Resources to close once the finish handlers have been called
+        self.closeables = CloseableRegistry()
+        # Files to flush and fsync once the finish handlers have been called
+        self.durables = DurabilityRegistry()
+        # Event loops to cancel the tasks of on terminate, see register_loop()
+        self.loops: Optional["LoopRegistry"] = None
+        # Logging queues to drain last, so that every handler can log
+        self.log_listeners = LogListenerRegistry()
+        # Where to record why we exited, see enable_journal()
+        self.journal: Optional[ExitJournal] = None
+        # Where to keep the recent crashes, see detect_crash_loops()
+        self.crash_loop_guard: Optional[CrashLoopGuard] = None
+        self.crash_loop_policy = "backoff"
+        # What the built-in shutdown stages did, filled at finish
+        self.shutdown_report: Dict[str, Any] = {}
+
+        # The already called handlers, to avoid duplicate calls
+        self._called_handlers = CalledHandlers()
+        # What to call for each event, see _compile_plan()
+        self._plan: Optional[DispatchPlan] = None
         # We use this to avoid registering handlers twice
         self._started = False
+        # Returned by __call__(), and reused
+        self._catcher: Optional[catch_system_exit] = None
+        # Set when the program starts to finish, see shutdown_deadline()
+        self._shutdown_deadline: Optional[Deadline] = None
+        # The exit has been written in the journal and history already
+        self._exit_recorded = False
+        # Set by the crash loop check on the first start()
+        self.crash_loop: Optional[CrashLoop] = None
+        self.degraded = False
+        self._crash_loop_checked = False
+
+        # Handlers may be added and removed from any thread, see scope()
+        self._handlers_lock = threading.RLock()
+        # Weak handlers removed since their function died
+        self._collected_handlers = 0
+        # Handlers not meant to run in all processes, see _add_handler()
+        self._master_only_handlers: Set[EventHandlerType] = set()  # type: ignore
+        self._worker_only_handlers: Set[EventHandlerType] = set()  # type: ignore
+        # The ones not to call in the current process
+        self._excluded_handlers = self._worker_only_handlers
+        self._is_worker = False
+        for handlers in self._handler_collections():
+            handlers.on_change = self._invalidate_plan
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(  # type: ignore
+                after_in_child=partial(_after_fork_in_child, weakref.ref(self))
+            )
 
     @property
     def started(self) -> bool:
         """ Has start() been called already? Read only """
         return self._started
 
-    def on_terminate(self, func=None):
-        return create_handler_decorator(
-            func, self.terminate_handlers.add, "on_terminate"
-        )
-
-    def on_quit(self, func=None):
-        return create_handler_decorator(func, self.quit_handlers.add, "on_quit")
+    @property
+    def is_worker(self) -> bool:
+        """ Are we in a process forked after the PubSub was created? Read only """
+        return self._is_worker
 
-    def on_finish(self, func=None):
-        return create_handler_decorator(func, self.finish_handlers.add, "on_finish")
+    def _add_handler(
+        self, handlers, handler, scope: str = SCOPE_BOTH, weak: bool = False
+    ):
+        """ Add handler to handlers, only running in processes matching scope
+
+        The PubSub may be copied in processes forked from the one that
+        created it, like prefork servers do. By default, handlers run in
+        all of them, but "master" handlers run only in the original process
+        and "worker" handlers only in the forked ones.
+
+        With weak=True, handler is held by a weak reference, and removed
+        once it's garbage collected. For a bound method, that's when its
+        object is.
+
+        The scope of a handler is shared by all the events it handles, so
+        registering it again with another scope raises ValueError.
+
+        Return False if handler was already in handlers.
+        """
+        if scope not in HANDLER_SCOPES:
+            raise ValueError(
+                f"scope must be one of {', '.join(HANDLER_SCOPES)}, not {scope!r}"
+            )
+        if weak:
+            handler = WeakHandler(handler, self._forget_weak_handler)
+        with self._handlers_lock:
+            current = self._handler_scope(handler)
+            if current is not None and current != scope:
+                raise ValueError(
+                    f"{handler!r} is already registered with scope {current!r},"
+                    f" not {scope!r}"
+                )
+            added = handler not in handlers
+            if not added:
+                return False
+            handlers.add(handler)
+            if weak:
+                handler.collections.append(handlers)
+            if scope == SCOPE_MASTER:
+                self._master_only_handlers.add(handler)
+            elif scope == SCOPE_WORKER:
+                self._worker_only_handlers.add(handler)
+            self._invalidate_plan()
+        return True
 
-    def on_crash(self, func=None):
-        return create_handler_decorator(func, self.crash_handlers.add, "on_crash")
+    def _handler_scope(self, handler) -> Optional[str]:
+        """ The scope handler was registered with, None if it's not registered """
+        if not any(handler in handlers for handlers in self._handler_collections()):
+            return None
+        if handler in self._master_only_handlers:
+            return SCOPE_MASTER
+        if handler in self._worker_only_handlers:
+            return SCOPE_WORKER
+        return SCOPE_BOTH
+
+    def _remove_handler(self, handlers, handler):
+        with self._handlers_lock:
+            handlers.discard(handler)
+            # Its scope is shared by all the events it handles
+            if not any(handler in other for other in self._handler_collections()):
+                self._master_only_handlers.discard(handler)
+                self._worker_only_handlers.discard(handler)
+            self._invalidate_plan()
+
+    def _forget_weak_handler(self, handler: WeakHandler):
+        """ Called when the function behind a weak handler is collected """
+        with self._handlers_lock:
+            # It's in no other collection, so there's nothing else to check
+            for handlers in handler.collections:
+                if handler in handlers:
+                    handlers.discard(handler)
+                    self._collected_handlers += 1
+            handler.collections.clear()
+            self._master_only_handlers.discard(handler)
+            self._worker_only_handlers.discard(handler)
+            self._invalidate_plan()
+
+    def handler_metrics(self) -> Dict[str, int]:
+        """ How many handlers are registered, by event, and weak ones
+
+        "weak" is how many weak handlers are still alive, and "collected"
+        how many were removed since the PubSub was created, because their
+        function was garbage collected. Both count one per event.
+        """
+        metrics = {}
+        weak = 0
+        for name, handlers in self._named_handler_collections().items():
+            snapshot = handlers.snapshot()
+            metrics[name] = len(snapshot)
+            weak += sum(
+                isinstance(handler, WeakHandler) and handler.alive
+                for handler in snapshot
+            )
+        metrics["weak"] = weak
+        metrics["collected"] = self._collected_handlers
+        return metrics
+
+    def _named_handler_collections(self) -> Dict[str, HandlerSet]:
+        return {
+            "terminate": self.terminate_handlers,
+            "quit": self.quit_handlers,
+            "finish": self.finish_handlers,
+            "crash": self.crash_handlers,
+            "hold": self.hold_handlers,
+            "always": self.always_handlers,
+            "child_crash": self.child_crash_handlers,
+            "thread_crash": self.thread_crash_handlers,
+            "unraisable": self.unraisable_handlers,
+            "async_error": self.async_error_handlers,
+        }
 
-    def on_hold(self, func=None):
-        return create_handler_decorator(func, self.hold_handlers.add, "on_hold")
+    def _handler_collections(self):
+        return tuple(self._named_handler_collections().values())
+
+    def scope(self) -> HandlerScope:
+        """ Register handlers for the duration of a with block only
+
+        Unlike start() and stop(), this doesn't touch signal handlers or
+        hooks: handlers are just added, then removed when the block ends.
+        A handler already registered outside of the scope is left alone,
+        and can't be given another process scope inside it.
+
+        Example:
+
+            with ps.scope() as scope:
+                scope.on_terminate()(delete_partial_file)
+                upload()
+
+        """
+        return HandlerScope(self)
+
+    def add_terminate_handler(
+        self, handler: Callable, scope: str = SCOPE_BOTH, weak: bool = False
+    ) -> Callable:
+        self._add_handler(self.terminate_handlers, handler, scope=scope, weak=weak)
+        return handler
+
+    def on_terminate(self, func=None, scope: str = SCOPE_BOTH, weak: bool = False):
+        add_handler = partial(self.add_terminate_handler, scope=scope, weak=weak)
+        return create_handler_decorator(func, add_handler, "on_terminate")
+
+    def add_quit_handler(
+        self, handler: Callable, scope: str = SCOPE_BOTH, weak: bool = False
+    ) -> Callable:
+        self._add_handler(self.quit_handlers, handler, scope=scope, weak=weak)
+        return handler
+
+    def on_quit(self, func=None, scope: str = SCOPE_BOTH, weak: bool = False):
+        add_handler = partial(self.add_quit_handler, scope=scope, weak=weak)
+        return create_handler_decorator(func, add_handler, "on_quit")
+
+    def add_finish_handler(
+        self, handler: Callable, scope: str = SCOPE_BOTH, weak: bool = False
+    ) -> Callable:
+        self._add_handler(self.finish_handlers, handler, scope=scope, weak=weak)
+        return handler
+
+    def on_finish(self, func=None, scope: str = SCOPE_BOTH, weak: bool = False):
+        add_handler = partial(self.add_finish_handler, scope=scope, weak=weak)
+        return create_handler_decorator(func, add_handler, "on_finish")
+
+    def add_crash_handler(
+        self, handler: Callable, scope: str = SCOPE_BOTH, weak: bool = False
+    ) -> Callable:
+        self._add_handler(self.crash_handlers, handler, scope=scope, weak=weak)
+        return handler
+
+    def on_crash(self, func=None, scope: str = SCOPE_BOTH, weak: bool = False):
+        add_handler = partial(self.add_crash_handler, scope=scope, weak=weak)
+        return create_handler_decorator(func, add_handler, "on_crash")
+
+    def add_hold_handler(
+        self, handler: Callable, scope: str = SCOPE_BOTH, weak: bool = False
+    ) -> Callable:
+        self._add_handler(self.hold_handlers, handler, scope=scope, weak=weak)
+        return handler
+
+    def on_hold(self, func=None, scope: str = SCOPE_BOTH, weak: bool = False):
+        add_handler = partial(self.add_hold_handler, scope=scope, weak=weak)
+        return create_handler_decorator(func, add_handler, "on_hold")
+
+    def add_always_handler(
+        self, handler: Callable, scope: str = SCOPE_BOTH, weak: bool = False
+    ) -> Callable:
+        self._add_handler(self.always_handlers, handler, scope=scope, weak=weak)
+        return handler
+
+    def always(self, func=None, scope: str = SCOPE_BOTH, weak: bool = False):
+        add_handler = partial(self.add_always_handler, scope=scope, weak=weak)
+        return create_handler_decorator(func, add_handler, "always")
+
+    def add_child_crash_handler(
+        self, handler: Callable, scope: str = SCOPE_BOTH, weak: bool = False
+    ) -> Callable:
+        self._add_handler(self.child_crash_handlers, handler, scope=scope, weak=weak)
+        return handler
+
+    def on_child_crash(self, func=None, scope: str = SCOPE_BOTH, weak: bool = False):
+        add_handler = partial(self.add_child_crash_handler, scope=scope, weak=weak)
+        return create_handler_decorator(func, add_handler, "on_child_crash")
+
+    def add_thread_crash_handler(
+        self, handler: Callable, scope: str = SCOPE_BOTH, weak: bool = False
+    ) -> Callable:
+        self._add_handler(self.thread_crash_handlers, handler, scope=scope, weak=weak)
+        return handler
+
+    def on_thread_crash(self, func=None, scope: str = SCOPE_BOTH, weak: bool = False):
+        add_handler = partial(self.add_thread_crash_handler, scope=scope, weak=weak)
+        return create_handler_decorator(func, add_handler, "on_thread_crash")
+
+    def add_unraisable_handler(
+        self, handler: Callable, scope: str = SCOPE_BOTH, weak: bool = False
+    ) -> Callable:
+        self._add_handler(self.unraisable_handlers, handler, scope=scope, weak=weak)
+        return handler
+
+    def on_unraisable(self, func=None, scope: str = SCOPE_BOTH, weak: bool = False):
+        add_handler = partial(self.add_unraisable_handler, scope=scope, weak=weak)
+        return create_handler_decorator(func, add_handler, "on_unraisable")
+
+    def add_async_error_handler(
+        self, handler: Callable, scope: str = SCOPE_BOTH, weak: bool = False
+    ) -> Callable:
+        self._add_handler(self.async_error_handlers, handler, scope=scope, weak=weak)
+        return handler
+
+    def on_async_error(self, func=None, scope: str = SCOPE_BOTH, weak: bool = False):
+        add_handler = partial(self.add_async_error_handler, scope=scope, weak=weak)
+        return create_handler_decorator(func, add_handler, "on_async_error")
+
+    def watch_loop(
+        self, loop: Optional["asyncio.AbstractEventLoop"] = None
+    ) -> "asyncio.AbstractEventLoop":
+        """ Turn the errors asyncio can't raise in loop into on_async_error events
+
+        loop defaults to the current event loop, so call it from a coroutine
+        to watch the running one. Errors stop being watched on stop().
+
+        Example:
+
+            async def main():
+                ps.watch_loop()
+                ...
+
+            asyncio.run(main())
+
+        Return loop.
+        """
+        import asyncio
+
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self._async_error_dispatcher()
+        if loop not in self._watched_loops:
+            self._watched_loops[loop] = loop.get_exception_handler()
+            loop.set_exception_handler(self._handle_async_error)
+        return loop
+
+    def register_loop(
+        self, loop: Optional["asyncio.AbstractEventLoop"] = None
+    ) -> "asyncio.AbstractEventLoop":
+        """ Cancel the tasks of loop when the program is terminated
+
+        On a terminating signal, before anything else, all the tasks of the
+        loop are cancelled, except the protected ones, and waited for
+        until the shutdown deadline. Then async generators and the default
+        executor are shut down. Tasks that didn't finish are reported, with
+        their stack, in ``shutdown_report["tasks"]``.
+
+        loop defaults to the current event loop. If you call this from a
+        coroutine, its task is protected: it will be cancelled by
+        ``asyncio.run()`` after the program finished, since the loop stops
+        as soon as it's done.
+
+        Example:
+
+            async def main():
+                ps.register_loop()
+                ...
+
+            asyncio.run(main())
+
+        Return loop.
+        """
+        import asyncio
+        from postscriptum.aio import current_task, running_loop
+
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        loops = self._loop_registry()
+        if loop is running_loop():
+            task = current_task(loop)
+            if task is not None:
+                loops.protect(task)
+        return loops.register(loop)
+
+    def protect_task(self, task: "asyncio.Task") -> "asyncio.Task":
+        """ Don't cancel task on terminate. Return task. """
+        return self._loop_registry().protect(task)
+
+    def _async_error_dispatcher(self) -> "EventDispatcher":
+        if self._async_dispatcher is None:
+            from postscriptum.aio import EventDispatcher
+
+            self._async_dispatcher = EventDispatcher(
+                self._dispatch_async_error, "postscriptum-async-errors"
+            )
+        return self._async_dispatcher
+
+    def _loop_registry(self) -> "LoopRegistry":
+        if self.loops is None:
+            from postscriptum.aio import LoopRegistry
+
+            self.loops = LoopRegistry()
+        return self.loops
+
+    def unwatch_loop(self, loop: "asyncio.AbstractEventLoop"):
+        if loop in self._watched_loops:
+            loop.set_exception_handler(self._watched_loops.pop(loop))
+
+    def worker_initializer(
+        self, initializer=None, initargs=(), mp_context=None
+    ) -> Callable[[], None]:
+        """ Return an initializer reporting worker crashes to on_child_crash handlers
+
+        Pass it to ``ProcessPoolExecutor`` or ``multiprocessing.Pool``. It
+        installs a PubSub in each worker, then calls your own initializer
+        with initargs, if any. When a worker crashes, is terminated, is
+        killed, or its initializer fails, on_child_crash handlers are called
+        in the parent, in a background thread. Workers also enable
+        faulthandler, so a segfault prints their stacks on stderr.
+
+        Use the same mp_context as your pool, if you set one.
+
+        Example:
+
+            pool = ProcessPoolExecutor(initializer=ps.worker_initializer())
+
+        """
+        if self._child_crash_listener is None:
+            # Planned, so that handlers scoped to the other side are left out
+            self._child_crash_listener = ChildCrashListener(
+                partial(self._planned_handlers, self.child_crash_handlers), mp_context
+            )
+        return self._child_crash_listener.initializer(initializer, initargs)
+
+    def _after_fork_in_child(self):
+        """ Reset the state the child should not inherit from its parent
+
+        This runs in constant time: handlers are not touched, we just swap
+        the set of the ones to exclude. The signal and exception handler
+        histories stay valid as-is, since the child inherits the parent's
+        signal dispositions and sys.excepthook.
+        """
+        self._is_worker = True
+        self._excluded_handlers = self._master_only_handlers
+        self._called_handlers = CalledHandlers()
+        self._plan = None
+        self._shutdown_deadline = None
+        self._exit_recorded = False
+        self.shutdown_report = {}
+        # The parent is responsible for its own children, and their crashes
+        self._child_crash_listener = None
+        # Event loops, executors and threads are not usable after fork
+        self.loops = None
+        self.executors = ExecutorRegistry()
+        self.threads = ThreadRegistry(self.threads.force_exit, self.threads.exit_code)
+        self.queues = QueueRegistry()
+        # What the parent appended is for the parent to clean up
+        self.bulk_cleanups.forget_items()
+        # Its pipe is shared with the parent. Reset in place, since
+        # ps.stopping may have been stored by callers
+        self.stopping.reset_after_fork()
+        # Threads holding a section in the parent would defer signals forever.
+        # Reset in place, since ps.critical() may have been stored by callers
+        self._critical.reset_after_fork()
+        # It may have been held by a thread that doesn't exist in the child
+        self._handlers_lock = threading.RLock()
+        for handlers in self._handler_collections():
+            handlers.reset_lock()
+        # Don't reset those, their lock may have been held by another thread
+        self.thread_crashes = self.thread_crashes.copy()
+        self.unraisables = self.unraisables.copy()
+        self.async_errors = self.async_errors.copy()
+        self._async_error_counter = itertools.count(1)
+        # Threads don't survive fork, watch_loop() will start a new one
+        self._async_dispatcher = None
+        self.children = ChildRegistry(
+            self.children.terminate_signal,
+            self.children.process_group,
+            self.children.grace_period,
+            self.children.kill,
+        )
 
-    def always(self, func=None):
-        return create_handler_decorator(func, self.always_handlers.add, "always")
+    def critical(self) -> CriticalSection:
+        """ Defer terminating signals until the block ends
+
+        It can be used as a context manager or a decorator, nested, and
+        from any thread. Signals received while any thread is in a
+        critical section are handled once they all ended, so a SIGTERM
+        doesn't stop a batch half way. ``ps.stopping`` is still set
+        right away, so you can avoid starting the next one.
+
+        On Unix, the main thread blocks the signals, so that it works
+        even before ``start()``. Only the outermost block does that, and
+        the same object is returned each time, so it's cheap enough for
+        hot loops.
+
+        Example:
+
+            for batch in batches:
+                if ps.stopping:
+                    break
+                with ps.critical():
+                    commit(batch)
+
+        """
+        return self._critical
+
+    def register_child(self, child: ChildType) -> ChildType:
+        """ Terminate this child process when the program finishes
+
+        child can be a ``subprocess.Popen`` object or a pid. Right after the
+        finish handlers, all children are sent SIGTERM at once, then waited
+        for concurrently. The ones still running after
+        ``ps.children.grace_period`` get SIGKILL. Set
+        ``ps.children.process_group = True`` to signal their whole process
+        group. The report is in ``shutdown_report["children"]``.
+
+        Return child.
+        """
+        return self.children.register(child)
+
+    def register_executor(self, executor: "Executor") -> "Executor":
+        """ Shut down executor when the program finishes, after children
+
+        All registered executors are shut down at once: work not started yet
+        is cancelled, then they are all waited for, until the shutdown
+        deadline. The report is in ``shutdown_report["executors"]``, with
+        what was still running in the executors that didn't stop in time.
+
+        Python waits for thread pools to finish their work before atexit
+        handlers, or before on_finish handlers on a normal exit. So in
+        that case, executors are shut down before them.
+
+        If some are still running at the deadline, Python would wait for
+        them forever. So the process exits once the program finished,
+        without waiting for threads, with ``ps.threads.exit_code`` unless
+        it was already exiting with another code.
+
+        Return executor.
+        """
+        return self.executors.register(executor)
+
+    def register_thread(
+        self, thread: threading.Thread, stop: StopType = None
+    ) -> threading.Thread:
+        """ Ask thread to stop when the program finishes, after executors
+
+        stop is a threading.Event to set, or a function to call, to ask the
+        thread to stop. Then all non-daemon threads, registered or not,
+        are waited for until the shutdown deadline, instead of forever
+        like Python does. The stacks of the ones still running are printed
+        on stderr, and in ``shutdown_report["threads"]``.
+
+        Set ``ps.threads.force_exit = True`` to exit without waiting for
+        them once the program finished, with ``ps.threads.exit_code``.
+        This also applies to threads that are not registered.
+
+        Like executors, on a normal exit, this happens before on_finish
+        handlers, since Python waits for threads before atexit handlers.
+
+        Return thread.
+        """
+        return self.threads.register(thread, stop)
+
+    def register_queue(self, queue: "multiprocessing.queues.Queue"):
+        """ Flush queue when the program finishes, after threads are stopped
+
+        Python waits forever at exit for the items put in a
+        ``multiprocessing.Queue`` to be written to its pipe, which never
+        happens if nobody reads it anymore. Instead, we wait until the
+        shutdown deadline, then give up on the items left. The number of
+        items lost is in ``shutdown_report["queues"]``, and on stderr.
+
+        The queue can't be used once flushed. Since child processes are
+        terminated before, items meant for them are likely lost: flush
+        those yourself in a finish handler.
+
+        Return queue.
+        """
+        return self.queues.register(queue)
+
+    def register_bulk_cleanup(
+        self, func: BatchFunctionType, batch_size: int = 1000
+    ) -> BulkCleanup:
+        """ Call func with batches of arguments when the program finishes
+
+        For many cleanups of the same kind, instead of a finish handler for
+        each: register the function once, and append the arguments of each
+        cleanup to what this returns. Right before closing closeables,
+        func is called with lists of at most batch_size argument tuples,
+        until they are all processed or the shutdown deadline is reached,
+        even if a call is stuck. Registering func again returns the same
+        object.
+
+        The report is in ``shutdown_report["bulk_cleanups"]``. Forked
+        processes don't inherit the arguments, only the functions.
+
+        Example:
+
+            def remove(paths):
+                subprocess.run(["rm", "-f", *(path for path, in paths)])
+
+            temporary_files = ps.register_bulk_cleanup(remove)
+            temporary_files.append(path)
+
+        """
+        return self.bulk_cleanups.register(func, batch_size)
+
+    def register_closeable(
+        self,
+        obj: Any,
+        group: str = DEFAULT_GROUP,
+        loop: Optional["asyncio.AbstractEventLoop"] = None,
+    ) -> Any:
+        """ Close obj when the program finishes, after the finish handlers
+
+        obj must have a close(), aclose() or shutdown() method. It is
+        held by a weak reference, so registering it doesn't keep it alive.
+
+        If closing it returns a coroutine, it runs in loop, by default the
+        one running when registering. If that loop doesn't run in another
+        thread anymore at exit, obj is skipped.
+
+        Groups are closed in reverse order of creation, objects in the same
+        group are closed concurrently. Errors and skipped objects are
+        collected in ``shutdown_report["closeables"]``.
+
+        Return obj so you can do ``f = ps.register_closeable(open(path))``.
+        """
+        return self.closeables.register(obj, group, loop)
+
+    def register_durable(self, target: DurableTargetType) -> DurableTargetType:
+        """ Flush and fsync target when the program finishes, after closeables
+
+        target can be a path, a file descriptor or a file object. All targets
+        are synced in parallel, and when there are many of them, whole file
+        systems are synced at once instead. The report, including how long
+        it took, is in ``shutdown_report["durability"]``.
+
+        File objects are held by weak references. File descriptors are
+        skipped if they are not open on the same file anymore at exit.
+
+        Set ``ps.durables.on_terminate = True`` to also sync when a
+        terminating signal doesn't lead to an exit.
+
+        Return target.
+        """
+        return self.durables.register(target)
+
+    def register_log_listener(self, listener: "QueueListener") -> "QueueListener":
+        """ Drain the queue of listener when the program finishes
+
+        This is done after all other handlers and stages, so their log
+        records get out too. Draining stops at the shutdown deadline, and
+        the number of records dropped is reported in
+        ``shutdown_report["logging"]``, and on stderr.
+
+        Return listener.
+        """
+        return self.log_listeners.register(listener)
+
+    def enable_journal(self, path) -> ExitJournal:
+        """ Append a record to the journal at path each time the program exits
+
+        The record contains the time, pid, reason (finish, quit, terminate
+        or crash), signal, exit code and traceback fingerprint. Read it
+        with ``postscriptum.journal.JournalReader``.
+        """
+        self.journal = ExitJournal(path)
+        return self.journal
+
+    def detect_crash_loops(
+        self, path, policy: str = "backoff", **options
+    ) -> CrashLoopGuard:
+        """ Slow down or degrade the program when it keeps crashing the same way
+
+        Crashes and terminations are recorded in a small history file at
+        path. On the first start(), if the same crash happened too often
+        recently, ``ps.crash_loop`` is set and:
+
+        - with the "backoff" policy, start() sleeps for an exponentially
+          growing delay before returning.
+        - with the "degrade" policy, ``ps.degraded`` is set to True instead,
+          so you can skip expensive initialization.
+
+        Call it before start(). Options are passed to CrashLoopGuard.
+
+        Example:
+
+            ps.detect_crash_loops("/var/run/myapp.history", threshold=3, window=30)
+            ps.start()
+
+        """
+        if policy not in ("backoff", "degrade"):
+            raise ValueError(f"Unknown crash loop policy: {policy!r}")
+        self.crash_loop_policy = policy
+        self.crash_loop_guard = CrashLoopGuard(path, **options)
+        return self.crash_loop_guard
+
+    def _check_crash_loop(self):
+        self._crash_loop_checked = True
+        self.crash_loop = self.crash_loop_guard.check()  # type: ignore
+        if self.crash_loop:
+            if self.crash_loop_policy == "degrade":
+                self.degraded = True
+            else:
+                time.sleep(self.crash_loop.delay)
+
+    def shutdown_deadline(self) -> Deadline:
+        """ The deadline all built-in shutdown stages share
+
+        The clock starts the first time this is called after start(),
+        which happens when the program starts to finish.
+        """
+        if self._shutdown_deadline is None:
+            self._shutdown_deadline = Deadline(self.shutdown_timeout)
+        return self._shutdown_deadline
 
     def setup_exception_handler(self):
         register_exception_handler(
@@ -280,6 +1212,28 @@ class PubSub:
     def teardown_exception_handler(self):
         restore_previous_exception_handler()
 
+    def setup_thread_exception_handler(self):
+        if hasattr(threading, "excepthook"):  # Python 3.8+
+            # We call the previous hook ourselves, only for what we let through
+            register_thread_exception_handler(
+                self._handle_thread_crash, call_previous_handler=False
+            )
+
+    def teardown_thread_exception_handler(self):
+        if hasattr(threading, "excepthook"):
+            restore_previous_thread_exception_handler()
+
+    def setup_unraisable_handler(self):
+        if hasattr(sys, "unraisablehook"):  # Python 3.8+
+            # We call the previous hook ourselves, only for what we let through
+            register_unraisable_handler(
+                self._handle_unraisable, call_previous_handler=False
+            )
+
+    def teardown_unraisable_handler(self):
+        if hasattr(sys, "unraisablehook"):
+            restore_previous_unraisable_handler()
+
     def setup_signal_handler(self):
         register_signals_handler(self._handle_terminate, PROCESS_TERMINATING_SIGNAL)
 
@@ -288,6 +1242,14 @@ class PubSub:
 
     def setup_atexit_handler(self):
         atexit.register(self._handle_finish)
+        register_atexit = getattr(threading, "_register_atexit", None)  # 3.9+
+        if register_atexit and not self._thread_shutdown_hooked:
+            try:
+                # Those run before Python joins threads, thread pools included
+                register_atexit(self._handle_thread_shutdown)
+                self._thread_shutdown_hooked = True
+            except RuntimeError:  # The interpreter is already shutting down
+                pass
 
     def teardown_atexit_handler(self):
         atexit.unregister(self._handle_finish)
@@ -298,7 +1260,15 @@ class PubSub:
             return False
 
         self._called_handlers.clear()
+        self._compile_plan()
+        self._shutdown_deadline = None
+        self._exit_recorded = False
+        self.stopping.clear()
+        if self.crash_loop_guard and not self._crash_loop_checked:
+            self._check_crash_loop()
         self.setup_exception_handler()
+        self.setup_thread_exception_handler()
+        self.setup_unraisable_handler()
         self.setup_signal_handler()
         self.setup_atexit_handler()
 
@@ -312,8 +1282,14 @@ class PubSub:
             return False
 
         self.teardown_exception_handler()
+        self.teardown_thread_exception_handler()
+        self.teardown_unraisable_handler()
         self.teardown_signal_handler()
         self.teardown_atexit_handler()
+        for loop in list(self._watched_loops):
+            self.unwatch_loop(loop)
+        if self._catcher:
+            self._catcher.reset()
 
         self._started = False
 
@@ -321,22 +1297,273 @@ class PubSub:
 
     def _call_handlers(
         self,
-        handlers: OrderedSetType[Callable[[EventTypeVar], None]],
+        handlers: HandlerSet[Callable[[EventTypeVar], None]],
         event: EventTypeVar,
     ):
-        for handler in handlers:
-            if handler not in self._called_handlers:
-                self._called_handlers.add(handler)
+        """ Call the handlers not called yet, by following the plan
+
+        If the handlers change meanwhile, from a handler or another thread,
+        we go on with a new plan.
+        """
+        called = self._called_handlers
+        while True:
+            plan = self._plan or self._compile_plan()
+            flags = called.flags
+            for slot, handler in plan.steps[id(handlers)]:
+                if flags[slot]:
+                    continue
+                if called.plan is not plan:
+                    break
+                flags[slot] = 1
                 handler(event)
+                if self._plan is not plan:
+                    break
+            else:
+                return
+
+    def _invalidate_plan(self):
+        self._plan = None
+
+    def _compile_plan(self) -> DispatchPlan:
+        """ Work out what to call for each event, before it happens
+
+        This runs on start(), then again on the first event after the
+        handlers changed.
+        """
+        with self._handlers_lock:
+            plan = DispatchPlan(self._handler_collections(), self._excluded_handlers)
+            self._called_handlers.use(plan)
+            self._plan = plan
+        # A handler was added without the lock while we were reading
+        if not plan.is_current():
+            self._plan = None
+        return plan
+
+    def _planned_handlers(self, handlers: HandlerSet) -> Tuple[Callable, ...]:
+        """ The handlers to call in this process, for events called each time """
+        plan = self._plan or self._compile_plan()
+        return plan.handlers(handlers)
+
+    def _run_finish_stages(self):
+        """ Run the built-in shutdown steps, after the finish handlers
+
+        Each stage empties what it processes, so running them again is cheap.
+        A stage that fails is reported on stderr, and in
+        ``shutdown_report["stage_errors"]``, and the next ones still run.
+        """
+        self.shutdown_deadline()
+        for name, stage in (
+            # First, since children may be using any of the other resources
+            ("children", self._terminate_children),
+            ("executors", self._shutdown_executors),
+            ("threads", self._stop_threads),
+            ("queues", self._flush_queues),
+            ("dispatchers", self._stop_dispatchers),
+            # Before closing, since they may need the resources to close
+            ("bulk_cleanups", self._run_bulk_cleanups),
+            ("closeables", self._close_closeables),
+            # After closing, since closing a file flushes it
+            ("durability", self._sync_durables),
+            ("throttles", self._report_throttles),
+        ):
+            try:
+                stage()
+            except Exception as e:  # pylint: disable=broad-except
+                self.shutdown_report.setdefault("stage_errors", {})[name] = e
+                print(f"postscriptum: the {name} stage failed:", file=sys.stderr)
+                print_exc()
+
+    def _terminate_children(self):
+        if self.children:
+            self.shutdown_report["children"] = self.children.terminate_all(
+                self.shutdown_deadline().remaining()
+            )
+
+    def _flush_queues(self):
+        if not self.queues:
+            return
+        report = self.queues.flush_all(self.shutdown_deadline().remaining())
+        self.shutdown_report["queues"] = report
+        if report["lost"]:
+            print(
+                f"postscriptum: {report['lost']} items lost in "
+                "multiprocessing queues at exit",
+                file=sys.stderr,
+            )
+
+    def _stop_dispatchers(self):
+        deadline = self.shutdown_deadline()
+        # Let workers we just terminated report it
+        if self._child_crash_listener:
+            self._child_crash_listener.stop(deadline.remaining())
+        if self._async_dispatcher:
+            self._async_dispatcher.stop(deadline.remaining())
+
+    def _run_bulk_cleanups(self):
+        if not self.bulk_cleanups:
+            return
+        report = self.bulk_cleanups.run_all(self.shutdown_deadline().remaining())
+        self.shutdown_report["bulk_cleanups"] = report
+        for name, cleanup_report in report.items():
+            if cleanup_report["errors"] or cleanup_report["left"]:
+                print(
+                    f"postscriptum: {name} failed on "
+                    f"{len(cleanup_report['errors'])} batches, and "
+                    f"{cleanup_report['left']} items were left at exit",
+                    file=sys.stderr,
+                )
+
+    def _close_closeables(self):
+        if self.closeables:
+            self.shutdown_report["closeables"] = self.closeables.close_all(
+                self.shutdown_deadline().remaining()
+            )
+
+    def _sync_durables(self):
+        if not self.durables:
+            return
+        try:
+            report = self.durables.sync_all(self.shutdown_deadline().remaining())
+        finally:
+            self.durables.clear()
+        self.shutdown_report["durability"] = report
+
+    def _report_throttles(self):
+        # Those errors don't end the program, but tell how many there were
+        for name, throttle in (
+            ("thread_crashes", self.thread_crashes),
+            ("unraisables", self.unraisables),
+            ("async_errors", self.async_errors),
+        ):
+            counts = throttle.report()
+            if counts["allowed"] or counts["suppressed"]:
+                self.shutdown_report[name] = counts
+
+    def _shutdown_executors(self):
+        if not self.executors:
+            return
+        report = self.executors.shutdown_all(self.shutdown_deadline().remaining())
+        self.shutdown_report["executors"] = report
+        for name, running in report["still_running"].items():
+            print(
+                f"postscriptum: {name} didn't shut down in time, "
+                f"still running: {', '.join(running) or 'unknown work'}",
+                file=sys.stderr,
+            )
+        # Python would join their threads forever
+        if report["still_running"]:
+            self._forced_exit = True
+
+    def _stop_threads(self):
+        # Unregistered threads are only waited for once, and if we may force exit
+        if not self.threads and (
+            not self.threads.force_exit or "threads" in self.shutdown_report
+        ):
+            return
+        report = self.threads.stop_all(self.shutdown_deadline().remaining())
+        self.shutdown_report["threads"] = report
+        for name, stack in report["stuck"].items():
+            print(
+                f"postscriptum: thread {name} is still running:\n{stack}",
+                file=sys.stderr,
+            )
+        if report["stuck"] and self.threads.force_exit:
+            self._forced_exit = True
+
+    def _handle_thread_shutdown(self):
+        """ Called when Python is about to wait for all non-daemon threads
+
+        This is before atexit handlers, so on a normal exit, we get a
+        chance to stop executors and threads before they hang the process.
+        """
+        if not self.started:
+            return
+        self.stopping.set()
+        self._shutdown_executors()
+        self._stop_threads()
+        if self._forced_exit:
+            self._handle_finish()  # It won't return
+
+    def _drain_log_listeners(self):
+        report = self.log_listeners.drain_all(self.shutdown_deadline().remaining())
+        self.shutdown_report["logging"] = report
+        if report["dropped"]:
+            print(
+                f"postscriptum: {report['dropped']} log records dropped at exit",
+                file=sys.stderr,
+            )
 
     def _handle_finish(self, event: EventType = None):
+        self.stopping.set()
+        self.shutdown_deadline()
         self._call_handlers(self.finish_handlers, event or {})
+        self._run_finish_stages()
         self._call_handlers(self.always_handlers, event or {})
+        if self.log_listeners:
+            self._drain_log_listeners()
+        if not self._exit_recorded:
+            self._record_exit(event or {})
+        if self._forced_exit:
+            self._exit_without_threads(event or {})
+
+    def _exit_without_threads(self, event: EventType):
+        """ Exit right away, since some threads would prevent a normal exit """
+        _, exit_code, _, _ = self._exit_reason(event)
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (AttributeError, ValueError, OSError):
+                pass
+        os._exit(exit_code or self.threads.exit_code)
+
+    @staticmethod
+    def _exit_reason(event: EventType) -> Tuple[ExitReason, int, int, int]:
+        """ Guess why we exit from the event
+
+        Return the reason, the exit code, the signal and the fingerprint.
+        """
+        exit_code, sig, fingerprint = 0, 0, 0
+        if "exception" in event:
+            reason = ExitReason.CRASH
+            exit_code = 1
+            fingerprint = event["fingerprint"]  # type: ignore
+        elif "signal" in event:
+            reason = ExitReason.TERMINATE
+            sig = event["signal"]  # type: ignore
+            exit_code = 128 + sig
+        elif "exit_code" in event:
+            reason = ExitReason.QUIT
+            code = event["exit_code"]  # type: ignore
+            exit_code = code if isinstance(code, int) else int(code is not None)
+        else:
+            reason = ExitReason.FINISH
+        return reason, exit_code, sig, fingerprint
+
+    def _record_exit(self, event: EventType):
+        """ Write down why we exit
+
+        It goes into the journal, and, for crashes and terminations,
+        in the crash loop history.
+        """
+        reason, exit_code, sig, fingerprint = self._exit_reason(event)
+        self._exit_recorded = True
+        try:
+            if self.journal:
+                self.journal.write(reason, exit_code, sig, fingerprint)
+            if self.crash_loop_guard and reason in (
+                ExitReason.CRASH,
+                ExitReason.TERMINATE,
+            ):
+                self.crash_loop_guard.record(reason, exit_code, sig, fingerprint)
+        except (OSError, struct.error) as e:
+            print(f"postscriptum: can't record the exit: {e}", file=sys.stderr)
 
     def _handle_hold(self, event: EventType = None):
         self._call_handlers(self.hold_handlers, event or {})
         self._call_handlers(self.always_handlers, event or {})
         self._called_handlers.clear()
+        # We are not stopping after all
+        self.stopping.clear()
 
     def _handle_crash(
         self,
@@ -345,19 +1572,176 @@ class PubSub:
         traceback: TracebackType,
         previous_handler: ExceptionHandlerType,
     ):
+        self.stopping.set()
         event: CrashEventType = {
             "exception": exception,
             "traceback": traceback,
             "previous_exception_handler": previous_handler,
             "stacktrace": partial(format_stacktrace, type_, exception, traceback),
+            "fingerprint": fingerprint_exception(type_, traceback),
         }
 
         self._call_handlers(self.crash_handlers, event)
         self._handle_finish(event)
 
+    def _handle_thread_crash(self, args: Any, previous_handler: Callable[[Any], Any]):
+        """ Called by threading.excepthook with a threading.ExceptHookArgs
+
+        Unlike other events, handlers are called for each crash, since
+        several threads can crash while the program runs. The fingerprint
+        is computed first, to throttle handlers for identical crashes, and
+        the previous hook, which prints the traceback, along with them.
+        """
+        type_, exception, traceback = args.exc_type, args.exc_value, args.exc_traceback
+        # Like the default hook, ignore threads exiting with sys.exit()
+        if issubclass(type_, SystemExit):
+            if self.call_previous_exception_handlers:
+                previous_handler(args)
+            return
+
+        fingerprint = fingerprint_exception(type_, traceback)
+        allowed, suppressed = self.thread_crashes.allow(fingerprint)
+        if not allowed:
+            return
+
+        if self.call_previous_exception_handlers:
+            previous_handler(args)
+
+        thread = args.thread
+        event: ThreadCrashEventType = {
+            "exception": exception,
+            "traceback": traceback,
+            "stacktrace": partial(format_stacktrace, type_, exception, traceback),
+            "fingerprint": fingerprint,
+            "thread": thread,
+            "thread_name": thread.name if thread is not None else "",
+            "thread_ident": thread.ident if thread is not None else None,
+            "suppressed": suppressed,
+        }
+        for handler in self._planned_handlers(self.thread_crash_handlers):
+            handler(event)
+
+    def _handle_unraisable(self, args: Any, previous_handler: Callable[[Any], Any]):
+        """ Called by sys.unraisablehook with a sys.UnraisableHookArgs
+
+        This can be called millions of times, so we only compute a cheap
+        key before throttling: no formatting, no hashing of the stack.
+        """
+        type_, exception, traceback = args.exc_type, args.exc_value, args.exc_traceback
+        key = (
+            getattr(type_, "__qualname__", repr(type_)),
+            type(args.object).__qualname__,
+            raised_at(traceback),
+        )
+        allowed, suppressed = self.unraisables.allow(key)
+        if not allowed:
+            return
+
+        previous_handler(args)
+        event: UnraisableEventType = {
+            "exception": exception,
+            "traceback": traceback,
+            "stacktrace": partial(format_stacktrace, type_, exception, traceback),
+            "error_message": args.err_msg,
+            "object": args.object,
+            "key": key,
+            "suppressed": suppressed,
+        }
+        for handler in self._planned_handlers(self.unraisable_handlers):
+            handler(event)
+
+    def _cancel_tasks(self, event: TerminateEventType, exit_code: int) -> bool:
+        """ Cancel the tasks of registered loops, before finishing on terminate
+
+        If one of the loops is running in this thread, it can't make
+        progress until we return. In that case, we schedule the
+        cancellation in it, along with the finish and exit, and return True.
+        """
+        report, current_loop = self._loop_registry().cancel_all(
+            self.shutdown_deadline().remaining()
+        )
+        self.shutdown_report["tasks"] = report
+        if current_loop is None:
+            return False
+        current_loop.call_soon_threadsafe(
+            current_loop.create_task,
+            self._cancel_tasks_then_exit(current_loop, event, exit_code),
+        )
+        return True
+
+    async def _cancel_tasks_then_exit(
+        self,
+        loop: "asyncio.AbstractEventLoop",
+        event: TerminateEventType,
+        exit_code: int,
+    ):
+        from postscriptum.aio import cancel_tasks
+
+        loop_report = await cancel_tasks(
+            loop, self._loop_registry().protected, self.shutdown_deadline()
+        )
+        report = self.shutdown_report["tasks"]
+        report["cancelled"] += loop_report["cancelled"]
+        report["unfinished"].extend(loop_report["unfinished"])
+        self._handle_finish(event)
+        # SystemExit is the only kind of exception that gets out of the loop.
+        # Raising it from a callback rather than this task avoids asyncio
+        # complaining that nobody retrieved it.
+        loop.call_soon(force_exit, exit_code)
+
+    def _handle_async_error(
+        self, loop: "asyncio.AbstractEventLoop", context: Dict[str, Any]
+    ):
+        """ The exception handler of watched loops
+
+        It may be called in the loop thread, or wherever a future with an
+        exception nobody retrieved is garbage collected. So it never blocks:
+        handlers are called later, in the dispatcher thread.
+        """
+        from postscriptum.aio import async_error_key, make_async_error_event
+
+        count = next(self._async_error_counter)
+        if count == self.async_error_limit:
+            loop.call_soon_threadsafe(self._escalate_async_error, context)
+
+        key = async_error_key(context)
+        allowed, suppressed = self.async_errors.allow(key)
+        if not allowed:
+            return
+
+        previous_handler = self._watched_loops.get(loop)
+        if previous_handler is not None:
+            previous_handler(loop, context)
+        else:
+            loop.default_exception_handler(context)
+        self._async_error_dispatcher().put(
+            make_async_error_event(context, loop, key, suppressed)
+        )
+
+    def _dispatch_async_error(self, event: AsyncErrorEventType):
+        for handler in self._planned_handlers(self.async_error_handlers):
+            handler(event)
+
+    def _escalate_async_error(self, context: Dict[str, Any]):
+        """ Crash because of an async error, from the loop thread
+
+        The PubSubExit we raise is the only kind of exception that can get
+        out of the loop.
+        """
+        exception = context.get("exception")
+        if exception is None:
+            exception = RuntimeError(context.get("message", "Async error"))
+        sys.excepthook(type(exception), exception, exception.__traceback__)
+        force_exit(1)
+
     def _handle_terminate(
         self, sig: signal.Signals, frame: FrameType, previous_handler: SignalHandlerType
     ):
+        # First, so workers start to wind down while handlers run
+        self.stopping.set()
+        # The signal is raised again when the critical section ends
+        if self._critical.defer(sig):
+            return
         recommended_exit_code = 128 + sig  # Most POSIX shell seem to do that
         event: TerminateEventType = {
             "signal": sig,
@@ -414,15 +1798,22 @@ class PubSub:
         # If were are here, no handler manually exited, and edge cases
         # are handled, so we can proceed normally
         if self.exit_on_terminate:
+            if self.loops and self._cancel_tasks(event, recommended_exit_code):
+                return  # The loop running in this thread will finish for us
             self._handle_finish(event)
             force_exit(code=recommended_exit_code)
         else:
+            if self.durables.on_terminate and self.durables:
+                self.shutdown_report["durability"] = self.durables.sync_all(
+                    self.shutdown_timeout
+                )
             self._handle_hold(event)
 
     # TODO: test reraise from there
     def _handle_quit(
         self, type_: Type[SystemExit], exception: SystemExit, traceback: TracebackType
     ):
+        self.stopping.set()
         event: QuitEventType = {
             "exit_code": exception.code,
             "exit": lambda code=exception.code: force_exit(code),  # type: ignore
@@ -442,9 +1833,24 @@ class PubSub:
             self._handle_hold(event)
 
     def __call__(self) -> catch_system_exit:
-
-        return catch_system_exit(
-            on_system_exit=self._handle_quit,
-            on_enter=self.start,
-            raise_again=self.exit_after_quit_handlers,
-        )
+        """ Return the context manager and decorator starting this object
+
+        It's the same object each time, and it only calls start() once, or
+        again after stop(), so it's cheap enough for hot functions.
+        """
+        catcher = self._catcher
+        if catcher is None or catcher.raise_again != self.exit_after_quit_handlers:
+            catcher = self._catcher = catch_system_exit(
+                on_system_exit=self._handle_quit,
+                on_enter=self.start,
+                raise_again=self.exit_after_quit_handlers,
+                once=True,
+            )
+        return catcher
+
+
+def _after_fork_in_child(pubsub_ref: "weakref.ref[PubSub]"):
+    """ Called by os.register_at_fork(). The weak ref lets PubSub objects die """
+    pubsub = pubsub_ref()
+    if pubsub is not None:
+        pubsub._after_fork_in_child()  # pylint: disable=protected-access
@@ -0,0 +1,87 @@
+"""Flush multiprocessing queues at exit, without blocking forever
+
+Items put in a multiprocessing.Queue are buffered, and written to a pipe by
+a feeder thread. At exit, Python waits for that thread to write them all,
+which never ends if the process at the other end stopped reading.
+
+Here, we give feeder threads until a deadline to flush their buffer. Past
+it, we give up on the items left, and tell the queue not to wait for them.
+"""
+
+import weakref
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from postscriptum.utils import Deadline
+
+if TYPE_CHECKING:  # pragma: no cover
+    from multiprocessing.queues import Queue
+
+
+def buffered_items(queue: "Queue") -> int:
+    """ How many items put in queue are not written to its pipe yet """
+    return len(getattr(queue, "_buffer", ()) or ())
+
+
+class QueueRegistry:
+    """ Multiprocessing queues to flush at exit, held by weak references
+
+    Example:
+
+        registry = QueueRegistry()
+        results = registry.register(multiprocessing.Queue())
+        report = registry.flush_all(timeout=5)
+
+    """
+
+    def __init__(self):
+        self._queues: Dict[int, "weakref.ref[Queue]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    def register(self, queue: "Queue") -> "Queue":
+        key = id(queue)
+
+        def forget(_):
+            self._queues.pop(key, None)
+
+        self._queues[key] = weakref.ref(queue, forget)
+        return queue
+
+    def flush_all(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """ Close all queues, and wait for them to be flushed until timeout
+
+        Feeder threads flush at the same time, since each join only takes
+        what is left of the shared deadline. Queues not flushed in time
+        are told not to wait for their feeder thread at exit. Queues are
+        forgotten afterward, and can't be used anymore.
+
+        Return a report with how many queues were flushed, how many were not,
+        and how many items we gave up on. That's a minimum: the item the
+        feeder thread was writing when we gave up is not counted.
+        """
+        deadline = Deadline(timeout)
+        queues: List["Queue"] = []
+        for ref in self._queues.values():
+            queue = ref()
+            if queue is not None:
+                queues.append(queue)
+        self._queues = {}
+
+        for queue in queues:
+            # The feeder thread exits once it has written all items before that
+            queue.close()
+
+        report = {"flushed": 0, "cancelled": 0, "lost": 0}
+        for queue in queues:
+            thread = getattr(queue, "_thread", None)
+            if thread is not None:
+                thread.join(deadline.remaining())
+                if thread.is_alive():
+                    queue.cancel_join_thread()
+                    report["cancelled"] += 1
+                    report["lost"] += buffered_items(queue)
+                    continue
+            report["flushed"] += 1
+        return report
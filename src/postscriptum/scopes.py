@@ -0,0 +1,112 @@
+"""Which processes handlers run in, and for how long
+
+Handlers run in all processes by default, but when the program forks,
+they can be limited to the original process, or to the forked ones.
+
+They can also be limited to a block of code, with a HandlerScope: it
+adds handlers to the PubSub when you register them, and removes them when
+the block ends. Only the handler collections change, signal handlers and
+hooks installed by start() are left alone, so it's cheap.
+"""
+
+from typing import TYPE_CHECKING, Any, Callable, List, Tuple
+
+from postscriptum.utils import create_handler_decorator
+
+if TYPE_CHECKING:  # pragma: no cover
+    from postscriptum.pubsub import PubSub
+
+# Which processes a handler runs in when the program forks
+SCOPE_BOTH = "both"
+SCOPE_MASTER = "master"  # Only the process that created the PubSub
+SCOPE_WORKER = "worker"  # Only the processes forked from it
+HANDLER_SCOPES = (SCOPE_BOTH, SCOPE_MASTER, SCOPE_WORKER)
+
+
+class HandlerScope:
+    """ Handlers that are only registered while a with block runs
+
+    Get one with ``PubSub.scope()``. It has the same ``on_*`` methods as
+    the PubSub, which can only be used inside the block. Scopes can be
+    nested, and used from any thread.
+
+    Example:
+
+        with ps.scope() as scope:
+
+            @scope.on_terminate()
+            def _(event):
+                os.unlink(partial_upload)
+
+            upload(partial_upload)
+
+    """
+
+    def __init__(self, pubsub: "PubSub"):
+        self._pubsub = pubsub
+        self._entered = False
+        # What we added, to remove exactly that, and nothing else
+        self._added: List[Tuple[Any, Callable]] = []
+
+    def __enter__(self) -> "HandlerScope":
+        self._entered = True
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._entered = False
+        added, self._added = self._added, []
+        for handlers, handler in reversed(added):
+            self._pubsub._remove_handler(  # pylint: disable=protected-access
+                handlers, handler
+            )
+
+    def _add(self, handlers, handler, scope: str = SCOPE_BOTH):
+        if not self._entered:
+            raise RuntimeError("Handler scopes can only be used in their with block")
+        # pylint: disable=protected-access
+        if self._pubsub._add_handler(handlers, handler, scope=scope):
+            self._added.append((handlers, handler))
+
+    def _decorator(self, handlers, func, scope: str, name: str):
+        add_handler = lambda handler: self._add(handlers, handler, scope)
+        return create_handler_decorator(func, add_handler, name)
+
+    def on_terminate(self, func=None, scope: str = SCOPE_BOTH):
+        handlers = self._pubsub.terminate_handlers
+        return self._decorator(handlers, func, scope, "on_terminate")
+
+    def on_quit(self, func=None, scope: str = SCOPE_BOTH):
+        handlers = self._pubsub.quit_handlers
+        return self._decorator(handlers, func, scope, "on_quit")
+
+    def on_finish(self, func=None, scope: str = SCOPE_BOTH):
+        handlers = self._pubsub.finish_handlers
+        return self._decorator(handlers, func, scope, "on_finish")
+
+    def on_crash(self, func=None, scope: str = SCOPE_BOTH):
+        handlers = self._pubsub.crash_handlers
+        return self._decorator(handlers, func, scope, "on_crash")
+
+    def on_hold(self, func=None, scope: str = SCOPE_BOTH):
+        handlers = self._pubsub.hold_handlers
+        return self._decorator(handlers, func, scope, "on_hold")
+
+    def always(self, func=None, scope: str = SCOPE_BOTH):
+        handlers = self._pubsub.always_handlers
+        return self._decorator(handlers, func, scope, "always")
+
+    def on_child_crash(self, func=None, scope: str = SCOPE_BOTH):
+        handlers = self._pubsub.child_crash_handlers
+        return self._decorator(handlers, func, scope, "on_child_crash")
+
+    def on_thread_crash(self, func=None, scope: str = SCOPE_BOTH):
+        handlers = self._pubsub.thread_crash_handlers
+        return self._decorator(handlers, func, scope, "on_thread_crash")
+
+    def on_unraisable(self, func=None, scope: str = SCOPE_BOTH):
+        handlers = self._pubsub.unraisable_handlers
+        return self._decorator(handlers, func, scope, "on_unraisable")
+
+    def on_async_error(self, func=None, scope: str = SCOPE_BOTH):
+        handlers = self._pubsub.async_error_handlers
+        return self._decorator(handlers, func, scope, "on_async_error")
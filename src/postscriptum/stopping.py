@@ -0,0 +1,155 @@
+"""A flag telling all threads, coroutines and event loops the program stops
+
+Instead of polling a global, worker threads can wait on the token, with a
+timeout, coroutines can await it, and select()/poll() based loops can
+watch its file descriptor. They all wake up as soon as it's set.
+"""
+
+import os
+import threading
+
+from typing import TYPE_CHECKING, Any, Generator, List, Optional, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    import asyncio
+
+
+def _set_future_result(future: "asyncio.Future[bool]"):
+    if not future.done():
+        future.set_result(True)
+
+
+class StopToken:
+    """ Like a threading.Event, but awaitable and with a file descriptor
+
+    It's meant to be set from a signal handler. Since those run in the main
+    thread, in between any two bytecodes, the lock is reentrant: the main
+    thread may already hold it when the signal arrives.
+
+    Example:
+
+        token = StopToken()
+
+        # In a thread
+        while not token.wait(timeout=1):
+            do_work()
+
+        # In a coroutine
+        await token
+
+        # With a selector
+        selector.register(token, selectors.EVENT_READ)
+
+    """
+
+    def __init__(self):
+        self._flag = False
+        self._condition = threading.Condition(threading.RLock())
+        # Created on the first call to fileno(), written to when set
+        self._pipe: Optional[Tuple[int, int]] = None
+        # Coroutines awaiting the token, with the loop they run in
+        self._futures: List[
+            Tuple["asyncio.AbstractEventLoop", "asyncio.Future[bool]"]
+        ] = []
+
+    def __bool__(self) -> bool:
+        return self._flag
+
+    def is_set(self) -> bool:
+        return self._flag
+
+    def set(self):
+        """ Set the flag, and wake up everything waiting for it """
+        with self._condition:
+            if self._flag:
+                return
+            self._flag = True
+            self._condition.notify_all()
+            futures, self._futures = self._futures, []
+            if self._pipe is not None:
+                try:
+                    os.write(self._pipe[1], b"\0")
+                except BlockingIOError:
+                    pass
+
+        for loop, future in futures:
+            try:
+                loop.call_soon_threadsafe(_set_future_result, future)
+            except RuntimeError:  # The loop is closed
+                pass
+
+    def clear(self):
+        with self._condition:
+            self._flag = False
+            if self._pipe is not None:
+                try:
+                    while os.read(self._pipe[0], 512):
+                        pass
+                except BlockingIOError:
+                    pass
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """ Block until the flag is set, or timeout. Return the flag """
+        with self._condition:
+            if not self._flag:
+                self._condition.wait(timeout)
+            return self._flag
+
+    def fileno(self) -> int:
+        """ A file descriptor that is readable once the flag is set
+
+        Don't read from it, it's shared by everyone watching the token.
+        """
+        with self._condition:
+            if self._pipe is None:
+                read_fd, write_fd = os.pipe()
+                os.set_blocking(read_fd, False)
+                os.set_blocking(write_fd, False)
+                self._pipe = (read_fd, write_fd)
+                if self._flag:
+                    os.write(write_fd, b"\0")
+            return self._pipe[0]
+
+    def __await__(self) -> Generator[Any, None, bool]:
+        return self._wait_async().__await__()
+
+    async def _wait_async(self) -> bool:
+        import asyncio  # Slow to import, and only needed by coroutines
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        with self._condition:
+            if self._flag:
+                return True
+            self._futures.append((loop, future))
+        try:
+            return await future
+        finally:
+            with self._condition:
+                if (loop, future) in self._futures:
+                    self._futures.remove((loop, future))
+
+    def reset_after_fork(self):
+        """ Make the token usable in a forked child, clear and without a pipe
+
+        It's reset in place, since threads and loops of the child may hold
+        it already. The lock may have been held by a thread that doesn't
+        exist in the child, the coroutines awaiting it ran in event loops
+        of the parent, and the pipe is shared with the parent: setting the
+        token here would wake them up there.
+        """
+        pipe, self._pipe = self._pipe, None
+        self._flag = False
+        self._condition = threading.Condition(threading.RLock())
+        self._futures = []
+        if pipe is not None:
+            for fd in pipe:
+                os.close(fd)
+
+    def close(self):
+        """ Close the file descriptors, if fileno() was called """
+        with self._condition:
+            pipe, self._pipe = self._pipe, None
+        if pipe is not None:
+            for fd in pipe:
+                os.close(fd)
@@ -1,12 +1,15 @@
-from typing import Callable, Type, Any
+from typing import Callable, Type, TypeVar, Any
 from typing import cast
 from types import TracebackType
 
 from contextlib import ContextDecorator
+from functools import wraps
 
 from postscriptum.types import ExceptionHandlerType
 from postscriptum.exceptions import PubSubExit
 
+FuncTypeVar = TypeVar("FuncTypeVar", bound=Callable[..., Any])
+
 
 class catch_system_exit(ContextDecorator):  # pylint: disable=invalid-name
     """React to system exit if it's not sent from a signal handler.
@@ -18,6 +21,7 @@ class catch_system_exit(ContextDecorator):  # pylint: disable=invalid-name
                  It should accept Type[Exception], Exception, TracebackType as
                  a param
         raise_again: do we raise the exception again after catching it?
+        once: only call on_enter the first time, until reset() is called.
 
     Example:
 
@@ -44,15 +48,46 @@ class catch_system_exit(ContextDecorator):  # pylint: disable=invalid-name
         on_enter: Callable = None,
         on_exit: ExceptionHandlerType = None,
         raise_again: bool = True,
+        once: bool = False,
     ):
         self.on_enter = on_enter
         self.on_exit = on_exit
         self.on_system_exit = on_system_exit
         self.raise_again = raise_again
+        self.once = once
+        self.entered = False
 
     def __enter__(self):
-        if self.on_enter:
+        if self.on_enter and not (self.once and self.entered):
             self.on_enter()
+            self.entered = True
+
+    def reset(self):
+        """ Call on_enter again the next time, even with once=True """
+        self.entered = False
+
+    def __call__(self, func: FuncTypeVar) -> FuncTypeVar:
+        """ Decorate func, without entering a context manager on each call
+
+        With the default arguments, a SystemExit is only caught to be
+        passed to on_system_exit, so a plain try/except is enough. Other
+        cases go through ContextDecorator.
+        """
+        if self.on_exit is not None or not self.raise_again:
+            return super().__call__(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.entered or not self.once:
+                self.__enter__()
+            try:
+                return func(*args, **kwargs)
+            except SystemExit as e:
+                if not isinstance(e, PubSubExit):
+                    self.on_system_exit(type(e), e, e.__traceback__)
+                raise
+
+        return cast(FuncTypeVar, wrapper)
 
     def __exit__(
         self,
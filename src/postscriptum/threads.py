@@ -0,0 +1,123 @@
+"""Stop threads before Python waits for them forever at exit
+
+Python joins every non-daemon thread when the program ends, without a
+timeout, so a single thread that never returns hangs the process, with no
+explanation. Here, registered threads are asked to stop, then all
+non-daemon threads are waited for until a deadline, and the stacks of the
+ones still running are dumped.
+"""
+
+import sys
+import threading
+import traceback
+
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from postscriptum.utils import Deadline
+
+StopType = Union[threading.Event, Callable[[], Any], None]
+
+
+def thread_stack(thread: threading.Thread) -> str:
+    frames = sys._current_frames()  # pylint: disable=protected-access
+    frame = frames.get(thread.ident)  # type: ignore
+    if frame is None:
+        return ""
+    return "".join(traceback.format_stack(frame))
+
+
+def non_daemon_threads() -> List[threading.Thread]:
+    """ The threads Python waits for at exit, except the current one """
+    current = threading.current_thread()
+    return [
+        thread
+        for thread in threading.enumerate()
+        if not thread.daemon
+        and thread is not current
+        and thread is not threading.main_thread()
+    ]
+
+
+class ThreadRegistry:
+    """ Threads to stop, and wait for with a deadline, at exit
+
+    Args:
+        force_exit: if threads are still running at the deadline, exit
+                    right after the program finished instead of waiting
+                    for them.
+        exit_code: the exit code used when forcing the exit, unless the
+                   program was already exiting with another one.
+
+    Example:
+
+        registry = ThreadRegistry()
+        stop = threading.Event()
+        registry.register(threading.Thread(target=work, args=(stop,)), stop)
+        report = registry.stop_all(timeout=5)
+
+    """
+
+    def __init__(self, force_exit: bool = False, exit_code: int = 1):
+        self.force_exit = force_exit
+        self.exit_code = exit_code
+        self._threads: Dict[threading.Thread, StopType] = {}
+
+    def __len__(self) -> int:
+        return len(self._threads)
+
+    def register(self, thread: threading.Thread, stop: StopType = None):
+        """ Add thread to the ones to stop at exit, and return it
+
+        stop is how to ask the thread to stop: an Event to set, or a
+        callable to call. Without it, we can only wait for the thread.
+        """
+        self._threads[thread] = stop
+        return thread
+
+    def unregister(self, thread: threading.Thread) -> bool:
+        if thread not in self._threads:
+            return False
+        del self._threads[thread]
+        return True
+
+    def stop_all(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """ Ask registered threads to stop, then wait for all non-daemon threads
+
+        Threads are waited for at the same time: each join only takes what
+        is left of the shared deadline. Registered threads are forgotten
+        afterward.
+
+        Return a report with the names of the threads that stopped, the
+        errors raised while asking them to, and the stacks of the threads
+        still running, by name.
+        """
+        deadline = Deadline(timeout)
+        registered, self._threads = self._threads, {}
+
+        errors: Dict[str, BaseException] = {}
+        for thread, stop in registered.items():
+            try:
+                if isinstance(stop, threading.Event):
+                    stop.set()
+                elif stop is not None:
+                    stop()
+            except Exception as e:  # pylint: disable=broad-except
+                errors[thread.name] = e
+
+        threads = list(registered)
+        threads += [
+            thread for thread in non_daemon_threads() if thread not in registered
+        ]
+        for thread in threads:
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join(deadline.remaining())
+
+        return {
+            "stopped": [thread.name for thread in threads if not thread.is_alive()],
+            "errors": errors,
+            "stuck": {
+                thread.name: thread_stack(thread)
+                for thread in threads
+                if thread.is_alive()
+            },
+        }
@@ -0,0 +1,158 @@
+"""Limit how often handlers run for events that can happen in bursts
+
+A pool of threads crashing in a tight loop can produce thousands of
+identical crashes per second. Formatting and shipping a report for each of
+them would bring the program down faster than the bug itself.
+
+Throttle lets a few events per key and per period through, and counts the
+others, so the next event let through can tell how many were suppressed.
+For very noisy events, it can also let only a random sample through.
+"""
+
+import time
+import threading
+
+from collections import deque
+from typing import Any, Deque, Dict, Hashable, List, Optional, Tuple
+
+# The key used for events once max_keys keys are tracked
+OVERFLOW_KEY = "<overflow>"
+
+
+def _random() -> float:
+    import random  # Only needed to sample events
+
+    return random.random()
+
+
+class Throttle:
+    """ Let at most rate events per key through in each period
+
+    Checking an event is a dict lookup under a lock, so it's cheap enough
+    to be done for every event, even when there are millions of them.
+
+    Args:
+        rate: how many events with the same key may pass in each period.
+              None means no limit, but events are still counted.
+        period: the length of a period, in seconds.
+        max_keys: how many keys we keep track of. Events with new keys
+                  beyond that share the OVERFLOW_KEY key, so memory stays
+                  bounded.
+        sample_rate: the probability, from 0 to 1, for an event under the
+                     rate limit to be let through. Events not sampled are
+                     counted as suppressed.
+
+    Example:
+
+        throttle = Throttle(rate=5, period=1)
+        allowed, suppressed = throttle.allow(fingerprint)
+        if allowed:
+            report(crash, suppressed)
+
+    """
+
+    def __init__(
+        self,
+        rate: Optional[int] = 10,
+        period: float = 1.0,
+        max_keys: int = 1024,
+        sample_rate: float = 1.0,
+    ):
+        self.rate = rate
+        self.period = period
+        self.max_keys = max_keys
+        self.sample_rate = sample_rate
+        # key: [period start, allowed in this period, suppressed since last allowed]
+        self._windows: Dict[Hashable, List[Any]] = {}
+        self._totals: Dict[Hashable, List[int]] = {}
+        self._lock = threading.Lock()
+        # A GC run while we hold the lock can call a failing __del__, and so
+        # sys.unraisablehook, which calls us again from the same thread.
+        # Those events are queued, and counted as suppressed on the next call.
+        self._local = threading.local()
+        self._nested: Deque[Hashable] = deque()
+
+    def allow(self, key: Hashable = None) -> Tuple[bool, int]:
+        """ Count an event, and tell if its handlers should run
+
+        Return whether the event is let through, and if it is, how many
+        events with the same key were suppressed since the last one let
+        through. Otherwise, the second value is 0.
+
+        It may be called again from the same thread while it runs, like
+        when a GC run calls a failing __del__ in sys.unraisablehook: that
+        event is suppressed.
+        """
+        local = self._local
+        if getattr(local, "checking", False):
+            self._nested.append(key)
+            return False, 0
+
+        now = time.monotonic()
+        local.checking = True
+        try:
+            with self._lock:
+                self._count_nested(now)
+                window, totals = self._counts(key, now)
+
+                if now - window[0] >= self.period:
+                    window[0] = now
+                    window[1] = 0
+
+                if (self.rate is not None and window[1] >= self.rate) or (
+                    self.sample_rate < 1 and _random() >= self.sample_rate
+                ):
+                    window[2] += 1
+                    totals[1] += 1
+                    return False, 0
+
+                suppressed = window[2]
+                window[1] += 1
+                window[2] = 0
+                totals[0] += 1
+                return True, suppressed
+        finally:
+            local.checking = False
+
+    def _counts(self, key: Hashable, now: float) -> Tuple[List[Any], List[int]]:
+        """ The window and totals of key, created if needed. Call it locked """
+        window = self._windows.get(key)
+        if window is None:
+            if len(self._windows) >= self.max_keys:
+                key = OVERFLOW_KEY
+                window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = [now, 0, 0]
+                self._totals[key] = [0, 0]
+        return window, self._totals[key]
+
+    def _count_nested(self, now: float):
+        """ Count the events we got while locked as suppressed. Call it locked """
+        while self._nested:
+            window, totals = self._counts(self._nested.popleft(), now)
+            window[2] += 1
+            totals[1] += 1
+
+    def report(self) -> Dict[str, Any]:
+        """ How many events were let through and suppressed, in total and by key """
+        with self._lock:
+            self._count_nested(time.monotonic())
+            totals = {key: tuple(counts) for key, counts in self._totals.items()}
+        return {
+            "allowed": sum(allowed for allowed, _ in totals.values()),
+            "suppressed": sum(suppressed for _, suppressed in totals.values()),
+            "by_key": {
+                key: {"allowed": allowed, "suppressed": suppressed}
+                for key, (allowed, suppressed) in totals.items()
+            },
+        }
+
+    def copy(self) -> "Throttle":
+        """ A new throttle with the same settings, and no counts """
+        return Throttle(self.rate, self.period, self.max_keys, self.sample_rate)
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+            self._totals.clear()
+            self._nested.clear()
@@ -1,14 +1,22 @@
 # pylint: disable=invalid-name
 
 import signal
+import threading
 
 from types import TracebackType, FrameType
-from typing import Callable, Type, Any, Union, TypeVar, TYPE_CHECKING
+from typing import (
+    Callable,
+    Dict,
+    Type,
+    Any,
+    Optional,
+    Tuple,
+    Union,
+    TypeVar,
+)
 
 from typing_extensions import TypedDict, NoReturn
 
-from ordered_set import OrderedSet
-
 # The callable in sys.excepthook
 ExceptionHandlerType = Callable[
     [Type[BaseException], BaseException, TracebackType], Any
@@ -20,6 +28,21 @@ PostScripumExceptionHandlerType = Callable[
 ]
 
 
+# The callable in threading.excepthook, called with threading.ExceptHookArgs
+ThreadExceptionHandlerType = Callable[[Any], Any]
+
+# The user provided callable we will call in threading.excepthook
+PostScripumThreadExceptionHandlerType = Callable[
+    [Any, ThreadExceptionHandlerType], None
+]
+
+# The callable in sys.unraisablehook, called with sys.UnraisableHookArgs
+UnraisableHookType = Callable[[Any], Any]
+
+# The user provided callable we will call in sys.unraisablehook
+PostScripumUnraisableHookType = Callable[[Any, UnraisableHookType], None]
+
+
 # The values to set as a handler for a given signal
 SignalHandlerType = Union[
     Callable[[signal.Signals, FrameType], None], int, signal.Handlers, None
@@ -49,6 +72,47 @@ CrashEventType = TypedDict(
         ],
         "traceback": TracebackType,
         "previous_exception_handler": ExceptionHandlerType,
+        "fingerprint": int,
+    },
+)
+
+ThreadCrashEventType = TypedDict(
+    "ThreadCrashEventType",
+    {
+        "exception": BaseException,
+        "stacktrace": Callable[[], str],
+        "traceback": TracebackType,
+        "fingerprint": int,
+        "thread": Optional[threading.Thread],
+        "thread_name": str,
+        "thread_ident": Optional[int],
+        "suppressed": int,
+    },
+)
+
+UnraisableEventType = TypedDict(
+    "UnraisableEventType",
+    {
+        "exception": Optional[BaseException],
+        "stacktrace": Callable[[], str],
+        "traceback": Optional[TracebackType],
+        "error_message": Optional[str],
+        "object": Any,
+        "key": Tuple[str, str, str],
+        "suppressed": int,
+    },
+)
+
+AsyncErrorEventType = TypedDict(
+    "AsyncErrorEventType",
+    {
+        "message": str,
+        "exception": Optional[BaseException],
+        "stacktrace": Callable[[], str],
+        "context": Dict[str, Any],
+        "loop": Any,
+        "key": Tuple[str, str, str],
+        "suppressed": int,
     },
 )
 
@@ -56,6 +120,20 @@ QuitEventType = TypedDict(
     "QuitEventType", {"exit_code": int, "exit": Callable[[int], NoReturn],}
 )
 
+# Sent from a worker process, so it only contains picklable values
+ChildCrashEventType = TypedDict(
+    "ChildCrashEventType",
+    {
+        "pid": int,
+        "reason": str,
+        "exception_type": str,
+        "fingerprint": int,
+        "stacktrace": str,
+        "signal": int,
+        "exit_code": int,
+    },
+)
+
 EmptyEventType = TypedDict("EmptyEventType", {})
 
 EventType = Union[
@@ -66,6 +144,10 @@ EventType = Union[
 TerminateHandlerType = Callable[[TerminateEventType], None]
 QuitHandlerType = Callable[[QuitEventType], None]
 CrashHandlerType = Callable[[CrashEventType], None]
+ChildCrashHandlerType = Callable[[ChildCrashEventType], None]
+ThreadCrashHandlerType = Callable[[ThreadCrashEventType], None]
+UnraisableHandlerType = Callable[[UnraisableEventType], None]
+AsyncErrorHandlerType = Callable[[AsyncErrorEventType], None]
 FinishHandlerType = Callable[
     [EventType], None,
 ]
@@ -89,13 +171,3 @@ EventTypeVar = TypeVar(
     "EventTypeVar", EmptyEventType, TerminateEventType, QuitEventType, CrashEventType,
 )
 
-
-if TYPE_CHECKING:
-    OrderedSetType = OrderedSet
-else:
-
-    class _OrderedSet:
-        def __getitem__(self, *args):
-            return OrderedSet
-
-    OrderedSetType = _OrderedSet()
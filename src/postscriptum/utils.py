@@ -1,11 +1,15 @@
+import os
 import sys
+import threading
+import time
 
-from typing import Callable, Type
+from collections import deque
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple, Type
 from types import TracebackType
 
-from traceback import format_exception
+from traceback import format_exception, walk_tb
 
-from typing_extensions import NoReturn
+from typing_extensions import NoReturn, Protocol
 
 from postscriptum.exceptions import PubSubExit
 
@@ -33,7 +37,184 @@ def force_exit(code) -> NoReturn:
     raise PubSubExit(code)
 
 
+class Deadline:
+    """ A point in time after which shutdown steps should give up
+
+    Args:
+        timeout: how many seconds from now until the deadline. None means
+                 there is no deadline.
+
+    Example:
+
+        deadline = Deadline(10)
+        thread.join(deadline.remaining())
+
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+
+    def remaining(self) -> Optional[float]:
+        """ Seconds left before the deadline, never negative. None if there is none """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
 def format_stacktrace(
     type_: Type[Exception], exception: Exception, traceback: TracebackType
 ) -> str:
     return "\n".join(format_exception(type_, exception, traceback))
+
+
+class DescribedCall(Protocol):
+    """ A callable for run_concurrently(), saying what it does for reports """
+
+    description: str
+
+    def __call__(self) -> Any:
+        ...
+
+
+def sort_outcomes(
+    calls: Sequence[DescribedCall], outcomes: Sequence["CallOutcome"]
+) -> Tuple[int, List[Tuple[str, BaseException]], List[str]]:
+    """ Count the calls done, and list errors and timeouts by description
+
+    outcomes must be what run_concurrently(calls) returned.
+    """
+    done = 0
+    errors: List[Tuple[str, BaseException]] = []
+    timed_out: List[str] = []
+    for call, outcome in zip(calls, outcomes):
+        if not outcome.done:
+            timed_out.append(call.description)
+        elif outcome.error:
+            errors.append((call.description, outcome.error))
+        else:
+            done += 1
+    return done, errors, timed_out
+
+
+class CallOutcome(NamedTuple):
+    """ What happened to a callable passed to run_concurrently() """
+
+    func: Callable[[], Any]
+    done: bool
+    error: Optional[BaseException]
+
+
+def run_concurrently(
+    funcs: Sequence[Callable[[], Any]],
+    max_workers: int = 8,
+    timeout: Optional[float] = None,
+) -> List[CallOutcome]:
+    """ Call all funcs in daemon threads, at most max_workers at a time
+
+    We don't use concurrent.futures for this: it refuses new work once the
+    interpreter starts to shut down, which is exactly when we need it. Threads
+    are daemons so that a call stuck past the timeout can't prevent the
+    process from exiting.
+
+    Args:
+        funcs: callables taking no arguments.
+        max_workers: the maximum number of threads to start.
+        timeout: how long to wait for all calls to be done. None means forever.
+                 Calls not started when it expires are abandoned.
+
+    Example:
+
+        outcomes = run_concurrently([f.close for f in files], timeout=5)
+        failed = [o for o in outcomes if o.error or not o.done]
+
+    """
+    outcomes: List[Optional[CallOutcome]] = [None] * len(funcs)
+    pending = deque(enumerate(funcs))
+    remaining = [len(funcs)]
+    lock = threading.Lock()
+    all_done = threading.Event()
+    abandoned = threading.Event()
+
+    def worker():
+        while not abandoned.is_set():
+            try:
+                index, func = pending.popleft()
+            except IndexError:
+                return
+            error = None
+            try:
+                func()
+            except BaseException as e:  # pylint: disable=broad-except
+                error = e
+            outcomes[index] = CallOutcome(func, True, error)
+            with lock:
+                remaining[0] -= 1
+                if not remaining[0]:
+                    all_done.set()
+
+    if not funcs:
+        return []
+
+    for _ in range(min(max_workers, len(funcs))):
+        try:
+            threading.Thread(target=worker, daemon=True).start()
+        except RuntimeError:  # Too late in the interpreter shutdown for threads
+            worker()
+            break
+
+    all_done.wait(timeout)
+    abandoned.set()
+
+    return [
+        outcome or CallOutcome(func, False, None)
+        for outcome, func in zip(outcomes, funcs)
+    ]
+
+
+def fingerprint_exception(
+    type_: Type[BaseException], traceback: Optional[TracebackType]
+) -> int:
+    """ A stable 64 bits hash identifying where an exception comes from
+
+    It's computed from the exception type and the list of frames it went
+    through. Line numbers and leading directories are left out, so that the
+    same bug gives the same fingerprint across unrelated edits and different
+    install paths.
+
+    Example:
+
+        try:
+            1 / 0
+        except ZeroDivisionError as e:
+            fingerprint = fingerprint_exception(type(e), e.__traceback__)
+
+    """
+    import hashlib  # Slow to import, and only needed once something crashed
+
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f"{type_.__module__}.{type_.__qualname__}".encode())
+    if isinstance(traceback, TracebackType):
+        for frame, _ in walk_tb(traceback):
+            code = frame.f_code
+            parent, filename = os.path.split(code.co_filename)
+            location = f"|{os.path.basename(parent)}/{filename}:{code.co_name}"
+            digest.update(location.encode())
+    return int.from_bytes(digest.digest(), "little")
+
+
+def raised_at(traceback: Optional[TracebackType]) -> str:
+    """ "filename:line" of the innermost frame of traceback
+
+    Much cheaper than fingerprint_exception(), for deduplicating events
+    that can happen millions of times.
+    """
+    if not isinstance(traceback, TracebackType):
+        return "<unknown>"
+    while traceback.tb_next is not None:
+        traceback = traceback.tb_next
+    return f"{traceback.tb_frame.f_code.co_filename}:{traceback.tb_lineno}"
@@ -0,0 +1,301 @@
+"""Report crashes of multiprocessing workers to the parent process
+
+Without this, a worker dying in a ProcessPoolExecutor only shows up in the
+parent as a BrokenProcessPool, with no detail.
+
+The parent gives pools an initializer installing a PubSub in each worker.
+Its crash and terminate handlers send an event to the parent through a
+multiprocessing.Queue. Putting in such a queue doesn't block: a feeder
+thread writes items in batches to the underlying pipe, and it is flushed
+when the worker exits. In the parent, a listener thread reads all the
+events available at once and calls the child crash handlers for each one.
+
+A worker killed by SIGKILL, or a segfault, can't tell anyone. So each
+worker also sends its pid when it starts, through a pipe written to
+directly so that it arrives even if the worker dies right after, and the
+listener watches the sentinel of its process: if it ends with a signal or
+an error code without having sent an event first, the listener reports it
+itself.
+"""
+
+import os
+import sys
+import queue
+import signal
+import threading
+import traceback
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from postscriptum.types import ChildCrashEventType, ChildCrashHandlerType
+from postscriptum.utils import fingerprint_exception, format_stacktrace
+
+if TYPE_CHECKING:  # pragma: no cover
+    import multiprocessing
+
+
+def make_child_crash_event(
+    reason: str,
+    type_: Optional[type] = None,
+    exception: Optional[BaseException] = None,
+    tb: Any = None,
+    sig: int = 0,
+    pid: Optional[int] = None,
+    exit_code: int = 0,
+) -> ChildCrashEventType:
+    """ Build an event that can be pickled to be sent to the parent
+
+    pid is the current process by default.
+    """
+    event: ChildCrashEventType = {
+        "pid": os.getpid() if pid is None else pid,
+        "reason": reason,
+        "exception_type": "",
+        "fingerprint": 0,
+        "stacktrace": "",
+        "signal": int(sig),
+        "exit_code": exit_code,
+    }
+    if type_ is not None:
+        event["exception_type"] = f"{type_.__module__}.{type_.__qualname__}"
+        event["fingerprint"] = fingerprint_exception(type_, tb)
+        event["stacktrace"] = format_stacktrace(type_, exception, tb)  # type: ignore
+    return event
+
+
+def init_worker(
+    events: "multiprocessing.Queue[ChildCrashEventType]",
+    initializer: Optional[Callable[..., Any]] = None,
+    initargs: Iterable[Any] = (),
+    started: Optional["multiprocessing.connection.Connection"] = None,
+):
+    """ Install a PubSub reporting crashes to the parent, then call initializer
+
+    Don't call it directly, use PubSub.worker_initializer() to get a
+    function to pass to a pool.
+    """
+    import faulthandler  # pylint: disable=import-outside-toplevel
+
+    from postscriptum.pubsub import PubSub  # pylint: disable=import-outside-toplevel
+
+    # So that the parent can watch us, even if we die without a word. Unlike
+    # events.put(), send() returns once the pid is written.
+    if started is not None:
+        started.send(os.getpid())
+    # A segfault at least leaves the stack of each thread on stderr
+    if not faulthandler.is_enabled():
+        faulthandler.enable()
+
+    # Workers must still die on terminate, see below
+    pubsub = PubSub(exit_on_terminate=False)
+
+    @pubsub.on_crash()
+    def _(event):
+        exception = event["exception"]
+        events.put(
+            make_child_crash_event(
+                "crash", type(exception), exception, event["traceback"]
+            )
+        )
+
+    @pubsub.on_terminate()
+    def _(event):
+        sig = event["signal"]
+        events.put(make_child_crash_event("terminate", sig=sig))
+        # Exiting with an exception would only fail the current task, so
+        # we flush the event, then die from the signal, like we would have
+        # without postscriptum.
+        events.close()
+        events.join_thread()
+        signal.signal(sig, signal.SIG_DFL)
+        os.kill(os.getpid(), sig)
+
+    pubsub.start()
+
+    if initializer is not None:
+        try:
+            initializer(*initargs)
+        except BaseException:
+            events.put(make_child_crash_event("initializer", *sys.exc_info()))
+            raise
+
+
+class ChildCrashListener:
+    """ Receive crash events from workers and dispatch them to handlers
+
+    Handlers run in the listener thread, once per event: the "called only
+    once" rule of the other events doesn't apply since each event comes
+    from a different worker crash.
+
+    Args:
+        handlers: a collection of handlers, or a function returning them,
+                  read each time an event arrives.
+        mp_context: the multiprocessing context used to create the queue.
+                    Use the one your pool uses.
+
+    Example:
+
+        listener = ChildCrashListener([print])
+        pool = ProcessPoolExecutor(initializer=listener.initializer())
+
+    """
+
+    def __init__(
+        self,
+        handlers: Union[
+            Iterable[ChildCrashHandlerType],
+            Callable[[], Iterable[ChildCrashHandlerType]],
+        ],
+        mp_context=None,
+    ):
+        if mp_context is None:
+            import multiprocessing as mp_context
+
+        self.handlers = handlers
+        self.events = mp_context.Queue()
+        self._started, self._started_writer = mp_context.Pipe(duplex=False)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Only used by the listener thread: the processes of the workers that
+        # started, and the pids of the ones that sent an event already
+        self._workers: Dict[int, "multiprocessing.process.BaseProcess"] = {}
+        self._reported: Set[int] = set()
+
+    def initializer(
+        self,
+        initializer: Optional[Callable[..., Any]] = None,
+        initargs: Tuple[Any, ...] = (),
+    ) -> Callable[[], None]:
+        """ Return an initializer for a pool, wrapping your own if any
+
+        Starts the listener thread if needed.
+        """
+        self.start()
+        return WorkerInitializer(
+            self.events, initializer, initargs, self._started_writer
+        )
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._listen,
+                    name="postscriptum-child-crashes",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """ Dispatch the events already received, then stop the thread
+
+        Return False if the thread didn't stop before timeout.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return True
+        self.events.put(None)
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def _listen(self):
+        from multiprocessing.connection import wait
+
+        reader = self.events._reader  # type: ignore  # What the queue reads from
+        while True:
+            sentinels = {
+                process.sentinel: pid for pid, process in self._workers.items()
+            }
+            ready = wait([reader, self._started, *sentinels])
+            # Before their events, so that we know they are reported
+            if self._started in ready:
+                while self._started.poll():
+                    self._watch(self._started.recv())
+            # Before looking at exited workers, which may have sent an event
+            if reader in ready:
+                batch: List[Optional[ChildCrashEventType]] = []
+                while True:
+                    try:
+                        batch.append(self.events.get_nowait())
+                    except queue.Empty:
+                        break
+                for event in batch:
+                    if event is None:
+                        return
+                    self._receive(event)
+            for sentinel in ready:
+                if sentinel in sentinels:
+                    self._worker_exited(sentinels[sentinel])
+
+    def _receive(self, event: ChildCrashEventType):
+        if event["pid"] in self._workers:
+            self._reported.add(event["pid"])
+        self.dispatch(event)
+
+    def _watch(self, pid: int):
+        """ Keep the process of a worker that just started, to get its exit code """
+        # Not public, but it's the only way to get the process from its pid.
+        # A worker already joined is not there, we can't watch it anymore.
+        import multiprocessing.process  # pylint: disable=import-outside-toplevel
+
+        for process in list(getattr(multiprocessing.process, "_children", ())):
+            if process.pid == pid:
+                self._workers[pid] = process
+                break
+
+    def _worker_exited(self, pid: int):
+        """ Report the worker if it died without sending an event """
+        process = self._workers.pop(pid)
+        if pid in self._reported:
+            self._reported.discard(pid)
+            return
+        exit_code = process.exitcode
+        if exit_code is None:  # The pool is reaping it at the same time
+            process.join(1)
+            exit_code = process.exitcode
+        if not exit_code:
+            return
+        if exit_code < 0:
+            event = make_child_crash_event("killed", sig=-exit_code, pid=pid)
+        else:
+            event = make_child_crash_event("exit", pid=pid, exit_code=exit_code)
+        self.dispatch(event)
+
+    def dispatch(self, event: ChildCrashEventType):
+        handlers = self.handlers() if callable(self.handlers) else self.handlers
+        for handler in list(handlers):
+            try:
+                handler(event)
+            except Exception:  # pylint: disable=broad-except
+                # Don't let a faulty handler stop the reporting of other crashes
+                traceback.print_exc()
+
+
+class WorkerInitializer:
+    """ A picklable callable to pass to pools as initializer """
+
+    def __init__(
+        self,
+        events: "multiprocessing.Queue[ChildCrashEventType]",
+        initializer: Optional[Callable[..., Any]],
+        initargs: Tuple[Any, ...],
+        started: Optional["multiprocessing.connection.Connection"] = None,
+    ):
+        self.events = events
+        self.initializer = initializer
+        self.initargs = initargs
+        self.started = started
+
+    def __call__(self):
+        init_worker(self.events, self.initializer, self.initargs, self.started)
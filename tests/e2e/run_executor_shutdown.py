@@ -0,0 +1,23 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from postscriptum import PubSub
+
+ps = PubSub(shutdown_timeout=0.5)
+pool = ps.register_executor(ThreadPoolExecutor(max_workers=1))
+
+
+def stuck_task():
+    threading.Event().wait()
+
+
+@ps.on_finish()
+def _(event):  # type: ignore
+    print(f"cancelled {ps.shutdown_report['executors']['cancelled']}", flush=True)
+
+
+ps.start()
+pool.submit(stuck_task)
+for _ in range(5):
+    pool.submit(print, "queued task ran", flush=True)
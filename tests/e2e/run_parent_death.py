@@ -0,0 +1,27 @@
+import sys
+import time
+import subprocess
+
+from postscriptum import PubSub
+from postscriptum.children import parent_death_signal
+
+if sys.argv[1] == "parent":
+    child = subprocess.Popen(
+        [sys.executable, __file__, "child", sys.argv[2]],
+        preexec_fn=parent_death_signal(),
+    )
+    print(child.pid, flush=True)
+
+else:
+    ps = PubSub()
+
+    @ps.on_terminate()
+    def _(event):  # type: ignore
+        with open(sys.argv[2], "w") as f:
+            f.write(f"terminated by {event['signal']}")
+
+    ps.start()
+    print("ready", flush=True)
+
+for x in range(100):
+    time.sleep(0.1)
@@ -0,0 +1,44 @@
+import sys
+import asyncio
+
+from postscriptum import PubSub
+
+ps = PubSub(shutdown_timeout=float(sys.argv[1]))
+
+
+@ps.on_finish()
+def _(event):  # type: ignore
+    report = ps.shutdown_report["tasks"]
+    unfinished = [task["task"] for task in report["unfinished"]]
+    print(f"cancelled {report['cancelled']} unfinished {unfinished}", flush=True)
+
+
+async def worker(cleanup):
+    try:
+        await asyncio.sleep(100)
+    finally:
+        print("cleaned up" if cleanup else "stuck", flush=True)
+        while not cleanup:
+            try:
+                await asyncio.sleep(100)
+            except asyncio.CancelledError:
+                pass
+
+
+async def protected():
+    await asyncio.sleep(100)
+
+
+async def main():
+    ps.register_loop()
+    ps.protect_task(asyncio.ensure_future(protected()))
+    tasks = [asyncio.ensure_future(worker(cleanup=True)) for _ in range(3)]
+    if len(sys.argv) > 2:
+        tasks.append(asyncio.ensure_future(worker(cleanup=False)))
+    await asyncio.sleep(0)
+    print("ready", flush=True)
+    await asyncio.gather(*tasks)
+
+
+ps.start()
+asyncio.run(main())
@@ -0,0 +1,31 @@
+import sys
+import time
+import threading
+
+from postscriptum import PubSub
+
+ps = PubSub(shutdown_timeout=0.5)
+ps.threads.force_exit = True
+
+
+def stuck_forever():
+    while True:
+        time.sleep(0.1)
+
+
+def worker(stop):
+    stop.wait()
+    print("worker stopped", flush=True)
+
+
+@ps.always()
+def _(event):  # type: ignore
+    print(f"finished, stuck: {list(ps.shutdown_report['threads']['stuck'])}")
+
+
+with ps():
+    stop = threading.Event()
+    ps.register_thread(threading.Thread(target=worker, args=(stop,)), stop).start()
+    threading.Thread(target=stuck_forever, name="stuck").start()
+    if len(sys.argv) > 1:
+        sys.exit(3)
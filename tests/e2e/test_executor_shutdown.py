@@ -0,0 +1,20 @@
+import sys
+
+from subprocess import run, PIPE
+from pathlib import Path
+
+TEST_SCRIPT = Path(__file__).absolute().parent / "run_executor_shutdown.py"
+
+
+def test_queued_work_is_cancelled_at_exit():
+
+    process = run(
+        [sys.executable, str(TEST_SCRIPT)], stdout=PIPE, stderr=PIPE, timeout=10
+    )
+
+    assert process.returncode == 1, "The stuck task doesn't prevent the exit"
+    assert b"queued task ran" not in process.stdout
+    assert b"cancelled 5" in process.stdout
+    assert b"didn't shut down in time, still running: __main__.stuck_task()" in (
+        process.stderr
+    )
@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+import signal
+
+from subprocess import Popen, PIPE
+from pathlib import Path
+
+import pytest
+
+TEST_SCRIPT = Path(__file__).absolute().parent / "run_parent_death.py"
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only test")
+def test_child_is_terminated_when_parent_is_killed(tmp_path):
+
+    output = tmp_path / "child_output"
+    parent = Popen(
+        [sys.executable, str(TEST_SCRIPT), "parent", str(output)], stdout=PIPE
+    )
+    child_pid = int(parent.stdout.readline())
+    assert parent.stdout.readline() == b"ready\n"
+
+    parent.send_signal(signal.SIGKILL)
+    parent.wait()
+    parent.stdout.close()
+
+    for _ in range(50):
+        if output.exists() and output.read_text():
+            break
+        time.sleep(0.1)
+
+    assert output.read_text() == f"terminated by {int(signal.SIGTERM)}"
+
+    for _ in range(50):
+        try:
+            os.kill(child_pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        os.kill(child_pid, signal.SIGKILL)
+        assert False, "The child should have exited"
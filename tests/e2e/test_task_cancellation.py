@@ -0,0 +1,40 @@
+import sys
+import signal
+
+from subprocess import Popen, PIPE
+from pathlib import Path
+
+import pytest
+
+from postscriptum.utils import IS_UNIX
+
+TEST_SCRIPT = Path(__file__).absolute().parent / "run_task_cancellation.py"
+
+
+def run_and_terminate(*args):
+    process = Popen([sys.executable, str(TEST_SCRIPT), *args], stdout=PIPE)
+    assert process.stdout.readline() == b"ready\n"
+    process.send_signal(signal.SIGTERM)
+    output = process.stdout.read().decode()
+    process.stdout.close()
+    return process.wait(10), output
+
+
+@pytest.mark.skipif(not IS_UNIX, reason="Unix only test")
+def test_tasks_are_cancelled_on_terminate():
+
+    exit_code, output = run_and_terminate("5")
+
+    assert exit_code == 128 + signal.SIGTERM
+    assert output.count("cleaned up") == 3
+    assert "cancelled 3 unfinished []" in output, "The protected task is left"
+
+
+@pytest.mark.skipif(not IS_UNIX, reason="Unix only test")
+def test_stuck_tasks_are_reported():
+
+    exit_code, output = run_and_terminate("0.5", "stuck")
+
+    assert exit_code == 128 + signal.SIGTERM
+    assert output.count("cleaned up") == 3
+    assert "cancelled 3 unfinished ['Task-" in output
@@ -0,0 +1,24 @@
+import sys
+
+from subprocess import run, PIPE
+from pathlib import Path
+
+import pytest
+
+TEST_SCRIPT = Path(__file__).absolute().parent / "run_thread_barrier.py"
+
+
+@pytest.mark.parametrize("args, exit_code", [((), 1), (("quit",), 3)])
+def test_stuck_threads_dont_prevent_exit(args, exit_code):
+
+    process = run(
+        [sys.executable, str(TEST_SCRIPT), *args], stdout=PIPE, stderr=PIPE, timeout=10
+    )
+
+    assert process.returncode == exit_code
+    assert process.stdout.splitlines() == [
+        b"worker stopped",
+        b"finished, stuck: ['stuck']",
+    ]
+    assert b"thread stuck is still running" in process.stderr
+    assert b"in stuck_forever" in process.stderr
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+
+import pytest
+
+from postscriptum.aio import EventDispatcher, LoopRegistry, async_error_key
+
+
+def test_async_error_key():
+
+    try:
+        raise ValueError()
+    except ValueError as e:
+        key = async_error_key({"message": "Task failed", "exception": e})
+
+    assert key[0] == "ValueError"
+    assert key[2].startswith(__file__)
+
+    assert async_error_key({"message": "Task was destroyed"}) == (
+        "",
+        "Task was destroyed",
+        "",
+    )
+
+
+def test_event_dispatcher(capsys):
+
+    events = []
+    threads = set()
+
+    def dispatch(event):
+        threads.add(threading.current_thread())
+        if event == "faulty":
+            raise TypeError()
+        events.append(event)
+
+    dispatcher = EventDispatcher(dispatch, name="test-dispatcher")
+    assert dispatcher.stop(), "Stopping a dispatcher never started is a noop"
+
+    for event in ("a", "faulty", "b"):
+        dispatcher.put(event)
+    assert dispatcher.stop(5)
+
+    assert events == ["a", "b"]
+    assert [thread.name for thread in threads] == ["test-dispatcher"]
+    assert "TypeError" in capsys.readouterr().err
+
+
+async def sleep_forever(cleanups, stubborn=False):
+    try:
+        await asyncio.sleep(100)
+    finally:
+        cleanups.append(stubborn)
+        while stubborn:
+            try:
+                await asyncio.sleep(100)
+            except asyncio.CancelledError:
+                pass
+
+
+def test_cancel_tasks_of_stopped_loop():
+
+    cleanups = []
+    loop = asyncio.new_event_loop()
+    registry = LoopRegistry()
+    registry.register(loop)
+    assert len(registry) == 1
+
+    try:
+        tasks = [loop.create_task(sleep_forever(cleanups)) for _ in range(3)]
+        protected = registry.protect(loop.create_task(sleep_forever(cleanups)))
+        loop.run_until_complete(asyncio.sleep(0))
+
+        report, current_loop = registry.cancel_all(timeout=5)
+
+        assert current_loop is None
+        assert report == {"cancelled": 3, "unfinished": [], "timed_out": False}
+        assert all(task.cancelled() for task in tasks)
+        assert not protected.done()
+        assert not len(registry), "Loops are forgotten once cancelled"
+    finally:
+        protected.cancel()
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
+
+
+def test_cancel_tasks_of_loop_in_another_thread():
+
+    cleanups = []
+    loop = asyncio.new_event_loop()
+    registry = LoopRegistry()
+    registry.register(loop)
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+
+    try:
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), loop).result()
+        for stubborn in (False, True):
+            loop.call_soon_threadsafe(
+                loop.create_task, sleep_forever(cleanups, stubborn)
+            )
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), loop).result()
+
+        report, current_loop = registry.cancel_all(timeout=0.5)
+
+        assert current_loop is None
+        assert report["cancelled"] == 1
+        assert sorted(cleanups) == [False, True]
+        (unfinished,) = report["unfinished"]
+        assert "sleep_forever" in unfinished["stack"]
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def test_cancel_tasks_of_current_loop():
+
+    registry = LoopRegistry()
+
+    async def main():
+        registry.register(asyncio.get_event_loop())
+        return registry.cancel_all()
+
+    loop = asyncio.new_event_loop()
+    try:
+        report, current_loop = loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+    assert current_loop is loop, "We can't wait for the loop we are running in"
+    assert report["cancelled"] == 0
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+from postscriptum.bulk import BulkCleanup, BulkCleanupRegistry
+from postscriptum.pubsub import PubSub
+
+
+def test_bulk_cleanup():
+
+    batches = []
+    cleanup = BulkCleanup(batches.append, batch_size=3)
+    for i in range(7):
+        cleanup.append(i, "path")
+    assert cleanup.discard(6, "path")
+    assert not cleanup.discard(6, "path")
+    assert len(cleanup) == 6
+
+    report = cleanup.run()
+    assert batches == [
+        [(0, "path"), (1, "path"), (2, "path")],
+        [(3, "path"), (4, "path"), (5, "path")],
+    ]
+    assert report == {
+        "items": 6,
+        "batches": 2,
+        "errors": [],
+        "left": 0,
+        "timed_out": False,
+    }
+    assert not cleanup
+
+    with pytest.raises(ValueError):
+        BulkCleanup(print, batch_size=0)
+
+
+def test_bulk_cleanup_errors_and_timeout():
+
+    def fail(batch):
+        if batch[0] == (0,):
+            raise OSError("boom")
+
+    cleanup = BulkCleanup(fail, batch_size=2)
+    for i in range(5):
+        cleanup.append(i)
+    report = cleanup.run()
+    (error,) = report["errors"]
+    assert isinstance(error, OSError)
+    assert report["items"] == 3 and report["batches"] == 3, "Errors don't stop us"
+
+    cleanup.append(1)
+    assert cleanup.run(timeout=0)["left"] == 1
+    assert not cleanup, "Items left at the deadline are dropped"
+
+
+def test_bulk_cleanup_stuck_batch():
+
+    event = threading.Event()
+    batches = []
+
+    def stuck(batch):
+        batches.append(batch)
+        event.wait()
+
+    cleanup = BulkCleanup(stuck, batch_size=2)
+    for i in range(5):
+        cleanup.append(i)
+    report = cleanup.run(timeout=0.1)
+    event.set()
+
+    assert len(batches) == 1, "We don't start another batch after the deadline"
+    assert report["timed_out"]
+    assert report["items"] == report["batches"] == 0
+    assert report["left"] == 5, "The stuck batch is not done"
+    assert not cleanup
+
+
+def test_registry():
+
+    calls = []
+    registry = BulkCleanupRegistry()
+
+    def remove(paths):
+        calls.append(paths)
+
+    assert registry.register(remove) is registry.register(remove)
+    cleanup = registry.register(remove)
+
+    threads = [
+        threading.Thread(target=lambda: [cleanup.append("x") for _ in range(1000)])
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    (name, report), = registry.run_all().items()
+    assert name.endswith("remove()")
+    assert report["items"] == 4000 and report["batches"] == 4
+    assert len(registry) == 1, "Functions stay registered"
+    assert registry.run_all() == {}, "But their items are gone"
+
+
+def test_pubsub_runs_bulk_cleanups_after_finish_handlers():
+
+    log = []
+    ps = PubSub()
+    cleanup = ps.register_bulk_cleanup(log.append)
+    cleanup.append("file")
+
+    @ps.on_finish()
+    def _(event):
+        log.append("finish")
+
+    @ps.always()
+    def _(event):
+        (report,) = ps.shutdown_report["bulk_cleanups"].values()
+        log.append(report["items"])
+
+    ps._handle_finish()
+
+    assert log == ["finish", [("file",)], 1]
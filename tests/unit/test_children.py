@@ -0,0 +1,158 @@
+import os
+import sys
+import errno
+import signal
+import subprocess
+
+from unittest.mock import patch
+
+import pytest
+
+from postscriptum.children import (
+    ChildRegistry,
+    has_exited,
+    wait_children,
+    parent_death_signal,
+)
+from postscriptum.pubsub import PubSub
+from postscriptum.utils import IS_UNIX, Deadline
+
+pytestmark = pytest.mark.skipif(not IS_UNIX, reason="Unix only tests")
+
+SLEEPER = [sys.executable, "-c", "import time; time.sleep(30)"]
+
+# Ignores SIGTERM, so it has to be killed
+STUBBORN = [
+    sys.executable,
+    "-c",
+    "import signal, time, sys\n"
+    "signal.signal(signal.SIGTERM, signal.SIG_IGN)\n"
+    "print('ready', flush=True)\n"
+    "time.sleep(30)",
+]
+
+
+def start_stubborn(**kwargs):
+    process = subprocess.Popen(STUBBORN, stdout=subprocess.PIPE, **kwargs)
+    process.stdout.readline()
+    process.stdout.close()
+    return process
+
+
+def test_terminate_all_concurrently():
+
+    registry = ChildRegistry(grace_period=5)
+    children = [registry.register(subprocess.Popen(SLEEPER)) for _ in range(5)]
+    done = registry.register(subprocess.Popen([sys.executable, "-c", ""]))
+    done.wait()
+
+    report = registry.terminate_all(timeout=10)
+
+    assert sorted(report["terminated"]) == sorted(c.pid for c in children)
+    assert report["killed"] == report["still_running"] == []
+    assert all(c.returncode == -signal.SIGTERM for c in children)
+    assert not registry, "Children are forgotten"
+
+
+def test_kill_after_grace_period():
+
+    registry = ChildRegistry(grace_period=0.2)
+    stubborn = registry.register(start_stubborn())
+    sleeper = registry.register(subprocess.Popen(SLEEPER))
+
+    report = registry.terminate_all(timeout=5)
+
+    assert report == {
+        "terminated": [sleeper.pid],
+        "killed": [stubborn.pid],
+        "still_running": [],
+    }
+    assert stubborn.returncode == -signal.SIGKILL
+
+    registry = ChildRegistry(grace_period=0.1, kill=False)
+    stubborn = registry.register(start_stubborn())
+    report = registry.terminate_all()
+    assert report["still_running"] == [stubborn.pid]
+    stubborn.kill()
+    stubborn.wait()
+
+
+def test_process_group():
+
+    registry = ChildRegistry(process_group=True)
+    child = registry.register(subprocess.Popen(SLEEPER, start_new_session=True))
+    registry.register(os.getpid() + 10 ** 6)  # Doesn't exist
+
+    with patch("os.killpg", wraps=os.killpg) as killpg:
+        report = registry.terminate_all(timeout=5)
+
+    killpg.assert_called_once_with(child.pid, signal.SIGTERM)
+    assert child.pid in report["terminated"]
+
+
+def test_wait_children_without_pidfd():
+
+    child = subprocess.Popen(SLEEPER)
+    with patch.dict(os.__dict__):
+        os.__dict__.pop("pidfd_open", None)
+        assert wait_children([child], Deadline(0.05)) == [child]
+        child.terminate()
+        assert wait_children([child], Deadline(5)) == []
+    assert has_exited(child)
+
+
+def test_kill_when_pidfds_are_refused():
+
+    def pidfd_open(pid):
+        raise OSError(errno.ENOSYS, "Function not implemented")
+
+    registry = ChildRegistry(grace_period=0.2)
+    stubborn = registry.register(start_stubborn())
+    with patch.object(os, "pidfd_open", pidfd_open, create=True):
+        report = registry.terminate_all(timeout=5)
+
+    assert report["killed"] == [stubborn.pid], "We poll them instead"
+    assert stubborn.returncode == -signal.SIGKILL
+
+
+def test_pubsub_runs_stages_after_a_failing_one():
+
+    ps = PubSub()
+    child = ps.register_child(subprocess.Popen(SLEEPER))
+    closeable = ps.register_closeable(open(os.devnull))
+
+    with patch.object(ps.children, "terminate_all", side_effect=OSError("boom")):
+        ps._handle_finish()
+    child.kill()
+    child.wait()
+
+    assert isinstance(ps.shutdown_report["stage_errors"]["children"], OSError)
+    assert closeable.closed, "The stages after it still run"
+
+
+def test_pubsub_terminates_children():
+
+    ps = PubSub()
+    child = ps.register_child(subprocess.Popen(SLEEPER))
+    ps._handle_finish()
+
+    assert child.returncode == -signal.SIGTERM
+    assert ps.shutdown_report["children"]["terminated"] == [child.pid]
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only test")
+def test_parent_death_signal():
+
+    set_signal = parent_death_signal(signal.SIGUSR1)
+    script = (
+        "import ctypes, signal, sys\n"
+        f"sys.path[:0] = {sys.path!r}\n"
+        "libc = ctypes.CDLL(None)\n"
+        "value = ctypes.c_int()\n"
+        "libc.prctl(2, ctypes.byref(value))\n"  # PR_GET_PDEATHSIG
+        "print(value.value)\n"
+    )
+    output = subprocess.check_output(
+        [sys.executable, "-c", script], preexec_fn=set_signal
+    )
+    assert int(output) == signal.SIGUSR1
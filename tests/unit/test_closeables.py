@@ -0,0 +1,231 @@
+import gc
+import asyncio
+import threading
+
+from unittest.mock import Mock
+
+import pytest
+
+from postscriptum.closeables import CloseableRegistry, find_close_method_name
+from postscriptum.pubsub import PubSub
+
+
+class Resource:
+    def __init__(self, log, name):
+        self.log = log
+        self.name = name
+
+    def close(self):
+        self.log.append(self.name)
+
+
+class AsyncResource:
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+class Pool:
+    def __init__(self):
+        self.shutdown = Mock()
+
+
+def test_find_close_method_name():
+
+    assert find_close_method_name(Resource([], "r")) == "close"
+    assert find_close_method_name(AsyncResource()) == "aclose"
+    assert find_close_method_name(Pool()) == "shutdown"
+
+    with pytest.raises(TypeError):
+        find_close_method_name(object())
+
+
+def test_close_all_groups_in_lifo_order():
+
+    log = []
+    registry = CloseableRegistry()
+
+    first = [registry.register(Resource(log, f"first{i}")) for i in range(3)]
+    second = [registry.register(Resource(log, f"second{i}"), "b") for i in range(3)]
+    pool = registry.register(Pool(), "b")
+
+    assert len(registry) == 7
+
+    report = registry.close_all()
+
+    assert report == {"closed": 7, "errors": [], "timed_out": [], "skipped": []}
+    assert set(log[:3]) == {r.name for r in second}, "Last group is closed first"
+    assert set(log[3:]) == {r.name for r in first}
+    pool.shutdown.assert_called_once_with()
+    assert not registry, "The registry is empty after closing"
+
+
+def test_close_coroutines_in_their_loop():
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+
+    async def register():
+        return registry.register(AsyncResource())
+
+    registry = CloseableRegistry()
+    try:
+        in_loop = asyncio.run_coroutine_threadsafe(register(), loop).result(5)
+        explicit = registry.register(AsyncResource(), loop=loop)
+        without_loop = registry.register(AsyncResource())
+        report = registry.close_all(timeout=5)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    assert in_loop.closed, "The loop running at registration is used by default"
+    assert explicit.closed
+    assert not without_loop.closed, "No loop to run aclose() in, it's skipped"
+    assert report["closed"] == 2
+    assert report["skipped"] == [f"{without_loop!r}.aclose()"]
+    assert not report["errors"]
+
+
+def test_skip_coroutines_of_stopped_loops():
+
+    registry = CloseableRegistry()
+
+    async def main():
+        return registry.register(AsyncResource())
+
+    resource = asyncio.run(main())
+    report = registry.close_all()
+
+    assert not resource.closed, "Running it in another loop could break it"
+    assert report["skipped"] == [f"{resource!r}.aclose()"]
+
+
+def test_close_all_collects_errors():
+
+    log = []
+    registry = CloseableRegistry()
+    failing = Mock(spec=["close"])
+    failing.close.side_effect = OSError("boom")
+    ok = registry.register(Resource(log, "ok"))
+    registry.register(failing)
+
+    report = registry.close_all()
+
+    assert report["closed"] == 1
+    (description, error), = report["errors"]
+    assert "close()" in description
+    assert isinstance(error, OSError)
+    assert log == [ok.name], "An error doesn't stop the other objects from closing"
+
+
+def test_close_concurrently():
+
+    barrier = threading.Barrier(4, timeout=5)
+
+    class Waiting:
+        def close(self):
+            barrier.wait()
+
+    registry = CloseableRegistry(max_workers=4)
+    resources = [registry.register(Waiting()) for _ in range(4)]
+
+    report = registry.close_all()
+    assert report == {"closed": 4, "errors": [], "timed_out": [], "skipped": []}, (
+        "All objects of a group should be closed at the same time,"
+        " otherwise the barrier would time out"
+    )
+
+
+def test_close_all_timeout():
+
+    event = threading.Event()
+
+    class Stuck:
+        def close(self):
+            event.wait()
+
+    registry = CloseableRegistry()
+    stuck = registry.register(Stuck())
+    report = registry.close_all(timeout=0.05)
+    event.set()
+
+    assert report["closed"] == 0
+    assert report["timed_out"] == [f"{stuck!r}.close()"]
+
+
+def test_registry_holds_weak_references():
+
+    registry = CloseableRegistry()
+    resource = registry.register(Resource([], "r"))
+    assert len(registry) == 1
+
+    class Slotted:
+        __slots__ = ()
+
+        def close(self):
+            pass
+
+    with pytest.raises(TypeError):
+        registry.register(Slotted())
+
+    del resource
+    gc.collect()
+    assert not registry, "Garbage collected objects are forgotten"
+
+    resource = registry.register(Resource([], "r"))
+    assert registry.unregister(resource)
+    assert not registry.unregister(resource)
+    assert not registry
+
+
+def test_collecting_while_registering_does_not_deadlock():
+
+    class CollectingGroup(str):
+        """ Runs the GC when hashed, so while the registry is locked """
+
+        def __hash__(self):
+            gc.collect()
+            return super().__hash__()
+
+    registry = CloseableRegistry()
+    done = threading.Event()
+
+    def register():
+        resource = registry.register(Resource([], "r"))
+        resource.cycle = resource  # Only freed by the cyclic GC
+        del resource
+        registry.register(Resource([], "r"), group=CollectingGroup("other"))
+        done.set()
+
+    gc.disable()
+    try:
+        threading.Thread(target=register, daemon=True).start()
+        assert done.wait(5), "A weakref callback waited for our own lock"
+    finally:
+        gc.enable()
+
+    gc.collect()
+    assert not registry
+
+
+def test_pubsub_closes_after_finish_handlers():
+
+    log = []
+    ps = PubSub()
+    resource = ps.register_closeable(Resource(log, "resource"))
+
+    @ps.on_finish()
+    def _(event):
+        log.append("finish")
+
+    @ps.always()
+    def _(event):
+        log.append(ps.shutdown_report["closeables"]["closed"])
+
+    ps._handle_finish()
+
+    assert log == ["finish", "resource", 1]
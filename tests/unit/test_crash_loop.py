@@ -0,0 +1,92 @@
+import time
+
+from unittest.mock import patch
+
+import pytest
+
+from postscriptum.crash_loop import CrashLoop, CrashLoopGuard
+from postscriptum.journal import ExitReason, RECORD
+from postscriptum.pubsub import PubSub
+
+
+def test_check(tmp_path):
+
+    guard = CrashLoopGuard(tmp_path / "history", threshold=3, window=60)
+    assert guard.check() is None, "No history means no crash loop"
+
+    for _ in range(2):
+        guard.record(ExitReason.CRASH, 1, fingerprint=42)
+    guard.record(ExitReason.CRASH, 1, fingerprint=7)
+    guard.record(ExitReason.TERMINATE, 143, signal=15)
+    assert guard.check() is None
+
+    guard.record(ExitReason.CRASH, 1, fingerprint=42)
+    assert guard.check() == CrashLoop(42, 3, 1.0)
+
+    guard.record(ExitReason.CRASH, 1, fingerprint=42)
+    guard.record(ExitReason.CRASH, 1, fingerprint=42)
+    assert guard.check() == CrashLoop(42, 5, 4.0), "The delay grows exponentially"
+
+    assert guard.check(now=time.time() + 61) is None, "Old crashes are ignored"
+
+    guard.max_delay = 2
+    assert guard.check().delay == 2
+
+
+def test_history_is_trimmed(tmp_path):
+
+    path = tmp_path / "history"
+    guard = CrashLoopGuard(path, history_size=4)
+
+    for i in range(7):
+        guard.record(ExitReason.CRASH, fingerprint=i)
+    assert path.stat().st_size == 7 * RECORD.size
+
+    guard.record(ExitReason.CRASH, fingerprint=7)
+    assert [r.fingerprint for r in guard.read()] == [4, 5, 6, 7]
+
+
+def test_check_is_fast(tmp_path):
+
+    guard = CrashLoopGuard(tmp_path / "history")
+    for i in range(2 * guard.history_size - 1):
+        guard.record(ExitReason.CRASH, fingerprint=i % 3)
+
+    start = time.perf_counter()
+    for _ in range(100):
+        guard.check()
+    assert (time.perf_counter() - start) / 100 < 0.001
+
+
+def test_pubsub_crash_loop_policies(tmp_path):
+
+    path = tmp_path / "history"
+    guard = CrashLoopGuard(path, threshold=2)
+    for _ in range(2):
+        guard.record(ExitReason.CRASH, fingerprint=42)
+
+    ps = PubSub()
+    with pytest.raises(ValueError):
+        ps.detect_crash_loops(path, policy="panic")
+
+    ps.detect_crash_loops(path, threshold=2)
+    with patch("time.sleep") as sleep:
+        ps.start()
+        ps.stop()
+        ps.start()
+    ps.stop()
+    sleep.assert_called_once_with(1.0)
+    assert ps.crash_loop.fingerprint == 42
+    assert not ps.degraded
+
+    ps = PubSub()
+    ps.detect_crash_loops(path, policy="degrade", threshold=2)
+    ps.start()
+    ps.stop()
+    assert ps.degraded
+
+    ps._record_exit({"signal": 15})
+    ps._record_exit({})
+    assert [r.reason for r in guard.read()][-1] == ExitReason.TERMINATE, (
+        "Only crashes and terminations are recorded in the history"
+    )
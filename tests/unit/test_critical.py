@@ -0,0 +1,97 @@
+import os
+import time
+import signal
+import threading
+
+from unittest.mock import patch
+
+import pytest
+
+from postscriptum import critical as critical_module
+from postscriptum.critical import CriticalSection
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(signal, "SIGUSR1"), reason="Needs SIGUSR1"
+)
+
+
+@pytest.fixture
+def received():
+    critical = CriticalSection(["SIGUSR1"])
+    received = []
+
+    def handler(sig, frame):
+        if not critical.defer(sig):
+            received.append(sig)
+
+    previous = signal.signal(signal.SIGUSR1, handler)
+    try:
+        yield critical, received
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+
+
+def wait_for(condition, timeout=1):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+
+def test_signal_deferred_in_main_thread(received):
+    critical, received = received
+
+    with critical:
+        with critical:
+            os.kill(os.getpid(), signal.SIGUSR1)
+            time.sleep(0.01)
+            assert not received
+        assert critical.active
+        time.sleep(0.01)
+        assert not received, "Only the outermost section delivers"
+    assert not critical.active
+    assert wait_for(lambda: received == [signal.SIGUSR1])
+
+
+def test_signal_deferred_in_other_thread(received):
+    critical, received = received
+    entered, release = threading.Event(), threading.Event()
+
+    @critical
+    def commit():
+        entered.set()
+        release.wait(1)
+
+    thread = threading.Thread(target=commit)
+    thread.start()
+    try:
+        entered.wait(1)
+        # The main thread is not in a section, but the handler defers
+        os.kill(os.getpid(), signal.SIGUSR1)
+        time.sleep(0.01)
+        assert not received
+        assert critical.pending == [signal.SIGUSR1]
+    finally:
+        release.set()
+        thread.join(1)
+    assert wait_for(lambda: received == [signal.SIGUSR1])
+    assert not critical.pending
+
+
+def test_nested_sections_make_no_syscall():
+
+    critical = CriticalSection(["SIGUSR1"])
+    with patch.object(
+        critical_module, "pthread_sigmask", wraps=signal.pthread_sigmask
+    ) as sigmask:
+        with critical:
+            for _ in range(10):
+                with critical:
+                    pass
+        assert sigmask.call_count == 2, "Block on enter, restore on exit"
+
+        sigmask.reset_mock()
+        thread = threading.Thread(target=critical.__enter__)
+        thread.start()
+        thread.join()
+        assert not sigmask.call_count, "Only the main thread blocks signals"
@@ -0,0 +1,75 @@
+import sys
+import threading
+
+from unittest.mock import patch
+
+from postscriptum.dedup import CrashReportSink
+from postscriptum.pubsub import PubSub
+
+
+def make_event(fingerprint, stacktrace="Traceback: boom"):
+    return {"fingerprint": fingerprint, "stacktrace": lambda: stacktrace}
+
+
+def test_first_crash_writes_the_report(tmp_path):
+
+    sink = CrashReportSink(tmp_path / "crashes")
+
+    assert sink(make_event(1, "first"))
+    assert not sink(make_event(1, "second"))
+    assert sink(make_event(2))
+
+    assert sink.report(1).endswith("first")
+    assert sink.report(3) is None
+    assert sink.counts() == {1: 2, 2: 1}
+    assert sink.count(3) == 0
+    assert not [p for p in (tmp_path / "crashes").iterdir() if p.suffix == ".tmp"]
+
+
+def test_concurrent_crashes_write_one_report(tmp_path):
+
+    # Several sinks stand in for several processes sharing the directory
+    sinks = [CrashReportSink(tmp_path) for _ in range(16)]
+    written = []
+    barrier = threading.Barrier(len(sinks))
+
+    def crash(sink):
+        barrier.wait()
+        written.append(sink(make_event(42)))
+
+    threads = [threading.Thread(target=crash, args=(sink,)) for sink in sinks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert written.count(True) == 1, "Only one report is written"
+    assert sinks[0].count(42) == 16, "But all crashes are counted"
+
+
+def test_file_systems_without_hard_links(tmp_path):
+
+    sink = CrashReportSink(tmp_path)
+    with patch("os.link", side_effect=PermissionError("no hard links here")):
+        assert sink(make_event(1, "first"))
+        assert not sink.write_report(sink.report_path(1), make_event(1, "second"))
+
+    assert sink.report(1).endswith("first")
+    assert not [p for p in tmp_path.iterdir() if p.suffix == ".tmp"]
+
+
+def test_crash_event_has_fingerprint(tmp_path):
+
+    ps = PubSub()
+    sink = ps.on_crash()(CrashReportSink(tmp_path))
+
+    for _ in range(2):
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            ps._called_handlers.clear()
+            ps._handle_crash(*sys.exc_info(), lambda *args: None)
+
+    (fingerprint, count), = sink.counts().items()
+    assert count == 2
+    assert "ZeroDivisionError" in sink.report(fingerprint)
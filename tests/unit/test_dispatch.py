@@ -0,0 +1,71 @@
+from unittest.mock import Mock
+
+from postscriptum.dispatch import CalledHandlers, DispatchPlan
+from postscriptum.handlers import HandlerSet
+from postscriptum.pubsub import PubSub
+
+
+def test_plan():
+
+    shared, terminate, excluded = Mock(), Mock(), Mock()
+    terminate_handlers = HandlerSet([terminate, shared, excluded])
+    finish_handlers = HandlerSet([shared])
+    plan = DispatchPlan([terminate_handlers, finish_handlers], {excluded})
+
+    assert plan.slots == {terminate: 0, shared: 1}
+    assert plan.steps[id(terminate_handlers)] == ((0, terminate), (1, shared))
+    assert plan.steps[id(finish_handlers)] == ((1, shared),), "Same slot everywhere"
+    assert plan.handlers(terminate_handlers) == (terminate, shared)
+
+    assert plan.is_current()
+    finish_handlers.add(terminate)
+    assert not plan.is_current()
+
+
+def test_called_handlers():
+
+    first, second, removed = Mock(), Mock(), Mock()
+    handlers = HandlerSet([first, second, removed])
+    called = CalledHandlers()
+    called.add(removed)
+    called.use(DispatchPlan([handlers], set()))
+    called.add(first)
+    assert called.flags == bytearray([1, 0, 1])
+    assert first in called and removed in called and second not in called
+
+    handlers.discard(removed)
+    called.use(DispatchPlan([handlers], set()))
+    assert called.flags == bytearray([1, 0]), "Flags follow the new slots"
+    assert set(called) == {first, removed}, "Handlers without a slot are kept"
+
+    called.clear()
+    assert not called
+
+
+def test_plan_follows_registration():
+
+    ps = PubSub(exit_on_terminate=False)
+    calls = []
+
+    @ps.on_finish()
+    @ps.on_terminate()
+    def shared(event):
+        calls.append("shared")
+
+        @ps.on_terminate()
+        def added(event):
+            calls.append("added")
+
+    ps.start()
+    try:
+        plan = ps._plan
+        assert plan is not None, "The plan is compiled on start"
+
+        ps._call_handlers(ps.terminate_handlers, {})
+        assert calls == ["shared", "added"], "Handlers added meanwhile are called"
+        assert ps._plan is not plan
+
+        ps._call_handlers(ps.finish_handlers, {})
+        assert calls == ["shared", "added"], "Handlers are called only once"
+    finally:
+        ps.stop()
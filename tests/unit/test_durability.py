@@ -0,0 +1,162 @@
+import gc
+import os
+
+from unittest.mock import patch
+
+import pytest
+
+from postscriptum.durability import DurabilityRegistry, fsync_target, get_syncfs
+from postscriptum.pubsub import PubSub
+from postscriptum.utils import IS_UNIX
+
+
+def test_fsync_target(tmp_path):
+
+    path = tmp_path / "data.txt"
+    file_obj = path.open("w")
+    file_obj.write("data")
+
+    with patch("os.fsync") as fsync:
+        fsync_target(file_obj)
+        fsync.assert_called_once_with(file_obj.fileno())
+        assert path.read_text() == "data", "File objects are flushed"
+
+        fsync.reset_mock()
+        file_obj.close()
+        fsync_target(file_obj)
+        # Closed file objects are synced using their path
+        fsync.assert_called_once()
+
+        fsync.reset_mock()
+        fsync_target(str(path))
+        fsync.assert_called_once()
+
+        fsync.reset_mock()
+        fsync_target(42)
+        fsync.assert_called_once_with(42)
+
+
+def test_sync_all_with_fsync(tmp_path):
+
+    registry = DurabilityRegistry()
+    paths = [tmp_path / f"{i}.txt" for i in range(5)]
+    for path in paths:
+        path.write_text("data")
+        registry.register(path)
+    registry.register(str(paths[0]))
+
+    assert len(registry) == 5, "The same path is only synced once"
+
+    missing = registry.register(tmp_path / "missing.txt")
+
+    report = registry.sync_all()
+
+    assert report["files"] == 6
+    assert report["method"] == "fsync"
+    assert report["duration"] >= 0
+    assert report["timed_out"] == []
+    (description, error), = report["errors"]
+    assert description == repr(missing)
+    assert isinstance(error, FileNotFoundError)
+
+
+def test_reused_file_descriptors_are_skipped(tmp_path):
+
+    registry = DurabilityRegistry()
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.write_text("data")
+    second.write_text("data")
+
+    fd = registry.register(os.open(first, os.O_RDONLY))
+    os.close(fd)
+    reused = os.open(second, os.O_RDONLY)
+    try:
+        assert reused == fd, "The OS gives the lowest fd available"
+        with patch("os.fsync") as fsync:
+            report = registry.sync_all()
+    finally:
+        os.close(reused)
+
+    fsync.assert_not_called()
+    assert report["skipped"] == [f"file descriptor {fd}"]
+
+    with pytest.raises(OSError):
+        registry.register(fd)
+
+
+def test_file_objects_are_held_weakly(tmp_path):
+
+    registry = DurabilityRegistry()
+    file_obj = registry.register((tmp_path / "data.txt").open("w"))
+    file_obj.write("data")
+    del file_obj
+    gc.collect()
+
+    with patch("os.fsync") as fsync:
+        report = registry.sync_all()
+
+    assert (tmp_path / "data.txt").read_text() == "data", "Closed when collected"
+    fsync.assert_called_once()  # With its name
+    assert report["files"] == 1
+    assert not report["errors"]
+
+
+def test_closed_files_are_synced_by_absolute_path(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    registry = DurabilityRegistry()
+    relative = registry.register(open("relative.txt", "w"))
+    by_fd = registry.register(os.fdopen(os.open("by_fd.txt", os.O_CREAT | os.O_WRONLY)))
+    relative.close()
+    by_fd.close()
+    os.mkdir("elsewhere")
+    monkeypatch.chdir(tmp_path / "elsewhere")
+
+    with patch("os.fsync") as fsync:
+        report = registry.sync_all()
+
+    assert not report["errors"], "Not looked for in the new working directory"
+    assert report["files"] == 1
+    fsync.assert_called_once()
+    assert report["skipped"] == [f"closed file {by_fd!r}"], (
+        "Its name is the closed fd, which may be another file now"
+    )
+    with pytest.raises(ValueError):
+        fsync_target(by_fd)
+
+
+@pytest.mark.skipif(not IS_UNIX, reason="os.sync() is Unix only")
+def test_sync_all_with_global_sync(tmp_path):
+
+    registry = DurabilityRegistry(sync_all_threshold=2)
+    for i in range(3):
+        path = tmp_path / f"{i}.txt"
+        path.write_text("data")
+        registry.register(path)
+
+    report = registry.sync_all()
+    assert report["method"] == ("syncfs" if get_syncfs() else "sync")
+    assert not report["errors"]
+
+    fd = registry.register(os.open(path, os.O_RDONLY))
+    with patch("os.sync") as sync:
+        report = registry.sync_all()
+    os.close(fd)
+    assert report["method"] == "sync", "Raw fds can only be synced with os.sync()"
+    sync.assert_called_once_with()
+
+
+def test_pubsub_syncs_after_closing(tmp_path):
+
+    ps = PubSub(shutdown_timeout=5)
+    file_obj = ps.register_durable(ps.register_closeable((tmp_path / "f").open("w")))
+
+    with patch.object(ps.durables, "sync_all", return_value={}) as sync_all:
+        ps._handle_finish()
+
+    assert file_obj.closed, "Files are closed before being synced"
+    sync_all.assert_called_once()
+    (timeout,), _ = sync_all.call_args
+    assert 0 < timeout <= 5, "The shutdown deadline is shared between stages"
+    assert not ps.durables, "Targets are forgotten after finish"
+    assert ps.shutdown_report["durability"] == {}
@@ -1,4 +1,5 @@
 import sys
+import threading
 import traceback
 
 from unittest.mock import Mock, patch, call
@@ -9,8 +10,14 @@ import pytest
 
 from postscriptum.excepthook import (
     EXCEPTION_HANDLERS_HISTORY,
+    THREAD_EXCEPTION_HANDLERS_HISTORY,
     register_exception_handler,
     restore_previous_exception_handler,
+    UNRAISABLE_HANDLERS_HISTORY,
+    register_thread_exception_handler,
+    restore_previous_thread_exception_handler,
+    register_unraisable_handler,
+    restore_previous_unraisable_handler,
 )
 
 
@@ -125,3 +132,53 @@ def test_register_and_restore_except_handler_with_call():
 
     with pytest.raises(IndexError):
         restore_previous_exception_handler()
+
+
+@pytest.mark.skipif(
+    not hasattr(threading, "excepthook"), reason="threading.excepthook is 3.8+"
+)
+def test_register_and_restore_thread_except_handler():
+
+    mock_handler = Mock()
+    args = Mock()
+
+    with patch("threading.excepthook") as original_python_handler:
+
+        previous_handler = register_thread_exception_handler(mock_handler)
+        assert previous_handler is original_python_handler
+        assert THREAD_EXCEPTION_HANDLERS_HISTORY == [original_python_handler]
+        assert threading.excepthook.__wrapped__ is mock_handler
+
+        threading.excepthook(args)
+
+        assert restore_previous_thread_exception_handler().__wrapped__ is mock_handler
+        assert threading.excepthook is original_python_handler
+        assert not THREAD_EXCEPTION_HANDLERS_HISTORY
+
+    original_python_handler.assert_called_once_with(args)
+    mock_handler.assert_called_once_with(args, original_python_handler)
+
+    with pytest.raises(IndexError):
+        restore_previous_thread_exception_handler()
+
+
+@pytest.mark.skipif(
+    not hasattr(sys, "unraisablehook"), reason="sys.unraisablehook is 3.8+"
+)
+def test_register_and_restore_unraisable_handler():
+
+    mock_handler = Mock()
+    args = Mock()
+
+    with patch("sys.unraisablehook") as original_python_handler:
+
+        register_unraisable_handler(mock_handler, call_previous_handler=False)
+        assert UNRAISABLE_HANDLERS_HISTORY == [original_python_handler]
+
+        sys.unraisablehook(args)
+
+        restore_previous_unraisable_handler()
+        assert sys.unraisablehook is original_python_handler
+
+    assert not original_python_handler.call_count
+    mock_handler.assert_called_once_with(args, original_python_handler)
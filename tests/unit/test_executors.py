@@ -0,0 +1,54 @@
+import time
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from postscriptum.executors import ExecutorRegistry, executor_name
+
+
+def test_shutdown_all():
+
+    release = threading.Event()
+    started = threading.Event()
+
+    def stuck():
+        started.set()
+        release.wait(5)
+
+    registry = ExecutorRegistry()
+    idle_pool = registry.register(ThreadPoolExecutor(max_workers=2))
+    busy_pool = registry.register(ThreadPoolExecutor(max_workers=1))
+    assert registry.register(busy_pool) is busy_pool
+    assert len(registry) == 2
+
+    done = idle_pool.submit(time.sleep, 0)
+    stuck_future = busy_pool.submit(stuck)
+    queued = [busy_pool.submit(time.sleep, 0) for _ in range(3)]
+    done.result()
+    assert started.wait(5)
+
+    try:
+        start = time.monotonic()
+        report = registry.shutdown_all(timeout=0.5)
+        assert time.monotonic() - start < 2, "We don't wait for stuck pools"
+    finally:
+        release.set()
+
+    assert report["shutdown"] == [executor_name(idle_pool)]
+    assert report["cancelled"] == 3
+    assert all(future.cancelled() for future in queued)
+    assert report["still_running"] == {
+        executor_name(busy_pool): [f"{__name__}.test_shutdown_all.<locals>.stuck()"]
+    }
+    assert not report["errors"]
+    assert not len(registry), "Executors are forgotten once shut down"
+
+    stuck_future.result(5)
+    busy_pool.shutdown()
+
+
+def test_executors_are_weakly_referenced():
+
+    registry = ExecutorRegistry()
+    registry.register(ThreadPoolExecutor()).shutdown()
+    assert not len(registry)
@@ -0,0 +1,212 @@
+import gc
+import os
+import time
+import signal
+import threading
+
+from unittest.mock import Mock
+
+from postscriptum.handlers import HandlerSet, WeakHandler
+from postscriptum.pubsub import PubSub
+
+
+def test_handler_set():
+
+    first, second, third = Mock(), Mock(), Mock()
+    handlers = HandlerSet([first, second, first])
+    assert list(handlers) == [first, second], "Ordered, without duplicates"
+    assert handlers == {first, second}
+    assert len(handlers) == 2 and first in handlers and third not in handlers
+
+    snapshot = handlers.snapshot()
+    assert handlers.snapshot() is snapshot, "Made again only after a change"
+    iterator = iter(handlers)
+    handlers.add(third)
+    handlers.discard(first)
+    assert list(iterator) == [first, second], "Iteration uses a snapshot"
+    assert snapshot == (first, second)
+    assert list(handlers) == [second, third]
+
+    handlers.remove(second)
+    try:
+        handlers.remove(second)
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("Removing a missing handler raises")
+
+    handlers.clear()
+    assert not handlers
+
+
+def test_registering_many_handlers_does_not_copy_them_all():
+
+    ps = PubSub()
+    handlers = [lambda event: None for _ in range(20000)]
+
+    start = time.monotonic()
+    for handler in handlers:
+        ps.on_finish()(handler)
+    for handler in handlers[::2]:
+        ps.finish_handlers.discard(handler)
+    duration = time.monotonic() - start
+
+    assert list(ps.finish_handlers) == handlers[1::2]
+    # Copying the tuple on each change took seconds for that many handlers
+    assert duration < 1
+
+
+def test_register_from_threads_while_signals_fire():
+
+    ps = PubSub(exit_on_terminate=False)
+    calls = []
+    ps.terminate_handlers.add(lambda event: calls.append(len(ps.terminate_handlers)))
+    errors = []
+    start = threading.Barrier(65)
+    done = threading.Event()
+    per_thread = 50
+
+    def register():
+        try:
+            start.wait(5)
+            for i in range(per_thread):
+                ps.on_terminate()(lambda event: None)
+                with ps.scope() as scope:
+                    scope.on_terminate()(lambda event: None)
+                    scope.on_finish(scope="master")(lambda event: None)
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(e)
+
+    threads = [threading.Thread(target=register) for _ in range(64)]
+    with ps():
+        for thread in threads:
+            thread.start()
+        start.wait(5)
+        signals = 0
+        while any(thread.is_alive() for thread in threads):
+            os.kill(os.getpid(), signal.SIGINT)
+            signals += 1
+        for thread in threads:
+            thread.join(10)
+    ps.stop()
+
+    assert not errors
+    assert signals and calls, "Handlers were called while registering"
+    assert len(ps.terminate_handlers) == 64 * per_thread + 1
+    assert not ps.finish_handlers
+    assert not ps._master_only_handlers
+
+
+class Session:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def cleanup(self, event):
+        self.calls.append(self)
+
+
+def test_weak_handler():
+
+    calls = []
+    session = Session(calls)
+    dead = []
+    handler = WeakHandler(session.cleanup, dead.append)
+    assert handler == WeakHandler(session.cleanup), "Same method, same object"
+    assert handler != WeakHandler(Session(calls).cleanup)
+    assert len({handler, WeakHandler(session.cleanup)}) == 1
+
+    handler({})
+    assert calls == [session]
+
+    calls.clear()
+    del session
+    gc.collect()
+    assert dead == [handler]
+    assert not handler.alive
+    handler({})
+    assert not calls, "Dead handlers do nothing"
+
+
+def test_weak_registration():
+
+    ps = PubSub()
+    calls = []
+    sessions = [Session(calls) for _ in range(3)]
+    for session in sessions:
+        assert ps.add_finish_handler(session.cleanup, weak=True) == session.cleanup
+        ps.on_terminate(weak=True)(session.cleanup)
+
+    @ps.add_always_handler
+    def strong(event):
+        pass
+
+    assert ps.handler_metrics() == {
+        "terminate": 3,
+        "quit": 0,
+        "finish": 3,
+        "crash": 0,
+        "hold": 0,
+        "always": 1,
+        "child_crash": 0,
+        "thread_crash": 0,
+        "unraisable": 0,
+        "async_error": 0,
+        "weak": 6,
+        "collected": 0,
+    }
+
+    del sessions[0], session
+    gc.collect()
+    metrics = ps.handler_metrics()
+    assert metrics["finish"] == metrics["terminate"] == 2, "Dead ones are removed"
+    assert metrics["weak"] == 4
+    assert metrics["collected"] == 2, "One per event it was registered for"
+
+    ps._call_handlers(ps.terminate_handlers, {})
+    ps._call_handlers(ps.finish_handlers, {})
+    assert calls == sessions, "Weak handlers are still only called once"
+
+
+def test_weak_and_strong_registrations_of_the_same_handler():
+
+    ps = PubSub()
+    calls = []
+    session = Session(calls)
+
+    def function(event):
+        calls.append(function)
+
+    for handler in (session.cleanup, function):
+        assert WeakHandler(handler) == handler
+        assert hash(WeakHandler(handler)) == hash(handler)
+        ps.add_finish_handler(handler)
+        ps.add_finish_handler(handler, weak=True)
+        ps.add_terminate_handler(handler, weak=True)
+
+    assert len(ps.finish_handlers) == 2, "Not added again when weak"
+    ps._call_handlers(ps.terminate_handlers, {})
+    ps._call_handlers(ps.finish_handlers, {})
+    assert calls == [session, function], "Called once, however it's registered"
+
+    ps._remove_handler(ps.terminate_handlers, function)
+    assert len(ps.terminate_handlers) == 1, "Removing the handler removes it weak"
+
+
+def test_collected_weak_handlers_are_forgotten_everywhere():
+
+    ps = PubSub()
+    calls = []
+    kept, removed = Session(calls), Session(calls)
+    ps.on_finish(scope="master", weak=True)(kept.cleanup)
+    ps.on_terminate(scope="master", weak=True)(kept.cleanup)
+    ps.on_finish(weak=True)(removed.cleanup)
+    ps.finish_handlers.discard(WeakHandler(removed.cleanup))
+
+    del kept, removed
+    gc.collect()
+
+    assert not ps.finish_handlers and not ps.terminate_handlers
+    assert not ps._master_only_handlers, "Its scope is forgotten too"
+    assert ps.handler_metrics()["collected"] == 2, (
+        "Handlers removed before they died were not collected"
+    )
@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import signal
+
+from postscriptum.journal import (
+    ExitJournal,
+    ExitReason,
+    JournalReader,
+    RECORD,
+    pack_record,
+)
+from postscriptum.pubsub import PubSub
+from postscriptum.utils import fingerprint_exception
+
+
+def test_write_and_read(tmp_path):
+
+    path = tmp_path / "exits.journal"
+    journal = ExitJournal(path)
+    journal.write(ExitReason.CRASH, exit_code=1, fingerprint=42)
+    journal.write(ExitReason.TERMINATE, exit_code=143, signal=signal.SIGTERM)
+
+    assert path.stat().st_size == 2 * RECORD.size == 64
+
+    with open(path, "ab") as f:
+        f.write(b"torn")
+
+    with journal.reader() as reader:
+        crash, terminate = list(reader)
+        assert len(reader) == 2, "Truncated records are ignored"
+
+    assert crash.reason == ExitReason.CRASH
+    assert crash.fingerprint == 42
+    assert crash.pid == os.getpid()
+    assert terminate.signal == signal.SIGTERM
+    assert terminate.exit_code == 143
+    assert crash.timestamp <= terminate.timestamp <= time.time()
+
+    with open(tmp_path / "empty", "wb"):
+        pass
+    with JournalReader(tmp_path / "empty") as reader:
+        assert not list(reader)
+
+
+def test_count_by_fingerprint(tmp_path):
+
+    path = tmp_path / "exits.journal"
+    now = time.time()
+    with open(path, "wb") as f:
+        for i in range(10000):
+            timestamp = now - 10000 + i
+            reason = ExitReason.CRASH if i % 2 else ExitReason.FINISH
+            f.write(pack_record(reason, fingerprint=i % 4, timestamp=timestamp))
+
+    with JournalReader(path) as reader:
+        assert reader.bisect(now - 100) == 9900
+        assert reader.count_by_fingerprint(now - 100) == {1: 25, 3: 25}
+        assert sum(reader.count_by_fingerprint(now - 100, reason=None).values()) == 100
+        assert [r.timestamp for r in reader.since(now - 2)] == [now - 2, now - 1]
+
+
+def test_pubsub_writes_journal_once(tmp_path):
+
+    ps = PubSub()
+    ps.enable_journal(tmp_path / "exits.journal")
+
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        type_, exception, traceback = sys.exc_info()
+
+    ps._handle_crash(type_, exception, traceback, lambda *args: None)
+    ps._handle_finish()
+
+    with ps.journal.reader() as reader:
+        record, = list(reader)
+
+    assert record.reason == ExitReason.CRASH
+    assert record.exit_code == 1
+    assert record.fingerprint == fingerprint_exception(type_, traceback)
+
+
+
+def test_exit_codes_out_of_range_are_clamped(tmp_path):
+
+    ps = PubSub()
+    ps.enable_journal(tmp_path / "exits.journal")
+
+    ps._record_exit({"exit_code": 2 ** 40})
+
+    with ps.journal.reader() as reader:
+        record, = list(reader)
+
+    assert record.reason == ExitReason.QUIT
+    assert record.exit_code == 2 ** 31 - 1
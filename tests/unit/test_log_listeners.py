@@ -0,0 +1,86 @@
+import queue
+import logging
+import threading
+
+from logging.handlers import QueueListener
+from unittest.mock import Mock
+
+from postscriptum.log_listeners import drain_listener
+from postscriptum.pubsub import PubSub
+from postscriptum.utils import Deadline
+
+
+def make_records(count):
+    return [logging.makeLogRecord({"msg": str(i)}) for i in range(count)]
+
+
+def test_drain_stopped_listener():
+
+    records_queue = queue.Queue()
+    handler = Mock(level=logging.NOTSET)
+    listener = QueueListener(records_queue, handler)
+    for record in make_records(250):
+        records_queue.put(record)
+
+    assert drain_listener(listener, Deadline(), batch_size=100) == (250, 0)
+    assert handler.handle.call_count == 250
+
+    for record in make_records(10):
+        records_queue.put(record)
+    assert drain_listener(listener, Deadline(0)) == (0, 10), (
+        "Records left at the deadline are dropped"
+    )
+
+
+def test_drain_running_listener():
+
+    records_queue = queue.Queue()
+    handler = Mock(level=logging.NOTSET)
+    listener = QueueListener(records_queue, handler)
+    listener.start()
+    for record in make_records(50):
+        records_queue.put(record)
+
+    handled, dropped = drain_listener(listener, Deadline(5))
+
+    assert not dropped
+    assert handler.handle.call_count == 50
+    assert listener._thread is None, "The listener thread is stopped"
+
+
+def test_drain_stuck_listener():
+
+    unblock = threading.Event()
+    records_queue = queue.Queue()
+    handler = Mock(level=logging.NOTSET)
+    handler.handle.side_effect = lambda record: unblock.wait()
+    listener = QueueListener(records_queue, handler)
+    listener.start()
+    for record in make_records(5):
+        records_queue.put(record)
+
+    handled, dropped = drain_listener(listener, Deadline(0.1))
+    unblock.set()
+
+    assert dropped >= 4, "Records the listener thread didn't get to are dropped"
+
+
+def test_pubsub_drains_after_always_handlers():
+
+    records_queue = queue.Queue()
+    handler = Mock(level=logging.NOTSET)
+    ps = PubSub()
+    ps.register_log_listener(QueueListener(records_queue, handler))
+
+    @ps.always()
+    def _(event):
+        records_queue.put(logging.makeLogRecord({"msg": "bye"}))
+
+    ps._handle_finish()
+
+    handler.handle.assert_called_once()
+    assert ps.shutdown_report["logging"] == {
+        "listeners": 1,
+        "handled": 1,
+        "dropped": 0,
+    }
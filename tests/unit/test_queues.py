@@ -0,0 +1,31 @@
+import time
+import multiprocessing
+
+from postscriptum.queues import QueueRegistry
+
+
+def test_flush_all():
+
+    registry = QueueRegistry()
+    small = registry.register(multiprocessing.Queue())
+    clogged = registry.register(multiprocessing.Queue())
+    unused = registry.register(multiprocessing.Queue())
+    assert len(registry) == 3
+
+    small.put("item")
+    # Way more than a pipe can hold, and nobody reads it
+    for _ in range(10):
+        clogged.put(b"x" * 1_000_000)
+
+    start = time.monotonic()
+    report = registry.flush_all(timeout=0.5)
+    assert time.monotonic() - start < 2, "We don't wait for clogged queues"
+
+    assert report["flushed"] == 2
+    assert report["cancelled"] == 1
+    assert report["lost"] >= 8
+    assert not len(registry), "Queues are forgotten once flushed"
+
+    del unused
+    registry.register(multiprocessing.Queue())
+    assert not len(registry), "Queues are held by weak references"
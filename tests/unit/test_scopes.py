@@ -0,0 +1,120 @@
+import signal
+import threading
+
+from unittest.mock import Mock, patch
+
+import pytest
+
+from postscriptum.pubsub import PubSub
+from postscriptum.scopes import HandlerScope
+
+
+def test_scope():
+
+    ps = PubSub()
+
+    @ps.on_terminate(scope="master")
+    def registered(event):
+        pass
+
+    temporary = Mock()
+    with ps.scope() as scope:
+        assert isinstance(scope, HandlerScope)
+        scope.on_terminate()(temporary)
+        scope.on_terminate(scope="master")(registered)
+        scope.on_finish(scope="master")(registered)
+        scope.on_child_crash()(temporary)
+
+        with ps.scope() as nested:
+            nested.always()(temporary)
+            assert set(ps.always_handlers) == {temporary}
+        assert not ps.always_handlers, "Nested scopes end on their own"
+
+        assert set(ps.terminate_handlers) == {registered, temporary}
+        assert set(ps.finish_handlers) == {registered}
+
+    assert set(ps.terminate_handlers) == {registered}, "Only remove what we added"
+    assert not ps.finish_handlers and not ps.child_crash_handlers
+    assert registered in ps._master_only_handlers, "Its scope is still needed"
+
+    with pytest.raises(RuntimeError):
+        scope.on_terminate()(temporary)
+
+    with ps.scope() as scope:
+        scope.on_crash(scope="worker")(temporary)
+    assert temporary not in ps._worker_only_handlers
+
+
+def test_scope_does_not_change_the_scope_of_registered_handlers():
+
+    ps = PubSub()
+    handler = Mock()
+    ps.add_finish_handler(handler)
+
+    with ps.scope() as scope:
+        with pytest.raises(ValueError):
+            scope.on_terminate(scope="master")(handler)
+        with pytest.raises(ValueError):
+            scope.on_finish(scope="worker")(handler)
+        assert not ps.terminate_handlers
+
+    assert set(ps.finish_handlers) == {handler}
+    assert not ps._master_only_handlers and not ps._worker_only_handlers, (
+        "It still runs in all processes"
+    )
+    with pytest.raises(ValueError):
+        ps.add_terminate_handler(handler, scope="master")
+
+
+def test_scope_handlers_are_called():
+
+    ps = PubSub(exit_on_terminate=False)
+    handler = Mock()
+
+    with ps():
+        sig = signal.SIGINT
+        signal_handler = signal.getsignal(sig)
+
+        with patch.object(ps, "setup_signal_handler") as setup:
+            with ps.scope() as scope:
+                scope.on_terminate()(handler)
+        assert not setup.call_count, "Signal handlers are not touched"
+        assert signal.getsignal(sig) is signal_handler
+
+        with ps.scope() as scope:
+            scope.on_terminate()(handler)
+            signal_handler(sig, None)
+        assert handler.call_count == 1
+        signal_handler(sig, None)
+        assert handler.call_count == 1, "The handler is gone with its scope"
+    ps.stop()
+
+
+def test_scopes_in_threads():
+
+    ps = PubSub()
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def work():
+        try:
+            barrier.wait(1)
+            for _ in range(200):
+                with ps.scope() as scope:
+                    handler = lambda event: None
+                    master_handler = lambda event: None
+                    scope.on_finish()(handler)
+                    scope.always(scope="master")(master_handler)
+                    assert handler in ps.finish_handlers
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert not errors
+    assert not ps.finish_handlers and not ps.always_handlers
+    assert not ps._master_only_handlers
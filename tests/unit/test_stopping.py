@@ -0,0 +1,87 @@
+import time
+import asyncio
+import selectors
+import threading
+
+from postscriptum.stopping import StopToken
+
+
+def test_wait():
+
+    token = StopToken()
+    assert not token.is_set()
+    assert not token.wait(timeout=0.01)
+
+    stopped = []
+
+    def work():
+        while not token.wait(timeout=0.01):
+            pass
+        stopped.append(True)
+
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    token.set()
+    for thread in threads:
+        thread.join(1)
+    assert stopped == [True] * 3
+    assert token.is_set() and token and token.wait()
+
+    token.clear()
+    assert not token.is_set()
+
+
+def test_await():
+
+    token = StopToken()
+
+    async def main():
+        waiters = [asyncio.ensure_future(wait()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        assert not any(waiter.done() for waiter in waiters)
+        # From another thread, like a signal handler running in the main thread
+        threading.Timer(0.01, token.set).start()
+        return await asyncio.wait_for(asyncio.gather(*waiters), 1)
+
+    async def wait():
+        return await token
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(main()) == [True, True]
+        assert not token._futures, "Waiters are forgotten once woken up"
+        # Already set, so it returns right away
+        assert loop.run_until_complete(wait())
+    finally:
+        loop.close()
+
+
+def test_fileno():
+
+    token = StopToken()
+    selector = selectors.DefaultSelector()
+    selector.register(token, selectors.EVENT_READ)
+    try:
+        assert not selector.select(timeout=0)
+        start = time.monotonic()
+        threading.Timer(0.01, token.set).start()
+        assert selector.select(timeout=1)
+        assert time.monotonic() - start < 1
+        assert selector.select(timeout=0), "It stays readable for everyone"
+
+        token.clear()
+        assert not selector.select(timeout=0)
+    finally:
+        selector.close()
+        token.close()
+
+    token = StopToken()
+    token.set()
+    try:
+        selector = selectors.DefaultSelector()
+        selector.register(token.fileno(), selectors.EVENT_READ)
+        assert selector.select(timeout=0), "Readable if set before fileno()"
+        selector.close()
+    finally:
+        token.close()
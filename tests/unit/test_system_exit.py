@@ -60,3 +60,42 @@ def test_context_manager():
 
         with catch_system_exit(on_system_exit, on_enter, on_exit):
             raise PubSubExit(0)
+
+
+def test_decorator_fast_path():
+
+    on_enter = Mock()
+    on_system_exit = Mock(spec=catcher)
+    catch = catch_system_exit(on_system_exit, on_enter, once=True)
+
+    @catch
+    def _(code=None):
+        """ Docstring """
+        if code is not None:
+            sys.exit(code)
+        return "result"
+
+    assert _.__doc__ == " Docstring ", "The function should be wrapped"
+    assert _() == "result"
+    assert _() == "result"
+    on_enter.assert_called_once()
+    assert not on_system_exit.call_count
+
+    with pytest.raises(SystemExit):
+        _(3)
+    (exception_class, exception, traceback), kwargs = on_system_exit.call_args
+    assert exception_class is SystemExit and exception.code == 3
+    assert traceback is not None
+
+    @catch
+    def _():
+        raise PubSubExit(0)
+
+    with pytest.raises(PubSubExit):
+        _()
+    assert on_system_exit.call_count == 1, "Exits from signals are not quits"
+
+    catch.reset()
+    with catch:
+        pass
+    assert on_enter.call_count == 2, "on_enter is called again after reset()"
@@ -0,0 +1,50 @@
+import threading
+
+from postscriptum.threads import ThreadRegistry
+
+
+def test_stop_all():
+
+    stop = threading.Event()
+    release = threading.Event()
+    called = []
+
+    def stuck_forever():
+        release.wait(5)
+
+    registry = ThreadRegistry()
+    with_event = registry.register(
+        threading.Thread(target=stop.wait, name="event"), stop
+    )
+    with_callable = registry.register(
+        threading.Thread(target=release.wait, args=(5,), name="callable"),
+        lambda: called.append(True),
+    )
+    faulty = registry.register(
+        threading.Thread(target=lambda: None, name="faulty"), lambda: 1 / 0
+    )
+    unregistered = threading.Thread(target=stuck_forever, name="unregistered")
+    daemon = threading.Thread(target=release.wait, args=(5,), daemon=True)
+    assert len(registry) == 3
+    assert registry.unregister(faulty)
+    assert not registry.unregister(faulty)
+    registry.register(faulty, lambda: 1 / 0)
+
+    for thread in (with_event, with_callable, faulty, unregistered, daemon):
+        thread.start()
+
+    try:
+        report = registry.stop_all(timeout=0.5)
+    finally:
+        stop.set()
+        release.set()
+
+    assert sorted(report["stopped"]) == ["event", "faulty"]
+    assert called == [True]
+    assert isinstance(report["errors"]["faulty"], ZeroDivisionError)
+    assert sorted(report["stuck"]) == ["callable", "unregistered"]
+    assert "in stuck_forever" in report["stuck"]["unregistered"]
+    assert not len(registry), "Threads are forgotten once stopped"
+
+    for thread in (with_callable, unregistered, daemon):
+        thread.join()
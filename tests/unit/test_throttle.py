@@ -0,0 +1,84 @@
+import threading
+
+from unittest.mock import patch
+
+from postscriptum.throttle import Throttle, OVERFLOW_KEY
+
+
+def test_throttle_by_key():
+
+    throttle = Throttle(rate=2, period=1)
+
+    with patch("postscriptum.throttle.time.monotonic", return_value=100):
+        assert throttle.allow("a") == (True, 0)
+        assert throttle.allow("a") == (True, 0)
+        assert throttle.allow("a") == (False, 0)
+        assert throttle.allow("a") == (False, 0)
+        assert throttle.allow("b") == (True, 0), "Keys are throttled separately"
+
+    with patch("postscriptum.throttle.time.monotonic", return_value=101):
+        assert throttle.allow("a") == (
+            True,
+            2,
+        ), "The next allowed event tells how many were suppressed"
+        assert throttle.allow("a") == (True, 0)
+
+    report = throttle.report()
+    assert report["allowed"] == 5
+    assert report["suppressed"] == 2
+    assert report["by_key"]["a"] == {"allowed": 4, "suppressed": 2}
+
+    throttle.reset()
+    assert throttle.report()["allowed"] == 0
+
+
+def test_throttle_bounded_keys():
+
+    throttle = Throttle(rate=None, max_keys=2)
+
+    for key in range(10):
+        assert throttle.allow(key) == (True, 0)
+
+    report = throttle.report()
+    assert set(report["by_key"]) == {0, 1, OVERFLOW_KEY}
+    assert report["by_key"][OVERFLOW_KEY]["allowed"] == 8
+
+
+def test_throttle_sampling():
+
+    throttle = Throttle(rate=None, sample_rate=0.5)
+
+    with patch("postscriptum.throttle._random", side_effect=[0.2, 0.7, 0.9]):
+        assert throttle.allow() == (True, 0)
+        assert throttle.allow() == (False, 0)
+        assert throttle.allow() == (False, 0)
+
+    with patch("postscriptum.throttle._random", return_value=0.1):
+        assert throttle.allow() == (True, 2)
+
+
+def test_throttle_called_again_while_counting():
+
+    throttle = Throttle(rate=10)
+    nested = []
+
+    class Key:
+        """ Hashed while the throttle is locked, like a GC run could """
+
+        def __hash__(self):
+            if not nested:
+                nested.append(throttle.allow("nested"))
+            return 1
+
+    done = threading.Event()
+
+    def count():
+        throttle.allow(Key())
+        done.set()
+
+    threading.Thread(target=count, daemon=True).start()
+    assert done.wait(5), "The nested call waited for the lock held by its thread"
+    assert nested == [(False, 0)], "The nested event is suppressed"
+
+    assert throttle.allow("nested") == (True, 1)
+    assert throttle.report()["suppressed"] == 1
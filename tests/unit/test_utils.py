@@ -1,8 +1,12 @@
 
 import sys
-import traceback
+import threading
 
-from postscriptum.utils import format_stacktrace
+from postscriptum.utils import (
+    format_stacktrace,
+    run_concurrently,
+    fingerprint_exception,
+)
 
 def test_format_stacktrace():
 
@@ -13,9 +17,51 @@ def test_format_stacktrace():
 
     expected_stack_trace = (
         'Traceback (most recent call last):\n\n'
-        f'  File "{__file__}", line 10, in test_format_stacktrace\n'
+        f'  File "{__file__}", line 14, in test_format_stacktrace\n'
         '    1 / 0\n\n'
         'ZeroDivisionError: division by zero\n'
     )
 
     assert stacktrace == expected_stack_trace
+
+
+def test_run_concurrently():
+
+    event = threading.Event()
+
+    def fail():
+        raise ValueError()
+
+    funcs = [lambda: None, fail, event.wait]
+    ok, failed, stuck = run_concurrently(funcs, max_workers=3, timeout=0.1)
+    event.set()
+
+    assert ok == (funcs[0], True, None)
+    assert failed.done and isinstance(failed.error, ValueError)
+    assert not stuck.done, "Calls still running after the timeout are reported"
+
+    assert run_concurrently([]) == []
+
+
+def test_fingerprint_exception():
+
+    def crash(value):
+        return 1 / value
+
+    fingerprints = set()
+    for i in range(2):
+        try:
+            crash(0)
+        except ZeroDivisionError as e:
+            fingerprints.add(fingerprint_exception(type(e), e.__traceback__))
+
+    assert len(fingerprints) == 1, "The same crash has the same fingerprint"
+
+    try:
+        crash("0")
+    except TypeError as e:
+        assert fingerprint_exception(type(e), e.__traceback__) not in fingerprints
+
+    assert fingerprint_exception(ValueError, None) != fingerprint_exception(
+        TypeError, None
+    )
@@ -1,5 +1,11 @@
+import gc
+import os
 import sys
+import time
+import asyncio
 import signal
+import selectors
+import threading
 import traceback
 
 from contextlib import ExitStack
@@ -12,6 +18,7 @@ from postscriptum.pubsub import PubSub, PROCESS_TERMINATING_SIGNAL
 from postscriptum.signals import signals_from_names, SIGNAL_HANDLERS_HISTORY
 from postscriptum.excepthook import EXCEPTION_HANDLERS_HISTORY
 from postscriptum.exceptions import PubSubExit
+from postscriptum.utils import fingerprint_exception
 
 
 def test_pubsub_context_decorator():
@@ -34,6 +41,20 @@ def test_pubsub_context_decorator():
     ps.stop()
     assert not ps.started
 
+    assert ps() is context_decorator, "The same object is reused"
+
+    @ps()
+    def main():
+        return ps.started
+
+    with patch.object(context_decorator, "on_enter", wraps=ps.start) as start:
+        assert main() and main()
+        start.assert_called_once()
+        ps.stop()
+        assert main(), "We start again after stop()"
+        assert start.call_count == 2
+    ps.stop()
+
 
 def test_start_stop():
 
@@ -138,6 +159,7 @@ def test_crash_handler():
                 "traceback": fake_traceback,
                 "stacktrace": crash_handler.call_args[0][0]["stacktrace"],
                 "previous_exception_handler": EXCEPTION_HANDLERS_HISTORY[-1],
+                "fingerprint": fingerprint_exception(Exception, fake_traceback),
             }
 
             crash_handler.assert_called_once_with(event)
@@ -285,6 +307,49 @@ def test_terminate_handler(subtests):
     }, "on_terminate() should add the function as a handler"
 
 
+def test_stopping_token():
+
+    ps = PubSub(exit_on_terminate=False)
+    seen = []
+
+    @ps.on_terminate()
+    def _(event):
+        seen.append(ps.stopping.is_set())
+
+    with ps():
+        assert not ps.stopping.is_set()
+        sig = next(iter(signals_from_names(PROCESS_TERMINATING_SIGNAL)))
+        signal.getsignal(sig)(sig, None)
+        assert seen == [True], "It's set before the handlers are called"
+        assert not ps.stopping.is_set(), "It's cleared if we hold"
+
+    ps.stop()
+    ps.stopping.set()
+    ps.start()
+    assert not ps.stopping.is_set(), "It's cleared on start"
+    ps.stop()
+
+
+def test_critical_section():
+
+    ps = PubSub(exit_on_terminate=False)
+    terminate_handler = Mock()
+    ps.terminate_handlers.add(terminate_handler)
+
+    with ps():
+        with ps.critical():
+            signal.getsignal(signal.SIGINT)(signal.SIGINT, None)
+            assert not terminate_handler.call_count, "The signal is deferred"
+            assert ps.stopping.is_set(), "But we already know we stop"
+        # Python runs the handler of the signal raised again soon enough
+        for _ in range(100):
+            if terminate_handler.call_count:
+                break
+            time.sleep(0.001)
+        assert terminate_handler.call_args[0][0]["signal"] == signal.SIGINT
+    ps.stop()
+
+
 def test_terminate_with_exception():
 
     fake_frame = Mock()
@@ -441,6 +506,7 @@ def test_handlers_are_not_called_twice():
                 "traceback": fake_traceback,
                 "stacktrace": handler.call_args[0][0]["stacktrace"],
                 "previous_exception_handler": EXCEPTION_HANDLERS_HISTORY[-1],
+                "fingerprint": fingerprint_exception(Exception, fake_traceback),
             }
         )
 
@@ -465,3 +531,347 @@ def test_always_handlers():
         pass
 
     assert ps.always_handlers == {_}, "Our function should be in the handler set"
+
+
+@pytest.mark.skipif(not hasattr(os, "register_at_fork"), reason="Needs fork")
+def test_handler_scopes_after_fork():
+
+    called = []
+    ps = PubSub()
+
+    with pytest.raises(ValueError):
+        ps.on_finish(scope="everywhere")(lambda event: None)
+
+    @ps.on_finish(scope="master")
+    def master(event):
+        called.append("master")
+
+    @ps.on_finish(scope="worker")
+    def worker(event):
+        called.append("worker")
+
+    @ps.on_finish()
+    def both(event):
+        called.append("both")
+
+    ps._called_handlers.add(both)
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if not pid:  # pragma: no cover
+        try:
+            ps._handle_finish()
+            os.write(write_fd, f"{ps.is_worker} {' '.join(called)}".encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    with os.fdopen(read_fd, "rb") as f:
+        assert f.read() == b"True worker both", (
+            "Workers don't run master handlers, and start with a clean state"
+        )
+
+    ps._handle_finish()
+    assert not ps.is_worker
+    assert called == ["master"]
+
+
+@pytest.mark.skipif(not hasattr(os, "register_at_fork"), reason="Needs fork")
+def test_critical_sections_of_other_threads_are_forgotten_after_fork():
+
+    ps = PubSub()
+    critical = ps.critical()
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with critical:
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    entered.wait(5)
+    critical.pending.append(signal.SIGTERM)
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if not pid:  # pragma: no cover
+        try:
+            state = (
+                critical.active,
+                critical.pending,
+                critical.defer(signal.SIGTERM),
+                critical._main_thread_id == threading.get_ident(),
+            )
+            os.write(write_fd, repr(state).encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    critical.pending.clear()  # Or leaving the section would raise it here
+    release.set()
+    thread.join()
+    with os.fdopen(read_fd, "rb") as f:
+        assert f.read() == b"(False, [], False, True)", (
+            "The thread holding the section doesn't exist in the child,"
+            " signals must not be deferred there"
+        )
+
+
+@pytest.mark.skipif(not hasattr(os, "register_at_fork"), reason="Needs fork")
+def test_handlers_locks_are_recreated_after_fork():
+
+    ps = PubSub()
+    locked = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with ps._handlers_lock, ps.finish_handlers._lock:
+            locked.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    locked.wait(5)
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if not pid:  # pragma: no cover
+        try:
+            acquired = (
+                ps._handlers_lock.acquire(timeout=1),
+                ps.finish_handlers._lock.acquire(timeout=1),
+            )
+            os.write(write_fd, repr(acquired).encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    release.set()
+    thread.join()
+    with os.fdopen(read_fd, "rb") as f:
+        assert f.read() == b"(True, True)", (
+            "The thread holding the locks doesn't exist in the child,"
+            " nobody would ever release it"
+        )
+
+
+@pytest.mark.skipif(
+    not hasattr(threading, "excepthook"), reason="threading.excepthook is 3.8+"
+)
+def test_thread_crash_handlers():
+
+    events = []
+    ps = PubSub(call_previous_exception_handler=False)
+    ps.thread_crashes.rate = 2
+
+    @ps.on_thread_crash()
+    def _(event):
+        events.append(event)
+
+    def crash():
+        raise ValueError("boom")
+
+    def quit():
+        sys.exit(1)
+
+    ps.start()
+    try:
+        for target in [crash] * 5 + [quit]:
+            thread = threading.Thread(target=target, name="crashing")
+            thread.start()
+            thread.join()
+    finally:
+        ps.stop()
+
+    assert len(events) == 2, "Identical crashes are throttled, sys.exit() ignored"
+    event = events[0]
+    assert isinstance(event["exception"], ValueError)
+    assert event["thread_name"] == "crashing"
+    assert event["thread_ident"]
+    assert event["suppressed"] == 0
+    assert event["fingerprint"] == fingerprint_exception(
+        ValueError, event["traceback"]
+    )
+    assert "ValueError: boom" in event["stacktrace"]()
+
+    ps._handle_finish()
+    report = ps.shutdown_report["thread_crashes"]
+    assert report["allowed"] == 2
+    assert report["suppressed"] == 3
+    assert not ps._called_handlers, "Thread crash handlers can run again"
+
+
+@pytest.mark.skipif(
+    not hasattr(threading, "excepthook"), reason="threading.excepthook is 3.8+"
+)
+def test_previous_thread_excepthook_is_throttled():
+
+    ps = PubSub()
+    ps.thread_crashes.rate = 2
+
+    def crash():
+        raise ValueError("boom")
+
+    with patch("threading.excepthook") as previous_hook:
+        ps.start()
+        try:
+            for _ in range(5):
+                thread = threading.Thread(target=crash)
+                thread.start()
+                thread.join()
+        finally:
+            ps.stop()
+
+    assert previous_hook.call_count == 2, "Tracebacks are only printed when allowed"
+
+
+@pytest.mark.skipif(
+    not hasattr(sys, "unraisablehook"), reason="sys.unraisablehook is 3.8+"
+)
+def test_unraisable_handlers():
+
+    events = []
+    ps = PubSub()
+    previous_hook = Mock()
+
+    @ps.on_unraisable()
+    def _(event):
+        events.append(event)
+
+    class Leaky:
+        def __del__(self):
+            raise ValueError("leak")
+
+    with patch("sys.unraisablehook", previous_hook):
+        ps.start()
+        try:
+            for _ in range(1000):
+                Leaky()
+        finally:
+            ps.stop()
+
+    assert len(events) == 1, "Duplicates are not passed to handlers"
+    event = events[0]
+    assert isinstance(event["exception"], ValueError)
+    assert event["key"][:2] == ("ValueError", "function")
+    assert event["key"][2].startswith(__file__)
+    assert "ValueError: leak" in event["stacktrace"]()
+    assert previous_hook.call_count == 1, "Only called for what handlers get"
+
+    ps._handle_finish()
+    report = ps.shutdown_report["unraisables"]
+    assert report["allowed"] == 1
+    assert report["suppressed"] == 999
+
+
+def test_async_error_handlers():
+
+    events = []
+    ps = PubSub()
+    loop = asyncio.new_event_loop()
+    previous_handler = Mock()
+    loop.set_exception_handler(previous_handler)
+
+    @ps.on_async_error()
+    def _(event):
+        events.append(event)
+
+    async def fail():
+        raise ValueError("boom")
+
+    async def main():
+        ps.watch_loop()
+        for _ in range(5):
+            task = asyncio.ensure_future(fail())
+            await asyncio.sleep(0)
+            del task  # Never retrieving the exception
+        loop.call_exception_handler({"message": "Something odd"})
+
+    try:
+        loop.run_until_complete(main())
+        gc.collect()
+        assert loop.get_exception_handler() == ps._handle_async_error
+        ps.unwatch_loop(loop)
+        assert loop.get_exception_handler() is previous_handler
+    finally:
+        loop.close()
+
+    ps._handle_finish()
+    assert len(events) == 2, "Duplicates are not passed to handlers"
+    assert isinstance(events[0]["exception"], ValueError)
+    assert "ValueError: boom" in events[0]["stacktrace"]()
+    assert events[0]["loop"] is loop
+    assert events[1]["message"] == "Something odd"
+    assert previous_handler.call_count == 2
+    assert ps.shutdown_report["async_errors"]["suppressed"] == 4
+
+
+def test_async_error_escalation():
+
+    crashes = []
+    ps = PubSub(call_previous_exception_handler=False)
+    ps.async_error_limit = 3
+
+    @ps.on_crash()
+    def _(event):
+        crashes.append(event)
+
+    async def main():
+        loop = ps.watch_loop()
+        for _ in range(5):
+            loop.call_exception_handler({"message": "Something odd"})
+        await asyncio.sleep(1)
+
+    loop = asyncio.new_event_loop()
+    ps.start()
+    try:
+        with pytest.raises(PubSubExit):
+            loop.run_until_complete(main())
+    finally:
+        ps.stop()
+        loop.close()
+
+    assert len(crashes) == 1
+    assert str(crashes[0]["exception"]) == "Something odd"
+
+
+@pytest.mark.skipif(not hasattr(os, "register_at_fork"), reason="Needs fork")
+def test_stopping_token_is_reset_in_place_after_fork():
+
+    ps = PubSub()
+    token = ps.stopping
+    parent_fd = token.fileno()
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if not pid:  # pragma: no cover
+        try:
+            woken = []
+            thread = threading.Thread(target=lambda: woken.append(token.wait(5)))
+            thread.start()
+            token.set()
+            thread.join(5)
+            selector = selectors.DefaultSelector()
+            selector.register(token, selectors.EVENT_READ)
+            state = (ps.stopping is token, woken, bool(selector.select(0)))
+            os.write(write_fd, repr(state).encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    with os.fdopen(read_fd, "rb") as f:
+        assert f.read() == b"(True, [True], True)", (
+            "Callers may have kept the token before the fork"
+        )
+    assert not token.is_set()
+    selector = selectors.DefaultSelector()
+    selector.register(parent_fd, selectors.EVENT_READ)
+    assert not selector.select(0), "The child doesn't write to the parent's pipe"
+    selector.close()
+    token.close()
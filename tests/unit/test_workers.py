@@ -0,0 +1,149 @@
+import os
+import signal
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from postscriptum.pubsub import PubSub
+from postscriptum.utils import IS_UNIX
+from postscriptum.workers import ChildCrashListener, make_child_crash_event
+
+
+def failing_initializer(value):
+    raise ValueError(value)
+
+
+def terminate_self():
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def kill_self():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def segfault():
+    import ctypes
+
+    ctypes.string_at(0)
+
+
+def exit_with_error():
+    os._exit(3)
+
+
+def collect_events(ps):
+    events = []
+    received = threading.Event()
+
+    @ps.on_child_crash()
+    def _(event):
+        events.append(event)
+        received.set()
+
+    return events, received
+
+
+def test_failing_initializer_is_reported():
+
+    ps = PubSub()
+    events, received = collect_events(ps)
+
+    initializer = ps.worker_initializer(failing_initializer, ("boom",))
+    with ProcessPoolExecutor(max_workers=1, initializer=initializer) as pool:
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(print).result()
+
+    assert received.wait(5)
+    event = events[0]
+    assert event["reason"] == "initializer"
+    assert event["exception_type"] == "builtins.ValueError"
+    assert event["fingerprint"]
+    assert "ValueError: boom" in event["stacktrace"]
+    assert event["pid"] != os.getpid()
+
+    assert ps._child_crash_listener.stop(5)
+
+
+@pytest.mark.skipif(not IS_UNIX, reason="Unix only test")
+def test_terminated_worker_is_reported():
+
+    ps = PubSub()
+    events, received = collect_events(ps)
+
+    with ProcessPoolExecutor(
+        max_workers=1, initializer=ps.worker_initializer()
+    ) as pool:
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(terminate_self).result()
+
+    assert received.wait(5)
+    assert events[0]["reason"] == "terminate"
+    assert events[0]["signal"] == signal.SIGTERM
+
+    ps._handle_finish()
+    assert len(events) == 1, "Dying from the signal afterward is expected"
+    assert ps._child_crash_listener._thread is None, "Listening stops at finish"
+
+
+@pytest.mark.skipif(not IS_UNIX, reason="Unix only test")
+@pytest.mark.parametrize(
+    "task, reason, sig, exit_code",
+    [
+        (kill_self, "killed", signal.SIGKILL, 0),
+        (segfault, "killed", signal.SIGSEGV, 0),
+        (exit_with_error, "exit", 0, 3),
+    ],
+)
+def test_worker_dying_without_warning_is_reported(task, reason, sig, exit_code):
+
+    ps = PubSub()
+    events, received = collect_events(ps)
+
+    with ProcessPoolExecutor(
+        max_workers=1, initializer=ps.worker_initializer()
+    ) as pool:
+        # The worker dies right after it started
+        with pytest.raises(BrokenProcessPool):
+            pool.submit(task).result()
+
+    assert received.wait(5)
+    assert ps._child_crash_listener.stop(5)
+    (event,) = events
+    assert event["pid"] != os.getpid()
+    assert event["reason"] == reason
+    assert event["signal"] == sig
+    assert event["exit_code"] == exit_code
+
+
+def test_listener_survives_faulty_handlers(capsys):
+
+    events = []
+
+    def faulty(event):
+        raise TypeError()
+
+    listener = ChildCrashListener([faulty, events.append])
+    listener.start()
+    listener.events.put(make_child_crash_event("crash", ValueError, ValueError()))
+    assert listener.stop(5)
+
+    assert events[0]["exception_type"] == "builtins.ValueError"
+    assert "TypeError" in capsys.readouterr().err
+
+
+def test_worker_scoped_handlers_are_not_called_in_the_parent():
+
+    ps = PubSub()
+    called = []
+    ps.add_child_crash_handler(lambda event: called.append("both"))
+    ps.add_child_crash_handler(lambda event: called.append("worker"), scope="worker")
+
+    ps.worker_initializer()
+    listener = ps._child_crash_listener
+    listener.dispatch(make_child_crash_event("crash", ValueError, ValueError()))
+    assert listener.stop(5)
+
+    assert called == ["both"]